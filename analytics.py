@@ -0,0 +1,349 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from itertools import accumulate, repeat
+from operator import sub
+
+from dates import DayNumber, DayText, NormalizeDate
+
+#How many tasks someone can lead at once before they count as over-allocated
+DEFAULT_CAPACITY = 3
+#Past this many changed tasks a full rebuild is quicker than applying them one at a time, and the
+#changes are no longer queued
+REBUILD_AFTER = 20000
+
+#Lengthens each of the int arrays to hold index, at least doubling them so a scan in ID order
+#doesn't grow them one row at a time
+def Grow(arrays, index):
+    if index >= len(arrays[0]):
+        padding = array("i", bytes(4 * (index + 1 + len(arrays[0]))))
+        for values in arrays:
+            values.extend(padding)
+
+#How many tasks one employee leads at once over time, as a step function: loads[i] holds from day
+#days[i] up to the next breakpoint. Days are day numbers from dates.DayNumber and ends are exclusive.
+#Both are flat int arrays, so a profile costs 8 bytes per breakpoint rather than a Python object
+class LoadProfile:
+    __slots__ = ("days", "loads")
+
+    def __init__(self):
+        self.days = array("i")
+        self.loads = array("i")
+
+    #Index of the breakpoint at day, adding one that carries on the load before it if needed
+    def Split(self, day):
+        index = bisect_left(self.days, day)
+        if index == len(self.days) or self.days[index] != day:
+            self.days.insert(index, day)
+            self.loads.insert(index, self.loads[index - 1] if index else 0)
+        return index
+
+    #Adds amount to the load from start up to end; only the breakpoints in between are touched
+    def Add(self, start, end, amount):
+        first = self.Split(start)
+        last = self.Split(end)
+        for index in range(first, last):
+            self.loads[index] += amount
+
+    def Peak(self, start, end):
+        first = bisect_right(self.days, start) - 1
+        last = bisect_left(self.days, end)
+        peak = 0 if first < 0 else self.loads[first]
+        for index in range(max(first, 0), last):
+            peak = max(peak, self.loads[index])
+        return peak
+
+    #(start, end, load) pieces between start and end, merging neighbours with the same load
+    def Segments(self, start, end):
+        segments = []
+        index = max(bisect_right(self.days, start) - 1, 0)
+        while index < len(self.days) and self.days[index] < end:
+            segmentStart = max(self.days[index], start)
+            segmentEnd = min(self.days[index + 1] if index + 1 < len(self.days) else end, end)
+            load = self.loads[index]
+            if segments and segments[-1][2] == load and segments[-1][1] == segmentStart:
+                segments[-1] = (segments[-1][0], segmentEnd, load)
+            elif segmentStart < segmentEnd:
+                segments.append((segmentStart, segmentEnd, load))
+            index += 1
+        return segments
+
+    #(start, end, peak) of each stretch between start and end where the load is over capacity
+    def Over(self, capacity, start, end):
+        stretches = []
+        for segmentStart, segmentEnd, load in self.Segments(start, end):
+            if load <= capacity:
+                continue
+            if stretches and stretches[-1][1] == segmentStart:
+                stretches[-1] = (stretches[-1][0], segmentEnd, max(stretches[-1][2], load))
+            else:
+                stretches.append((segmentStart, segmentEnd, load))
+        return stretches
+
+#A stretch of days on which someone leads more tasks at once than they have capacity for. start
+#and end are stored dates, both inclusive
+class Conflict:
+    __slots__ = ("employeeID", "name", "start", "end", "load")
+
+    def __init__(self, employeeID, name, start, end, load):
+        self.employeeID = employeeID
+        self.name = name
+        self.start = start
+        self.end = end
+        self.load = load
+
+    def __iter__(self):
+        return iter((self.employeeID, self.name, self.start, self.end, self.load))
+
+    def __repr__(self):
+        return f"Conflict({self.name!r}, {self.start}, {self.end}, {self.load})"
+
+#Moving a task from an over-allocated leader to someone with the same expertise who has room for it
+class Suggestion:
+    __slots__ = ("taskID", "description", "fromID", "fromName", "toID", "toName", "toLoad")
+
+    def __init__(self, taskID, description, fromID, fromName, toID, toName, toLoad):
+        self.taskID = taskID
+        self.description = description
+        self.fromID = fromID
+        self.fromName = fromName
+        self.toID = toID
+        self.toName = toName
+        self.toLoad = toLoad
+
+    def __iter__(self):
+        return iter((self.taskID, self.description, self.fromID, self.fromName, self.toID, self.toName, self.toLoad))
+
+    def __repr__(self):
+        return f"Suggestion({self.taskID}, {self.fromName!r} -> {self.toName!r})"
+
+#Every employee's load profile, built from Tasks in one pass and then kept up to date from the
+#change feed: a changed task is taken off its old leader's profile and added to its new one,
+#touching only the breakpoints inside its dates. Each task's project, leader and dates are kept in
+#flat arrays indexed by task ID, which is what makes taking the old interval off possible. The task
+#IDs of each project are kept too, as a deleted project's tasks aren't logged one by one
+class Workload:
+    def __init__(self, db, capacity=DEFAULT_CAPACITY):
+        self.db = db
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self.profiles = {}
+        self.projects = array("i")
+        self.leaders = array("i")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.projectTasks = {}
+        self.names = {}
+        self.expertise = {}
+        self.built = False
+        self.pending = []
+        self.stale = False
+        self.pendingLock = threading.Lock()
+        self.token = None
+
+    #Runs on whichever thread committed; the changes are applied at the next question
+    def Queue(self, changes):
+        with self.pendingLock:
+            if len(self.pending) + len(changes) > REBUILD_AFTER:
+                self.pending = []
+                self.stale = True
+            else:
+                self.pending.extend(changes)
+
+    def Close(self):
+        if self.token is not None:
+            self.db.changes.Unsubscribe(self.token)
+
+    #The tasks are read a batch at a time and handled a column at a time, so that the per task work
+    #happens inside C rather than in a Python loop: each batch's columns are slice assigned into the
+    #task arrays, the task IDs are then sorted by leader, and each leader's starts and ends are
+    #counted by day and summed into loads. Python only loops once per leader, and once per project
+    #to slice out its task IDs
+    def Build(self):
+        with self.pendingLock:
+            self.pending = []
+            self.stale = False
+        self.names = {}
+        self.expertise = {}
+        for employee in self.db.iter_employees():
+            self.names[employee.id] = employee.fullName
+            self.expertise[employee.id] = (employee.expertise or "").strip().lower()
+        columns = (array("i"), array("i"), array("i"), array("i"))
+        for rows in self.db.iter_task_intervals():
+            taskIDs = [row[0] for row in rows]
+            first, last = taskIDs[0], taskIDs[-1]
+            Grow(columns, last)
+            for values, column in zip(columns, list(zip(*rows))[1:]):
+                if last - first + 1 == len(taskIDs):
+                    values[first:last + 1] = array("i", column)
+                else:
+                    for taskID, value in zip(taskIDs, column):
+                        values[taskID] = value
+        projects, leaders, starts, ends = columns
+        order = sorted(range(len(leaders)), key=leaders.__getitem__)
+        leaderOrder = array("i", map(leaders.__getitem__, order))
+        startOrder = array("i", map(starts.__getitem__, order))
+        endOrder = array("i", map(ends.__getitem__, order))
+        self.profiles = {}
+        #Rows with no task, or a task that doesn't count, have leader 0 and sort first
+        index = bisect_right(leaderOrder, 0)
+        while index < len(leaderOrder):
+            leader = leaderOrder[index]
+            end = bisect_right(leaderOrder, leader, index)
+            startCounts = Counter(startOrder[index:end])
+            endCounts = Counter(endOrder[index:end])
+            days = sorted(startCounts.keys() | endCounts.keys())
+            profile = self.profiles[leader] = LoadProfile()
+            profile.days = array("i", days)
+            profile.loads = array("i", accumulate(map(sub, map(startCounts.get, days, repeat(0)),
+                                                      map(endCounts.get, days, repeat(0)))))
+            index = end
+        del order, leaderOrder, startOrder, endOrder
+        order = sorted(range(len(projects)), key=projects.__getitem__)
+        projectOrder = array("i", map(projects.__getitem__, order))
+        taskOrder = array("i", order)
+        self.projectTasks = {}
+        index = bisect_right(projectOrder, 0)
+        while index < len(projectOrder):
+            project = projectOrder[index]
+            end = bisect_right(projectOrder, project, index)
+            self.projectTasks[project] = taskOrder[index:end]
+            index = end
+        self.projects, self.leaders, self.starts, self.ends = columns
+        self.built = True
+
+    def Remove(self, taskID):
+        if taskID < len(self.leaders) and self.leaders[taskID]:
+            self.profiles[self.leaders[taskID]].Add(self.starts[taskID], self.ends[taskID], -1)
+            self.leaders[taskID] = 0
+
+    #A task's ID is only added to its project's list when it arrives there. Moving it off leaves the
+    #old entry behind, which is why a project's IDs are checked against projects when it is deleted
+    def Insert(self, taskID, projectID, leader, start, end):
+        Grow((self.projects, self.leaders, self.starts, self.ends), taskID)
+        projectID = projectID or 0
+        if projectID and self.projects[taskID] != projectID:
+            self.projectTasks.setdefault(projectID, array("i")).append(taskID)
+        self.projects[taskID] = projectID
+        self.leaders[taskID] = leader
+        self.starts[taskID] = start
+        self.ends[taskID] = end
+        if leader not in self.profiles:
+            self.profiles[leader] = LoadProfile()
+        self.profiles[leader].Add(start, end, 1)
+
+    def Apply(self, changes):
+        taskIDs = set()
+        for change in changes:
+            if change.table == "Projects" and change.action == "delete":
+                #Project IDs aren't reused, so the list can go with the project
+                taskIDs.update(taskID for taskID in self.projectTasks.pop(change.rowID, ())
+                               if self.projects[taskID] == change.rowID)
+            elif change.table == "Tasks":
+                taskIDs.add(change.rowID)
+            elif change.table == "Employees":
+                employee = self.db.get_employee(change.rowID)
+                if employee is None:
+                    self.names.pop(change.rowID, None)
+                    self.expertise.pop(change.rowID, None)
+                else:
+                    self.names[employee.id] = employee.fullName
+                    self.expertise[employee.id] = (employee.expertise or "").strip().lower()
+        for taskID in taskIDs:
+            self.Remove(taskID)
+            row = self.db.get_task_interval(taskID)
+            if row is not None:
+                self.Insert(taskID, *row)
+
+    #Brings the profiles up to date before answering anything, including changes other processes
+    #have committed since
+    def Refresh(self):
+        if self.token is None:
+            #Subscribed before the first build, so nothing committed while it runs is missed
+            self.token = self.db.changes.Subscribe(self.Queue, ("Tasks", "Projects", "Employees"))
+        self.db.changes.PollIfChanged()
+        with self.pendingLock:
+            changes, self.pending = self.pending, []
+            stale, self.stale = self.stale, False
+        if not self.built or stale:
+            self.Build()
+        elif changes:
+            self.Apply(changes)
+
+    def Window(self, start, end):
+        return DayNumber(NormalizeDate(start)), DayNumber(NormalizeDate(end)) + 1
+
+    #(start, end, load) pieces of someone's load between two dates, ends inclusive
+    def Load(self, employeeID, start, end):
+        with self.lock:
+            self.Refresh()
+            profile = self.profiles.get(employeeID)
+            if profile is None:
+                return []
+            return [(DayText(first), DayText(last - 1), load)
+                    for first, last, load in profile.Segments(*self.Window(start, end)) if load]
+
+    def Peak(self, employeeID, start, end):
+        with self.lock:
+            self.Refresh()
+            profile = self.profiles.get(employeeID)
+            return 0 if profile is None else profile.Peak(*self.Window(start, end))
+
+    #Everyone leading more than capacity tasks at once between two dates, most overloaded first
+    def Conflicts(self, start, end, limit=None):
+        with self.lock:
+            self.Refresh()
+            first, last = self.Window(start, end)
+            conflicts = []
+            for employeeID, profile in self.profiles.items():
+                for stretchStart, stretchEnd, load in profile.Over(self.capacity, first, last):
+                    conflicts.append(Conflict(employeeID, self.names.get(employeeID), DayText(stretchStart),
+                                              DayText(stretchEnd - 1), load))
+            conflicts.sort(key=lambda conflict: (-conflict.load, conflict.start))
+            return conflicts[:limit] if limit else conflicts
+
+    #For each conflict, enough of its tasks to bring the load down to capacity, each paired with
+    #the least loaded person of the same expertise who would still be within capacity. The latest
+    #starting tasks are moved first, being the least far along. Moves suggested earlier in the same
+    #call count towards the new leader's load
+    def Suggestions(self, start, end, limit=50):
+        with self.lock:
+            conflicts = self.Conflicts(start, end)
+            colleagues = {}
+            for employeeID, expertise in self.expertise.items():
+                if expertise:
+                    colleagues.setdefault(expertise, []).append(employeeID)
+            planned = {}
+            suggestions = []
+            for conflict in conflicts:
+                expertise = self.expertise.get(conflict.employeeID)
+                excess = conflict.load - self.capacity
+                for taskID, description, taskStart, taskEnd in self.db.get_leader_tasks_between(
+                        conflict.employeeID, conflict.start, conflict.end):
+                    if excess <= 0 or len(suggestions) >= limit:
+                        break
+                    if any(suggestion.taskID == taskID for suggestion in suggestions):
+                        continue
+                    first, last = self.Window(taskStart, taskEnd)
+                    best = None
+                    for colleague in colleagues.get(expertise, ()):
+                        if colleague == conflict.employeeID:
+                            continue
+                        profile = self.profiles.get(colleague)
+                        load = profile.Peak(first, last) if profile is not None else 0
+                        load += sum(1 for plannedFirst, plannedLast in planned.get(colleague, ())
+                                    if plannedFirst < last and first < plannedLast)
+                        if load < self.capacity and (best is None or load < best[1]):
+                            best = (colleague, load)
+                            if load == 0:
+                                break
+                    if best is None:
+                        continue
+                    planned.setdefault(best[0], []).append((first, last))
+                    suggestions.append(Suggestion(taskID, description, conflict.employeeID, conflict.name,
+                                                  best[0], self.names.get(best[0]), best[1] + 1))
+                    excess -= 1
+                if len(suggestions) >= limit:
+                    break
+            return suggestions
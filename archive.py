@@ -0,0 +1,251 @@
+import argparse
+import datetime
+import glob
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from database import Database, DATABASE_NAME, BASE_SCHEMA, Migrate, SearchExpression, CloseAllConnections
+from purge import PurgeAll
+from metrics import metrics
+
+#Finished projects are moved out of the active database into one archive database per year, kept
+#next to it as e.g. Database-archive-2023.db. The active file then only holds the work in progress,
+#so its tables and indexes stay small enough to live in the page cache however much history builds
+#up. Archives have the same schema and are read by attaching them to a separate connection
+
+#Environment variable that turns on the background archiving job in the app, set to the number of
+#days after its last task ends that a project is archived
+ARCHIVE_VARIABLE = "PYROJECT_ARCHIVE_DAYS"
+DEFAULT_ARCHIVE_DAYS = 365
+#Seconds between the background job's passes
+ARCHIVE_INTERVAL = 3600
+#How many projects one pass looks at
+ARCHIVE_BATCH = 100
+#Shortest wait between steps of merging the search index
+MERGE_PAUSE = 0.005
+
+def ArchivePath(dbName, year):
+    stem, extension = os.path.splitext(dbName)
+    return f"{stem}-archive-{year}{extension}"
+
+#{year: path} of the archives that exist for a database
+def ArchivePaths(dbName):
+    stem, extension = os.path.splitext(dbName)
+    paths = {}
+    for path in glob.glob(f"{glob.escape(stem)}-archive-*{glob.escape(extension)}"):
+        match = re.fullmatch(r"-archive-(\d{4})", path[len(stem):len(path) - len(extension)])
+        if match:
+            paths[int(match.group(1))] = path
+    return paths
+
+#Creates a year's archive if it doesn't exist and brings its schema up to date. Archives don't keep
+#a change log, as nothing watches them, so those triggers are dropped
+def PrepareArchive(dbName, year):
+    path = ArchivePath(dbName, year)
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        if not connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'Tasks'").fetchone():
+            connection.execute("BEGIN IMMEDIATE")
+            for statement in BASE_SCHEMA:
+                connection.execute(statement)
+            connection.execute("COMMIT")
+        Migrate(connection)
+        triggers = connection.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%Change%'").fetchall()
+        for (name,) in triggers:
+            connection.execute(f"DROP TRIGGER {name}")
+    finally:
+        connection.close()
+    return path
+
+#Moves one project into year's archive: it is copied there, then soft deleted here for the purge
+#job to remove a batch at a time. If it was edited while being copied the copy is thrown away, and
+#the project is tried again on the next pass. Returns whether it moved
+def ArchiveProject(db, projectID, year):
+    path = PrepareArchive(db.db_name, year)
+    cursor = db.copy_project_to_archive(projectID, path)
+    if db.mark_project_archived(projectID, year, cursor):
+        return True
+    db.remove_project_from_archive(projectID, path)
+    return False
+
+#Archives the projects that finished more than days ago. Without a purge job the rows left behind
+#are purged, and the search index merged, before returning. Returns how many projects were archived
+def ArchiveFinished(db, days=DEFAULT_ARCHIVE_DAYS, purger=None):
+    cutoff = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    archived = 0
+    for projectID, name, finished in db.get_archive_candidates(cutoff, ARCHIVE_BATCH):
+        archived += ArchiveProject(db, projectID, int(finished[:4]))
+    if archived:
+        if purger is not None:
+            purger.Wake()
+        else:
+            PurgeAll(db)
+            while db.merge_search_index():
+                pass
+    return archived
+
+#Runs ArchiveFinished on a background thread when started and then every interval seconds,
+#leaving the deleting to the purge job. Once that has finished it merges the search index, a step
+#at a time with pauses as long as the steps, so the active database's index shrinks too. A pass that
+#fails is recorded in the metrics (source "archive"), and kept in error until a pass succeeds
+class ArchiveJob:
+    def __init__(self, db, purger, days=DEFAULT_ARCHIVE_DAYS, interval=ARCHIVE_INTERVAL):
+        self.db = db
+        self.purger = purger
+        self.days = days
+        self.interval = interval
+        self.wake = threading.Event()
+        self.thread = None
+        self.running = True
+        self.error = None
+
+    def Start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.Run, name="archive", daemon=True)
+            self.thread.start()
+        return self
+
+    def Run(self):
+        while self.running:
+            try:
+                self.Pass()
+                self.error = None
+            except sqlite3.ProgrammingError:
+                #The connections were closed on shutdown
+                return
+            except (sqlite3.Error, OSError) as error:
+                #Whatever was copied but not yet marked archived is copied again next pass
+                self.error = error
+                metrics.RecordError("archive", error)
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+    #Archives until there is nothing left to archive, then merges the search index. Returns how
+    #many projects were archived
+    def Pass(self):
+        archived = 0
+        while self.running:
+            count = ArchiveFinished(self.db, self.days, self.purger)
+            archived += count
+            #A full batch means there may be more to do straight away
+            if count < ARCHIVE_BATCH:
+                break
+        if archived:
+            self.MergeSearchIndex()
+        return archived
+
+    def MergeSearchIndex(self):
+        while self.running and self.db.has_deleted_projects():
+            time.sleep(1.0)
+        while self.running:
+            start = time.perf_counter()
+            if not self.db.merge_search_index():
+                return
+            time.sleep(max(MERGE_PAUSE, time.perf_counter() - start))
+
+    def Stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+
+#Answers questions across the archives. Each thread has its own read only connection to the active
+#database with the archives attached, kept apart from the pooled connections so that attaching
+#never affects them. SQLite attaches at most SQLITE_LIMIT_ATTACHED files at once; with more
+#archives than that a query runs over them a group at a time
+class ArchiveReader:
+    def __init__(self, db):
+        self.db = db
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def Connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db.db_name, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA query_only = ON")
+            self.local.connection = connection
+            self.local.attached = {}
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    #Attaches the archives for years, detaching others only when there isn't room for them all
+    def Attach(self, connection, paths):
+        attached = self.local.attached
+        room = connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        for year in [year for year in attached if year not in paths or attached[year] != paths[year]]:
+            connection.execute(f"DETACH DATABASE Archive{year}")
+            del attached[year]
+        for year in [year for year in attached if len(attached) + len(paths.keys() - attached.keys()) > room]:
+            connection.execute(f"DETACH DATABASE Archive{year}")
+            del attached[year]
+        for year, path in paths.items():
+            if year not in attached:
+                connection.execute(f"ATTACH DATABASE ? AS Archive{year}", (path,))
+                attached[year] = path
+
+    #Runs template once per archive, with {schema} and {year} filled in, as UNION ALLs over as many
+    #archives as can be attached at once, and returns all the rows. years limits it to some archives
+    def Query(self, template, parameters=(), years=None):
+        paths = ArchivePaths(self.db.db_name)
+        if years is not None:
+            paths = {year: path for year, path in paths.items() if year in years}
+        connection = self.Connection()
+        order = sorted(paths, reverse=True)
+        group = connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        rows = []
+        for first in range(0, len(order), group):
+            years = order[first:first + group]
+            self.Attach(connection, {year: paths[year] for year in years})
+            query = " UNION ALL ".join(template.format(schema=f"Archive{year}", year=year) for year in years)
+            rows.extend(connection.execute(query, tuple(parameters) * len(years)).fetchall())
+        return rows
+
+    #Tasks of one archived project, in ID order
+    def ProjectTasks(self, projectID, year, limit):
+        template = "SELECT * FROM (SELECT * FROM {schema}.Tasks WHERE ProjectID = ? ORDER BY ID LIMIT ?)"
+        return self.Query(template, (projectID, limit), (year,))
+
+    #(ID, ProjectID, Description, snippet, year) of the best matching archived tasks, ranked with
+    #bm25 in each archive and merged. Only projects the active database lists as archived count,
+    #which leaves out any copy left behind by an archiving pass that didn't finish
+    def SearchTasks(self, text, limit):
+        expression = SearchExpression(text)
+        if expression is None:
+            return []
+        template = ("SELECT * FROM (SELECT Tasks.ID, Tasks.ProjectID, Tasks.Description, "
+                    "snippet(TasksSearch, -1, '[', ']', '...', 8), {year}, TasksSearch.rank FROM {schema}.TasksSearch "
+                    "JOIN {schema}.Tasks ON Tasks.ID = TasksSearch.rowid WHERE TasksSearch MATCH ? "
+                    "AND Tasks.ProjectID IN (SELECT ID FROM main.ArchivedProjects) ORDER BY TasksSearch.rank LIMIT ?)")
+        rows = self.Query(template, (expression, limit))
+        rows.sort(key=lambda row: row[5])
+        return [row[:5] for row in rows[:limit]]
+
+    def Close(self):
+        with self.lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections = []
+        self.local = threading.local()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move finished projects into yearly archive databases")
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--days", type=int, default=DEFAULT_ARCHIVE_DAYS,
+                        help="archive projects whose last task ended more than this many days ago")
+    arguments = parser.parse_args()
+    db = Database(arguments.database)
+    total = 0
+    while True:
+        archived = ArchiveFinished(db, arguments.days)
+        total += archived
+        if archived < ARCHIVE_BATCH:
+            break
+    print(f"Archived {total} projects")
+    CloseAllConnections()
@@ -0,0 +1,90 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+#Runs database work on a small pool of worker threads and hands the results back to the Tk thread.
+#Tk isn't thread safe, so workers only ever put results on a queue that the UI thread polls with
+#root.after. Every job has a key (e.g. "projectTasks"); submitting a new job under the same key
+#supersedes the old one, so a slow result for a project the user has clicked away from is dropped.
+#The queue is only polled while some job is waiting for its result, and jobs are submitted from the
+#Tk thread
+class BackgroundExecutor:
+    def __init__(self, root, workers=2, pollInterval=15):
+        self.root = root
+        self.pollInterval = pollInterval
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="database")
+        self.results = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.generation = 0
+        self.running = True
+        self.polling = None
+
+    def Submit(self, key, function, callback, errorCallback=None):
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            previous = self.jobs.get(key)
+            if previous is not None:
+                previous[1].cancel()
+            future = self.pool.submit(function)
+            self.jobs[key] = (generation, future)
+        future.add_done_callback(lambda future: self.results.put((key, generation, future, callback, errorCallback)))
+        self.Schedule()
+        return future
+
+    def Schedule(self):
+        if self.running and self.polling is None:
+            self.polling = self.root.after(self.pollInterval, self.Poll)
+
+    #Forgets a job so its result is thrown away, and stops it if it hasn't started yet
+    def Cancel(self, key):
+        with self.lock:
+            job = self.jobs.pop(key, None)
+        if job is not None:
+            job[1].cancel()
+
+    def CancelAll(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+            self.jobs = {}
+        for generation, future in jobs:
+            future.cancel()
+
+    #Delivers finished results on the Tk thread, skipping any that were cancelled or superseded. A
+    #callback that raises is reported like a failed job, and doesn't stop later results arriving
+    def Poll(self):
+        self.polling = None
+        try:
+            while True:
+                try:
+                    key, generation, future, callback, errorCallback = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                with self.lock:
+                    job = self.jobs.get(key)
+                    if job is None or job[0] != generation:
+                        continue
+                    del self.jobs[key]
+                if future.cancelled():
+                    continue
+                try:
+                    error = future.exception()
+                    if error is None:
+                        callback(future.result())
+                    elif errorCallback is not None:
+                        errorCallback(error)
+                    else:
+                        metrics.RecordError("background", error)
+                except Exception as error:
+                    metrics.RecordError("background", error)
+        finally:
+            if self.jobs:
+                self.Schedule()
+
+    def Shutdown(self):
+        self.running = False
+        self.CancelAll()
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,291 @@
+import argparse
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from database import DATABASE_NAME
+from metrics import metrics
+
+#Consistent copies of a database taken while it is in use, kept as a chain of snapshots in one
+#store file next to it (Database-backups.db). Each snapshot is read inside a single read
+#transaction, which in WAL mode pins the database as it was when the transaction started without
+#holding up anyone writing, and copied through the online backup API a step of pages at a time.
+#Only the pages that differ from the previous snapshot are stored, so after the first snapshot
+#each one costs about what was edited since rather than the whole file
+
+#Environment variable that turns on the background backup job in the app, set to the minutes
+#between snapshots
+BACKUP_VARIABLE = "PYROJECT_BACKUP_MINUTES"
+#Pages copied per step of the backup, and how long to sleep between steps so that a big copy leaves
+#gaps for the app's own threads and disk. The sleep argument of Connection.backup only applies when
+#a step finds the database busy or locked, so the pause is taken in the progress callback instead
+BACKUP_PAGES = 1024
+BACKUP_PAUSE = 0.001
+#How many snapshots the job keeps
+KEEP_SNAPSHOTS = 48
+#Pages compared with the previous snapshot at once
+HASH_BATCH = 1000
+
+STORE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS Snapshots (ID INTEGER PRIMARY KEY AUTOINCREMENT, Taken TEXT NOT NULL, "
+    "PageSize INTEGER NOT NULL, PageCount INTEGER NOT NULL, Changed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS Pages (PageNo INTEGER NOT NULL, SnapshotID INTEGER NOT NULL, Data BLOB NOT NULL, "
+    "PRIMARY KEY (PageNo, SnapshotID))",
+    #A hash of every page as of the newest snapshot, to tell which pages the next one has to store
+    "CREATE TABLE IF NOT EXISTS Hashes (PageNo INTEGER PRIMARY KEY, Hash BLOB NOT NULL)",
+]
+
+def StorePath(dbName):
+    stem, extension = os.path.splitext(dbName)
+    return f"{stem}-backups{extension}"
+
+#Copies dbName to target as it was at one moment. Without the read transaction held around it, the
+#backup would start again from the first page every time someone else committed, and on a busy
+#database might never finish
+def CopyDatabase(dbName, target, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    source = sqlite3.connect(dbName, isolation_level=None)
+    copy = sqlite3.connect(target)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(copy, pages=pages, progress=lambda status, remaining, total: time.sleep(pause))
+        source.execute("COMMIT")
+    finally:
+        copy.close()
+        source.close()
+
+def PageSize(header):
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+class BackupStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        #A snapshot lost to a power cut is simply taken again, so the store doesn't sync every commit
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        for statement in STORE_SCHEMA:
+            self.connection.execute(statement)
+
+    #(ID, Taken, PageSize, PageCount, Changed) of every snapshot, oldest first
+    def Snapshots(self):
+        return self.connection.execute("SELECT ID, Taken, PageSize, PageCount, Changed FROM Snapshots ORDER BY ID").fetchall()
+
+    #The newest snapshot taken at or before a time given as YYYY-MM-DD HH:MM:SS, or just the newest
+    def SnapshotAt(self, taken=None):
+        if taken is None:
+            row = self.connection.execute("SELECT MAX(ID) FROM Snapshots").fetchone()
+        else:
+            row = self.connection.execute("SELECT MAX(ID) FROM Snapshots WHERE Taken <= ?", (taken,)).fetchone()
+        return row[0]
+
+    #Adds a snapshot from a copy made by CopyDatabase, storing the pages that changed since the
+    #last one. Returns (snapshot ID, pages stored, pages in the copy)
+    def Add(self, copyPath, taken):
+        connection = self.connection
+        with open(copyPath, "rb") as copy:
+            pageSize = PageSize(copy.read(100))
+            pageCount = os.path.getsize(copyPath) // pageSize
+            copy.seek(0)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                last = connection.execute("SELECT PageSize FROM Snapshots ORDER BY ID DESC LIMIT 1").fetchone()
+                if last is not None and last[0] != pageSize:
+                    #Every page moved, e.g. after a VACUUM that changed the page size
+                    connection.execute("DELETE FROM Hashes")
+                snapshotID = connection.execute("INSERT INTO Snapshots VALUES (NULL, ?, ?, ?, 0)",
+                                                (taken, pageSize, pageCount)).lastrowid
+                changed = 0
+                for first in range(1, pageCount + 1, HASH_BATCH):
+                    last = min(pageCount, first + HASH_BATCH - 1)
+                    hashes = dict(connection.execute("SELECT PageNo, Hash FROM Hashes WHERE PageNo BETWEEN ? AND ?",
+                                                     (first, last)))
+                    pages = []
+                    for pageNo in range(first, last + 1):
+                        data = copy.read(pageSize)
+                        digest = hashlib.blake2b(data, digest_size=16).digest()
+                        if hashes.get(pageNo) != digest:
+                            pages.append((pageNo, snapshotID, data, digest))
+                    connection.executemany("INSERT INTO Pages VALUES (?, ?, ?)", [page[:3] for page in pages])
+                    connection.executemany("INSERT OR REPLACE INTO Hashes VALUES (?, ?)", [(page[0], page[3]) for page in pages])
+                    changed += len(pages)
+                connection.execute("DELETE FROM Hashes WHERE PageNo > ?", (pageCount,))
+                connection.execute("UPDATE Snapshots SET Changed = ? WHERE ID = ?", (changed, snapshotID))
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        return snapshotID, changed, pageCount
+
+    #Writes the database as it was at a snapshot to path, from each page's newest version up to
+    #that snapshot, and checks it before putting it in place. A WAL or shared memory file left
+    #next to path belongs to the database being replaced and would be applied over the restored
+    #one, so they are removed
+    def Restore(self, snapshotID, path):
+        row = self.connection.execute("SELECT PageSize, PageCount FROM Snapshots WHERE ID = ?", (snapshotID,)).fetchone()
+        if row is None:
+            raise ValueError(f"There is no snapshot {snapshotID}")
+        pageSize, pageCount = row
+        partial = path + ".restoring"
+        #The bare Data column comes from the row MAX picked
+        pages = self.connection.execute("SELECT PageNo, MAX(SnapshotID), Data FROM Pages WHERE SnapshotID <= ? AND PageNo <= ? "
+                                        "GROUP BY PageNo ORDER BY PageNo", (snapshotID, pageCount))
+        try:
+            with open(partial, "wb") as output:
+                expected = 1
+                for pageNo, version, data in pages:
+                    if pageNo != expected or len(data) != pageSize:
+                        raise ValueError(f"Snapshot {snapshotID} is missing page {expected}")
+                    output.write(data)
+                    expected += 1
+                if expected != pageCount + 1:
+                    raise ValueError(f"Snapshot {snapshotID} is missing page {expected}")
+            check = sqlite3.connect(partial)
+            try:
+                result = check.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                check.close()
+            if result != [("ok",)]:
+                raise ValueError(f"Snapshot {snapshotID} doesn't pass an integrity check: {result[:5]}")
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    #Drops all but the newest keep snapshots. The oldest one kept takes over the newest version of
+    #each page it didn't store itself, so it can still be restored on its own
+    def Prune(self, keep):
+        snapshots = [row[0] for row in self.Snapshots()]
+        if len(snapshots) <= keep:
+            return 0
+        oldest = snapshots[-keep]
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR IGNORE INTO Pages SELECT PageNo, ?, Data FROM (SELECT PageNo, MAX(SnapshotID), Data "
+                               "FROM Pages WHERE SnapshotID < ? GROUP BY PageNo)", (oldest, oldest))
+            connection.execute("DELETE FROM Pages WHERE SnapshotID < ?", (oldest,))
+            connection.execute("DELETE FROM Snapshots WHERE ID < ?", (oldest,))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return len(snapshots) - keep
+
+    def Close(self):
+        self.connection.close()
+
+#Takes a snapshot of dbName into a store that is already open. Returns (snapshot ID, pages stored,
+#pages in the database)
+def SnapshotInto(store, dbName, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    copyPath = store.path + ".partial"
+    try:
+        taken = datetime.datetime.now().isoformat(" ", "seconds")
+        CopyDatabase(dbName, copyPath, pages, pause)
+        return store.Add(copyPath, taken)
+    finally:
+        if os.path.exists(copyPath):
+            os.remove(copyPath)
+
+#Takes a snapshot of dbName into its store, see SnapshotInto
+def TakeSnapshot(dbName, storePath=None, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    store = BackupStore(storePath or StorePath(dbName))
+    try:
+        return SnapshotInto(store, dbName, pages, pause)
+    finally:
+        store.Close()
+
+#Takes a snapshot every interval minutes on a background thread, keeping the newest keep. The store
+#stays open on the job's thread between snapshots. A snapshot that fails is recorded in the metrics
+#(source "backup") and kept in error until one succeeds, and the store is opened again next time
+class BackupJob:
+    def __init__(self, dbName, minutes, keep=KEEP_SNAPSHOTS, storePath=None):
+        self.dbName = dbName
+        self.interval = minutes * 60
+        self.keep = keep
+        self.storePath = storePath or StorePath(dbName)
+        self.wake = threading.Event()
+        self.thread = None
+        self.running = True
+        self.error = None
+
+    def Start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.Run, name="backup", daemon=True)
+            self.thread.start()
+        return self
+
+    def Run(self):
+        store = None
+        try:
+            while self.running:
+                try:
+                    if store is None:
+                        store = BackupStore(self.storePath)
+                    SnapshotInto(store, self.dbName)
+                    store.Prune(self.keep)
+                    self.error = None
+                except (sqlite3.Error, OSError) as error:
+                    self.error = error
+                    metrics.RecordError("backup", error)
+                    if store is not None:
+                        store.Close()
+                        store = None
+                self.wake.wait(self.interval)
+                self.wake.clear()
+        finally:
+            if store is not None:
+                store.Close()
+
+    def Stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Take, list and restore snapshots of Database.db")
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--store", default=None, help="where snapshots are kept, Database-backups.db by default")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="take a snapshot now, while the database stays in use")
+    commands.add_parser("list", help="list the snapshots")
+    prune = commands.add_parser("prune", help="drop all but the newest snapshots")
+    prune.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS)
+    restore = commands.add_parser("restore", help="put the database back as it was at a snapshot")
+    restore.add_argument("snapshot", nargs="?", type=int, help="snapshot ID, the newest by default")
+    restore.add_argument("--at", help="the newest snapshot taken at or before YYYY-MM-DD HH:MM:SS")
+    restore.add_argument("--output", help="write the restored database here instead of over --database")
+    restore.add_argument("--force", action="store_true", help="replace the output file if it exists")
+    arguments = parser.parse_args()
+    storePath = arguments.store or StorePath(arguments.database)
+
+    if arguments.command == "snapshot":
+        snapshotID, changed, pageCount = TakeSnapshot(arguments.database, storePath)
+        print(f"Snapshot {snapshotID}: stored {changed} of {pageCount} pages")
+    else:
+        store = BackupStore(storePath)
+        try:
+            if arguments.command == "list":
+                for snapshotID, taken, pageSize, pageCount, changed in store.Snapshots():
+                    print(f"{snapshotID:>6}  {taken}  {pageCount * pageSize / 1024 / 1024:.1f}MB, {changed} pages stored")
+            elif arguments.command == "prune":
+                print(f"Dropped {store.Prune(arguments.keep)} snapshots")
+            else:
+                snapshotID = arguments.snapshot or store.SnapshotAt(arguments.at)
+                output = arguments.output or arguments.database
+                if snapshotID is None:
+                    parser.error("There is no snapshot to restore")
+                if os.path.exists(output) and not arguments.force:
+                    parser.error(f"{output} exists, close everything using it and pass --force to replace it")
+                store.Restore(snapshotID, output)
+                print(f"Restored snapshot {snapshotID} to {output}")
+        finally:
+            store.Close()
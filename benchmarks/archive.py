@@ -0,0 +1,108 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from archive import ArchiveJob, ArchivePaths, ArchiveReader
+from benchmarks.common import CallsPerSecond
+from benchmarks.dataset import BuildDataset
+from benchmarks.deletes import WriterProbe
+from database import Database, CloseAllConnections
+from purge import PurgeJob
+
+#Archives every project of a synthetic database that finished before CUTOFF and compares the
+#active database before and after: its task count, the pages it uses and how fast a scan of its
+#tasks and a search run. Also times searching the archives, the worst stall another writer sees
+#while archiving, and checks that no task went missing and that IDs aren't reused
+#
+#   python -m benchmarks.archive 1000000
+CUTOFF = datetime.date(2024, 7, 1)
+WORD_QUERY = "SELECT Description FROM Tasks ORDER BY ID LIMIT 1"
+
+#The synthetic tasks are spread over six years whatever their project, so no project would ever be
+#finished. Moves each task inside its project's dates instead, keeping its length where it fits
+def FitTasksToProjects(path):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute(
+            'UPDATE Tasks SET StartDate = date(Projects."Start Date", \'+\' || (Tasks.ID % MAX(1, '
+            'julianday(Projects."End Date") - julianday(Projects."Start Date"))) || \' days\'), '
+            'EndDate = MIN(Projects."End Date", date(Projects."Start Date", \'+\' || (Tasks.ID % MAX(1, '
+            'julianday(Projects."End Date") - julianday(Projects."Start Date")) + Tasks.ID % 30) || \' days\')) '
+            'FROM Projects WHERE Projects.ID = Tasks.ProjectID')
+        connection.execute("DELETE FROM ChangeLog")
+    connection.close()
+
+def Scan(db):
+    db.execute_query('SELECT "Task Leader", COUNT(*), MAX(EndDate) FROM Tasks GROUP BY "Task Leader"')
+
+def Search(db, word):
+    db.execute_query("SELECT rowid FROM TasksSearch WHERE TasksSearch MATCH ? ORDER BY rank LIMIT 50", (word,))
+
+def Report(label, db, word):
+    tasks = db.execute_query("SELECT COUNT(*) FROM Tasks")[0][0]
+    pages = db.execute_query("SELECT page_count - freelist_count FROM pragma_page_count, pragma_freelist_count")[0][0]
+    print(f"{label}: {tasks} tasks in {pages} pages, {CallsPerSecond(lambda: Scan(db), 2.0):.1f} scans/s, "
+          f"{CallsPerSecond(lambda: Search(db, word), 1.0):.0f} searches/s")
+    return tasks
+
+def ArchivedTasks(path):
+    total = 0
+    for archivePath in ArchivePaths(path).values():
+        archiveDb = Database(archivePath)
+        total += archiveDb.execute_query("SELECT COUNT(*) FROM Tasks")[0][0]
+    return total
+
+def Main(tasks):
+    folder = tempfile.mkdtemp(prefix="pyrojectbench-")
+    path = os.path.join(folder, "Database.db")
+    try:
+        BuildDataset(path, tasks)
+        FitTasksToProjects(path)
+        db = Database(path)
+        word = db.execute_query(WORD_QUERY)[0][0].split()[0]
+        highest = db.execute_query("SELECT MAX(ID) FROM Tasks")[0][0]
+        before = Report("before", db, word)
+
+        probe = WriterProbe(path)
+        start = time.perf_counter()
+        purger = PurgeJob(db)
+        projects = ArchiveJob(db, purger, (datetime.date.today() - CUTOFF).days).Pass()
+        elapsed = time.perf_counter() - start
+        purger.Stop()
+        stall = probe.Stop()
+        print(f"archived {projects} projects into {len(ArchivePaths(path))} files, purged and merged the search "
+              f"index in {elapsed:.1f}s, worst writer stall {stall * 1000:.0f} ms")
+
+        after = Report("after", db, word)
+        reader = ArchiveReader(db)
+        start = time.perf_counter()
+        found = reader.SearchTasks(word, 50)
+        print(f"searching the archives found {len(found)} tasks in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        failures = 0
+        archived = ArchivedTasks(path)
+        if before != after + archived:
+            print(f"FAIL {before} tasks before, {after} active and {archived} archived")
+            failures += 1
+        live = db.execute_query("SELECT ID FROM Projects ORDER BY ID LIMIT 1")[0][0]
+        taskID = db.add_task(live, "2026-01-01", "2026-01-02", 1, "Probe", "")
+        if taskID <= highest:
+            print(f"FAIL new task {taskID} reused an ID at or below {highest}")
+            failures += 1
+        db.delete_task(taskID)
+        if any(not db.get_archived_project(projectID) for _, projectID, _, _, _ in found):
+            print("FAIL the archive search returned a project that isn't archived")
+            failures += 1
+        print(f"{'ok  ' if not failures else 'FAIL'} every task is either active or archived once")
+        reader.Close()
+        CloseAllConnections()
+        return failures
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(1 if Main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000) else 0)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from backup import BackupStore, CopyDatabase, TakeSnapshot, StorePath
+from benchmarks.dataset import BuildDataset
+from database import Database, CloseAllConnections
+
+#Snapshots a synthetic database with the given number of tasks (5 million is about 3GB) while
+#another thread keeps adding tasks, and reports the backup's throughput and the slowest write that
+#thread saw. Then edits some tasks, takes an incremental snapshot and restores both, checking each
+#restore is a consistent database holding what was committed when its snapshot started
+#
+#   python -m benchmarks.backup 5000000
+EDITS = 1000
+
+#Adds a task every couple of milliseconds, timing each commit
+class TaskWriter:
+    def __init__(self, path):
+        self.db = Database(path)
+        self.worst = 0.0
+        self.times = []
+        self.running = True
+        self.thread = threading.Thread(target=self.Run)
+        self.thread.start()
+
+    def Run(self):
+        while self.running:
+            start = time.perf_counter()
+            try:
+                self.db.add_task(1, "2024-01-01", "2024-01-02", 1, "Written during the backup", "")
+            except sqlite3.OperationalError:
+                pass
+            self.times.append(time.perf_counter() - start)
+            time.sleep(0.002)
+
+    def Stop(self):
+        self.running = False
+        self.thread.join()
+        self.times.sort()
+        return self.times[len(self.times) // 2], self.times[-1]
+
+def Tasks(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*), TOTAL(ID), TOTAL(LENGTH(Description)) FROM Tasks").fetchone()
+    finally:
+        connection.close()
+
+def Restored(store, snapshotID, folder):
+    path = os.path.join(folder, f"Restored{snapshotID}.db")
+    start = time.perf_counter()
+    store.Restore(snapshotID, path)
+    return path, time.perf_counter() - start
+
+def Main(tasks):
+    folder = tempfile.mkdtemp(prefix="pyrojectbench-")
+    path = os.path.join(folder, "Database.db")
+    try:
+        BuildDataset(path, tasks)
+        size = os.path.getsize(path) / 1024 / 1024
+        db = Database(path)
+        failures = 0
+
+        #The copy alone, without comparing pages with an earlier snapshot
+        writer = TaskWriter(path)
+        start = time.perf_counter()
+        CopyDatabase(path, os.path.join(folder, "Copy.db"))
+        elapsed = time.perf_counter() - start
+        median, worst = writer.Stop()
+        print(f"online backup of {size:.0f}MB in {elapsed:.1f}s, {size / elapsed:.0f}MB/s, "
+              f"writes took {median * 1000:.1f} ms median and {worst * 1000:.0f} ms at worst")
+        os.remove(os.path.join(folder, "Copy.db"))
+
+        before = db.execute_query("SELECT COUNT(*) FROM Tasks")[0][0]
+        writer = TaskWriter(path)
+        start = time.perf_counter()
+        first, stored, pages = TakeSnapshot(path)
+        elapsed = time.perf_counter() - start
+        median, worst = writer.Stop()
+        after = db.execute_query("SELECT COUNT(*) FROM Tasks")[0][0]
+        print(f"first snapshot: {stored} of {pages} pages stored in {elapsed:.1f}s, "
+              f"writes took {median * 1000:.1f} ms median and {worst * 1000:.0f} ms at worst")
+
+        taskIDs = [row[0] for row in db.execute_query("SELECT ID FROM Tasks ORDER BY ID DESC LIMIT ?", (EDITS,))]
+        for taskID in taskIDs:
+            db.update_task(taskID, "Edited after the first snapshot", "2024-02-01", "2024-02-02", "")
+        expected = Tasks(path)
+        start = time.perf_counter()
+        second, stored, pages = TakeSnapshot(path)
+        print(f"snapshot after editing {EDITS} tasks: {stored} of {pages} pages stored in {time.perf_counter() - start:.1f}s")
+
+        store = BackupStore(StorePath(path))
+        restored, elapsed = Restored(store, first, folder)
+        count = Tasks(restored)[0]
+        print(f"restored the first snapshot in {elapsed:.1f}s, {count} tasks")
+        if not before <= count <= after:
+            print(f"FAIL the first snapshot has {count} tasks, not between {before} and {after}")
+            failures += 1
+        restored, elapsed = Restored(store, second, folder)
+        print(f"restored the second snapshot in {elapsed:.1f}s")
+        if Tasks(restored) != expected:
+            print(f"FAIL the second snapshot has {Tasks(restored)}, expected {expected}")
+            failures += 1
+        store.Close()
+        print(f"{'ok  ' if not failures else 'FAIL'} both restores pass an integrity check and hold what was committed")
+        CloseAllConnections()
+        return failures
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(1 if Main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000000) else 0)
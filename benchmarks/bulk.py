@@ -0,0 +1,43 @@
+import csv
+import os
+import sys
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from bulk import ImportFile, ExportFile
+from database import Database, CloseAllConnections
+
+def WriteTaskFile(path, rows, leaders, projectIDs):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["ProjectID", "StartDate", "EndDate", "Task Leader", "Description", "Comments"])
+        for i in range(rows):
+            writer.writerow([projectIDs[i % len(projectIDs)], "01/01/23", "01/02/23", leaders[i % len(leaders)],
+                             f"Imported task {i}", "Loaded by the bulk benchmark"])
+
+def Run(rows):
+    path = TemporaryDatabase()
+    folder = os.path.dirname(path)
+    try:
+        db = Database(path)
+        leaders = [f"{row[0]} {row[1]}" for row in db.get_employee_names()]
+        projectIDs = [row[0] for row in db.execute_query("SELECT ID FROM Projects")]
+        source = os.path.join(folder, "tasks.csv")
+        WriteTaskFile(source, rows, leaders, projectIDs)
+
+        start = time.perf_counter()
+        ImportFile("Tasks", source, db)
+        importTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = ExportFile("Tasks", os.path.join(folder, "export.jsonl"), db)
+        exportTime = time.perf_counter() - start
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"{rows:>9} rows  import {rows / importTime:10.0f} rows/s  export {exported / exportTime:10.0f} rows/s")
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    for size in sizes:
+        Run(size)
@@ -0,0 +1,34 @@
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+
+#Repeats the queries behind visiting the project list, opening a project and the add task form
+def Navigate(db, projectID):
+    db.count_rows("Projects")
+    db.page_projects(None, 200)
+    db.get_project(projectID)
+    db.count_rows("Tasks", "WHERE ProjectID = ?", (projectID,))
+    db.page_tasks(projectID, None, 200)
+    db.get_employee_names()
+
+def Main(visits=20000):
+    path = TemporaryDatabase()
+    try:
+        db = Database(path)
+        projectID = db.execute_query("SELECT MIN(ID) FROM Projects")[0][0]
+        start = time.perf_counter()
+        for i in range(visits):
+            Navigate(db, projectID)
+            if i % 100 == 0:
+                db.update_task(db.page_tasks(projectID, None, 1)[0][0], "Edited", "", "", str(i))
+        elapsed = time.perf_counter() - start
+        stats = db.cache_stats()
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"{visits / elapsed:10.0f} navigations/s")
+    print(stats)
+
+if __name__ == '__main__':
+    Main()
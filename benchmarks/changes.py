@@ -0,0 +1,86 @@
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase, CallsPerSecond
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+from services import ChangeService
+
+#What the change log costs and what it buys: task inserts per second with and without the logging
+#triggers, how long a change made by another process takes to reach a subscriber, and patching an
+#open task list after an edit compared with reloading it
+def Inserts(path, triggers):
+    db = Database(path)
+    if not triggers:
+        for name in ("TasksChangeInsert", "TasksChangeUpdate", "TasksChangeDelete"):
+            db.execute_query(f"DROP TRIGGER {name}")
+    rate = CallsPerSecond(lambda: db.add_task(1, "2023-01-01", "2023-02-01", 2, "Benchmark task", ""))
+    CloseAllConnections()
+    return rate
+
+def Latency(path, writes=200):
+    db = Database(path)
+    received = []
+    db.changes.Subscribe(lambda changes: received.extend(time.perf_counter() for change in changes))
+    taskID = db.execute_query("SELECT MIN(ID) FROM Tasks")[0][0]
+    other = sqlite3.connect(path, isolation_level=None)
+    delays = []
+    for i in range(writes):
+        count = len(received)
+        start = time.perf_counter()
+        other.execute("UPDATE Tasks SET Comments = ? WHERE ID = ?", (str(i), taskID))
+        while len(received) == count:
+            db.changes.PollIfChanged()
+        delays.append(received[-1] - start)
+    other.close()
+    CloseAllConnections()
+    delays.sort()
+    return delays[len(delays) // 2], delays[-1]
+
+def Patching(path, repeats=50):
+    from main import PagedRowSource
+    db = Database(path)
+    changes = ChangeService(db)
+    Open = lambda: PagedRowSource(lambda: db.count_rows("Tasks", "WHERE ProjectID = ?", (1,)),
+                                  lambda pageSize: db.page_anchors("Tasks", pageSize, "WHERE ProjectID = ?", (1,)),
+                                  lambda afterID, limit: db.page_tasks(1, afterID, limit))
+    source = Open()
+    taskID = source.get(0)[0]
+    patched = reloaded = 0.0
+    for i in range(repeats):
+        cursor = changes.latest()
+        db.update_task(taskID, f"Edited {i}", "2023-01-01", "2023-02-01", "")
+        db.manager.cache.clear()
+        start = time.perf_counter()
+        source.Apply(source.Prepare(changes.since(cursor)))
+        source.get(0)
+        patched += time.perf_counter() - start
+        db.manager.cache.clear()
+        start = time.perf_counter()
+        Open().get(0)
+        reloaded += time.perf_counter() - start
+    CloseAllConnections()
+    return patched / repeats, reloaded / repeats
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        with_triggers = Inserts(path, True)
+        without = Inserts(path, False)
+        print(f"task inserts: {with_triggers:.0f}/s logged, {without:.0f}/s without the triggers")
+    finally:
+        RemoveTemporaryDatabase(path)
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        median, worst = Latency(path)
+        print(f"change from another connection reached the subscriber in {median * 1000:.3f} ms median, "
+              f"{worst * 1000:.3f} ms worst")
+        patched, reloaded = Patching(path)
+        print(f"task list of {rows} rows after an edit: patched in {patched * 1000:.2f} ms, "
+              f"reloaded in {reloaded * 1000:.2f} ms")
+    finally:
+        RemoveTemporaryDatabase(path)
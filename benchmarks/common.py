@@ -0,0 +1,39 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DATABASE = os.path.join(REPO_DIR, 'Database.db')
+
+#Copies the shipped database into a temporary folder so benchmarks never touch the real file
+def TemporaryDatabase(name='Database.db'):
+    folder = tempfile.mkdtemp(prefix="pyrojectbench-")
+    path = os.path.join(folder, name)
+    source = sqlite3.connect(SOURCE_DATABASE)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    return path
+
+def RemoveTemporaryDatabase(path):
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+#Runs function repeatedly for roughly the given number of seconds and returns calls per second
+def CallsPerSecond(function, seconds=1.0):
+    calls = 0
+    start = time.perf_counter()
+    end = start + seconds
+    while time.perf_counter() < end:
+        function()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+#The value below which the given fraction of the sorted samples fall, nearest rank
+def Percentile(sortedSamples, fraction):
+    if not sortedSamples:
+        return 0.0
+    index = min(len(sortedSamples) - 1, max(0, int(round(fraction * len(sortedSamples))) - 1))
+    return sortedSamples[index]
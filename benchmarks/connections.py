@@ -0,0 +1,37 @@
+import sqlite3
+import sys
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase, CallsPerSecond
+from database import Database, CloseAllConnections
+
+#One click on a project as the app used to do it: open the file, run the query, close it again
+def OpenPerCallClick(path, projectID):
+    connection = sqlite3.connect(path)
+    cursor = connection.cursor()
+    cursor.execute("SELECT * FROM Tasks WHERE ProjectID = ?", (projectID,))
+    cursor.fetchall()
+    connection.commit()
+    connection.close()
+
+#The same click going through the pooled connection manager
+def PooledClick(path, projectID):
+    db = Database(path)
+    db.connect()
+    db.get_tasks(projectID)
+    db.disconnect()
+
+def Main(seconds=2.0):
+    path = TemporaryDatabase()
+    try:
+        projectID = sqlite3.connect(path).execute("SELECT MIN(ID) FROM Projects").fetchone()[0]
+        openPerCall = CallsPerSecond(lambda: OpenPerCallClick(path, projectID), seconds)
+        pooled = CallsPerSecond(lambda: PooledClick(path, projectID), seconds)
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"open per call: {openPerCall:10.0f} clicks/s")
+    print(f"pooled:        {pooled:10.0f} clicks/s")
+    print(f"speedup:       {pooled / openPerCall:10.1f}x")
+
+if __name__ == '__main__':
+    Main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
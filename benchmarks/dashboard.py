@@ -0,0 +1,39 @@
+import sys
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+from services import ProjectService
+
+#What opening a project used to cost: the whole task list plus a name lookup per task leader
+def OldOpen(db, projectID):
+    db.get_project(projectID)
+    for task in db.execute_query("SELECT * FROM Tasks WHERE ProjectID = ?", (projectID,)):
+        db.execute_query("SELECT Forename FROM Employees WHERE ID == ?", (task[4],))
+
+def Time(function, repeats=5):
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def Main(rows=100000):
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        db = Database(path)
+        projects = ProjectService(db)
+        old = Time(lambda: OldOpen(db, 1))
+        #Clearing the cache each time measures the query itself rather than a cache hit
+        new = Time(lambda: (db.manager.cache.clear(), projects.dashboard(1)))
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"open a project with {rows} tasks: full scan and name lookups {old * 1000:9.2f} ms, dashboard {new * 1000:7.3f} ms")
+
+if __name__ == '__main__':
+    Main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
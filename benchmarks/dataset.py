@@ -0,0 +1,103 @@
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import SOURCE_DATABASE
+from benchmarks.search import WORDS, WEIGHTS
+from database import Database, CloseAllConnections
+
+#Builds synthetic databases with the same Projects, Employees and Tasks tables as the shipped
+#Database.db, at any scale. Tasks are spread over projects with a Zipf-like skew, so a few projects
+#are huge and most are small, which is what makes "open project" interesting. The same arguments
+#and seed always give the same database
+FORENAMES = ["Daniel", "Morgan", "Alfie", "Priya", "Sam", "Chen", "Olivia", "Kwame", "Sofia", "Liam", "Aisha", "Noah"]
+SURNAMES = ["Garcia", "Payne", "Homeson", "Patel", "Nguyen", "Okafor", "Smith", "Kowalski", "Murphy", "Haddad"]
+EXPERTISE = ["Python", "Databases", "UI", "Testing", "Networking", "Security", "Graphics", "DevOps"]
+FIRST_DAY = datetime.date(2020, 1, 1)
+CHUNK_SIZE = 50000
+
+#The CREATE TABLE statements of the shipped database, so the synthetic one starts from the same schema
+def SourceSchema():
+    source = sqlite3.connect(SOURCE_DATABASE)
+    try:
+        return [row[0] for row in source.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name IN ('Projects', 'Employees', 'Tasks')")]
+    finally:
+        source.close()
+
+def Dates(generator, longest):
+    start = FIRST_DAY + datetime.timedelta(days=generator.randrange(6 * 365))
+    return start.isoformat(), (start + datetime.timedelta(days=generator.randint(1, longest))).isoformat()
+
+def Employees(generator, count):
+    for i in range(1, count + 1):
+        yield (i, generator.choice(FORENAMES), f"{generator.choice(SURNAMES)}{i}", generator.randint(18, 65),
+               generator.choice(EXPERTISE), "")
+
+def Projects(generator, count, employees):
+    for i in range(1, count + 1):
+        start, end = Dates(generator, 720)
+        yield (i, f"Project {i}", start, end, generator.randint(1, 500) * 1000, generator.randint(1, employees))
+
+#Project i gets a share of the tasks proportional to 1 / i ** skew
+def Tasks(generator, count, projects, employees, skew):
+    projectWeights = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(projects)))
+    projectIDs = range(1, projects + 1)
+    for i in range(count):
+        start, end = Dates(generator, 90)
+        words = generator.choices(WORDS, cum_weights=WEIGHTS, k=15)
+        yield (None, generator.choices(projectIDs, cum_weights=projectWeights)[0], start, end,
+               generator.randint(1, employees), " ".join(words[:3]), " ".join(words[3:]))
+
+#Writes a new database at path. Rows go in with no indexes or triggers, then opening it through
+#Database runs the migrations, which build the indexes, search tables and counts in bulk
+def BuildDataset(path, tasks, projects=None, employees=None, skew=1.0, seed=0):
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    projects = projects or max(10, tasks // 1000)
+    employees = employees or max(20, min(tasks // 100, 100000))
+    generator = random.Random(seed)
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("BEGIN")
+        for statement in SourceSchema():
+            connection.execute(statement)
+        connection.executemany("INSERT INTO Employees VALUES (?, ?, ?, ?, ?, ?)", Employees(generator, employees))
+        connection.executemany("INSERT INTO Projects VALUES (?, ?, ?, ?, ?, ?)", Projects(generator, projects, employees))
+        rows = Tasks(generator, tasks, projects, employees, skew)
+        while True:
+            chunk = list(itertools.islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            connection.executemany("INSERT INTO Tasks VALUES (?, ?, ?, ?, ?, ?, ?)", chunk)
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+    Database(path).connect()
+    CloseAllConnections()
+    return {"tasks": tasks, "projects": projects, "employees": employees, "skew": skew, "seed": seed}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a synthetic Database.db")
+    parser.add_argument("path")
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--projects", type=int)
+    parser.add_argument("--employees", type=int)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+    start = time.perf_counter()
+    try:
+        details = BuildDataset(arguments.path, arguments.tasks, arguments.projects, arguments.employees,
+                               arguments.skew, arguments.seed)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+    print(f"Built {details} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,72 @@
+import sqlite3
+import sys
+import threading
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+from purge import PurgeJob
+
+#Times the slowest write another thread manages while the delete runs, i.e. how long the delete
+#keeps everyone else waiting for the write lock
+class WriterProbe:
+    def __init__(self, path):
+        self.db = Database(path)
+        self.worst = 0.0
+        self.running = True
+        self.thread = threading.Thread(target=self.Run)
+        self.thread.start()
+
+    def Run(self):
+        while self.running:
+            start = time.perf_counter()
+            try:
+                self.db.update_person(2, "Daniel", "Garcia", 30, "Python", "probe")
+            except sqlite3.OperationalError:
+                #Gave up after the connection's busy timeout
+                pass
+            self.worst = max(self.worst, time.perf_counter() - start)
+            time.sleep(0.002)
+
+    def Stop(self):
+        self.running = False
+        self.thread.join()
+        return self.worst
+
+#Deletes project 1 after giving it the given number of tasks, either all at once through the
+#cascade or soft deleted and purged by PurgeJob, and reports the time and the worst writer stall
+def Run(rows, soft):
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        db = Database(path)
+        probe = WriterProbe(path)
+        start = time.perf_counter()
+        if soft:
+            db.mark_projects_deleted([1])
+            hidden = time.perf_counter() - start
+            job = PurgeJob(db)
+            job.Wake()
+            while db.has_deleted_projects():
+                time.sleep(0.05)
+            job.Stop()
+        else:
+            db.delete_projects([1])
+        total = time.perf_counter() - start
+        stall = probe.Stop()
+        left = db.execute_query("SELECT COUNT(*) FROM Tasks WHERE ProjectID = 1")[0][0]
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    if soft:
+        print(f"soft delete + purge of {rows} tasks: gone from the list in {hidden * 1000:.2f} ms, purged in "
+              f"{total:.1f}s in the background, worst writer stall {stall * 1000:.0f} ms, {left} left")
+    else:
+        print(f"cascading delete of {rows} tasks: {total:.1f}s in one transaction, "
+              f"worst writer stall {stall * 1000:.0f} ms, {left} left")
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    Run(rows, soft=False)
+    Run(rows, soft=True)
@@ -0,0 +1,73 @@
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from client import RemoteServices
+from database import CloseAllConnections
+
+def Percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+#One simulated user: mostly browsing, with a share of task inserts and edits
+def Client(url, requests, writeShare, latencies, errors, seed):
+    projects, people, tasks, _, _, _, _ = RemoteServices(url)
+    generator = random.Random(seed)
+    leader = people.names()[0]
+    projectIDs = [row[0] for row in projects.page(None, 100)]
+    for i in range(requests):
+        projectID = generator.choice(projectIDs)
+        start = time.perf_counter()
+        try:
+            if generator.random() < writeShare:
+                taskID = tasks.add(projectID, f"Load test task {i}", "01/01/23", "02/01/23", leader, "")
+                tasks.update(taskID, f"Load test task {i}", "01/01/23", "03/01/23", "edited")
+            else:
+                projects.get(projectID)
+                tasks.page(projectID, None, 50)
+        except Exception as error:
+            errors.append(error)
+        latencies.append(time.perf_counter() - start)
+
+def Main():
+    parser = argparse.ArgumentParser(description="Load test a server.py instance on localhost")
+    parser.add_argument("--url", help="existing server to test; by default one is started on a temporary database")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    arguments = parser.parse_args()
+
+    server = None
+    path = None
+    url = arguments.url
+    if url is None:
+        from server import StartServer
+        path = TemporaryDatabase()
+        server = StartServer(dbName=path)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        latencies = []
+        errors = []
+        threads = [threading.Thread(target=Client, args=(url, arguments.requests, arguments.write_share, latencies, errors, seed))
+                   for seed in range(arguments.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            CloseAllConnections()
+            RemoveTemporaryDatabase(path)
+    print(f"{len(latencies)} requests from {arguments.clients} clients in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} req/s")
+    print(f"p50 {Percentile(latencies, 0.50) * 1000:.2f} ms  p99 {Percentile(latencies, 0.99) * 1000:.2f} ms  errors {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {error!r}")
+
+if __name__ == '__main__':
+    Main()
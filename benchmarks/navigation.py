@@ -0,0 +1,57 @@
+import sys
+import time
+import tkinter as tk
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+
+#Counts every widget that currently exists under the window
+def WidgetCount(widget):
+    return sum(1 + WidgetCount(child) for child in widget.winfo_children())
+
+#Lets background jobs finish and their results reach the screen
+def Settle(window):
+    deadline = time.perf_counter() + 2.0
+    while time.perf_counter() < deadline:
+        window.root.update()
+        if window.executor is None or not window.executor.jobs:
+            return
+        time.sleep(0.001)
+
+#Clicks around the project and people screens for a long session, reporting how long each round of
+#navigation took and whether the number of live widgets stays flat
+def Main(rounds=500):
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("No display available, skipping the navigation benchmark")
+        return
+    path = TemporaryDatabase()
+    try:
+        import main
+        main.ConnectServices(path)
+        window = main.Windows("Title Screen", 1280, 720)
+        window.admin = True
+        projectID = main.projectService.page(None, 1)[0][0]
+        personID = main.peopleService.page(None, 1)[0][0]
+        latencies = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            main.ShowProjectWindow(window)
+            Settle(window)
+            main.ShowProjectData(window, main.projectService.get(projectID))
+            Settle(window)
+            main.ShowPeopleWindow(window)
+            Settle(window)
+            main.ShowPeopleData(window, main.peopleService.get(personID))
+            window.root.update()
+            latencies.append(time.perf_counter() - start)
+            if i % 100 == 0 or i == rounds - 1:
+                recent = sorted(latencies[-100:])
+                print(f"round {i:5d}: p50 {recent[len(recent) // 2] * 1000:7.2f} ms  widgets {WidgetCount(window.root):5d}  "
+                      f"tempWidgets {len(window.tempWidgets):3d}  created {window.pool.created:5d}  reused {window.pool.reused:6d}")
+        window.destroy()
+    finally:
+        RemoveTemporaryDatabase(path)
+
+if __name__ == '__main__':
+    Main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,112 @@
+import re
+import sys
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections, LIVE_PROJECTS
+
+#The Database calls behind each click, and what EXPLAIN QUERY PLAN has to show for the statements
+#each one sends. The plans are taken from what the methods actually run, so a change to a query
+#is checked as soon as it is made
+HOT_CALLS = [
+    #The project list, and the live filter as a primary key lookup in DeletedProjects
+    ("get_projects", lambda db: db.get_projects(), ["USING ROWID SEARCH ON TABLE DeletedProjects"]),
+    ("get_project_names", lambda db: db.get_project_names(), ["COVERING INDEX ProjectsNameIndex"]),
+    ("count_projects", lambda db: db.count_rows("Projects", LIVE_PROJECTS),
+     ["USING COVERING INDEX", "USING ROWID SEARCH ON TABLE DeletedProjects"]),
+    ("page_projects", lambda db: db.page_projects(None, 30), ["SEARCH Projects USING INTEGER PRIMARY KEY (rowid>?)"]),
+    ("get_employee_names", lambda db: db.get_employee_names(), ["COVERING INDEX EmployeesNameIndex"]),
+    ("get_employee_id", lambda db: db.get_employee_id("Daniel", "Garcia"),
+     ["COVERING INDEX EmployeesNameIndex (Forename=? AND Surname=?)"]),
+    ("page_employees", lambda db: db.page_employees(None, 30), ["SEARCH Employees USING INTEGER PRIMARY KEY (rowid>?)"]),
+    #A project's task list: its size, page anchors and pages
+    ("get_tasks", lambda db: db.get_tasks(1), ["SEARCH Tasks USING INDEX"]),
+    ("count_tasks", lambda db: db.count_rows("Tasks", "WHERE ProjectID = ?", (1,)), ["SEARCH Tasks USING COVERING INDEX"]),
+    ("page_anchors", lambda db: db.page_anchors("Tasks", 200, "WHERE ProjectID = ?", (1,)),
+     ["COVERING INDEX TasksProjectIndex (ProjectID=?)"]),
+    ("page_tasks", lambda db: db.page_tasks(1, None, 30), ["COVERING INDEX TasksProjectIndex (ProjectID=? AND ID>?)"]),
+    ("iter_tasks", lambda db: db.iter_tasks(1), ["INDEX TasksProjectIndex (ProjectID=? AND ID>?)"]),
+    ("get_task", lambda db: db.get_task(1), ["SEARCH Tasks USING INTEGER PRIMARY KEY (rowid=?)"]),
+    ("get_project_dashboard", lambda db: db.get_project_dashboard(1),
+     ["SEARCH Projects USING INTEGER PRIMARY KEY (rowid=?)", "COVERING INDEX TasksTimelineIndex",
+      "COVERING INDEX TasksEndIndex", "SEARCH Counts USING PRIMARY KEY (ProjectID=?)"]),
+    #Date ranges, which also check each value looks like a date
+    ("get_overdue_tasks", lambda db: db.get_overdue_tasks("2024-01-01"), ["INDEX TasksDueIndex (EndDate<?)"]),
+    ("get_tasks_due_between", lambda db: db.get_tasks_due_between("2023-07-01", "2023-09-30"),
+     ["INDEX TasksDueIndex (EndDate>? AND EndDate<?)"]),
+    ("get_projects_active_between", lambda db: db.get_projects_active_between("2023-07-01", "2023-09-30"),
+     ["INDEX ProjectsDatesIndex"]),
+    ("iter_timeline", lambda db: db.iter_timeline(1, "2023-07-01", "2023-09-30"),
+     ["INDEX TasksTimelineIndex (ProjectID=? AND StartDate<?)"]),
+    ("get_leader_tasks_between", lambda db: db.get_leader_tasks_between(2, "2023-07-01", "2023-09-30"),
+     ["INDEX TasksLeaderDatesIndex (Task Leader=? AND StartDate<?)"]),
+    #Building a schedule: the project's tasks, then each one's dependencies by primary key
+    ("get_schedule_tasks", lambda db: db.get_schedule_tasks(1), ["SEARCH Tasks USING COVERING INDEX"]),
+    ("get_project_dependencies", lambda db: db.get_project_dependencies(1),
+     ["SEARCH Dependencies USING PRIMARY KEY (TaskID=?)"]),
+    ("get_dependencies", lambda db: db.get_dependencies(1), ["SEARCH Dependencies USING PRIMARY KEY (TaskID=?)"]),
+    ("get_dependency_lags", lambda db: db.get_dependency_lags(1), ["USING PRIMARY KEY (TaskID=?)"]),
+    ("search_tasks", lambda db: db.search_tasks("game"), ["VIRTUAL TABLE INDEX"]),
+    #Finding projects to archive takes each one's last task end date from the index. It orders by
+    #that date, which no index can hold, so it is the one call allowed to sort
+    ("get_archive_candidates", lambda db: db.get_archive_candidates("2024-01-01"), ["COVERING INDEX TasksEndIndex"]),
+]
+
+SORTED_CALLS = {"get_archive_candidates"}
+
+#Runs one call against db with nothing cached, reading any iterator it returns to the end, and
+#returns the (query, parameters) of every statement it sent
+def SentStatements(db, call):
+    sent = []
+    def Recording(method):
+        def Record(query, parameters=None, *args, **kwargs):
+            sent.append((query, parameters))
+            return method(query, parameters, *args, **kwargs)
+        return Record
+    db.manager.cache.clear()
+    db.execute_query, db.iter_batches = Recording(db.execute_query), Recording(db.iter_batches)
+    try:
+        result = call(db)
+        if hasattr(result, "__next__"):
+            for _ in result:
+                pass
+    finally:
+        del db.execute_query, db.iter_batches
+    return sent
+
+#Straight on the connection, so it isn't cached or recorded as one of the call's statements
+def QueryPlan(db, query, parameters):
+    rows = db.connection.execute("EXPLAIN QUERY PLAN " + query, parameters or ())
+    return " | ".join(row[-1] for row in rows)
+
+#What is wrong with the plans of the statements a call sent, if anything: a fragment it was
+#expected to show that none of them does, a full read of Tasks, or a sort outside an index
+def PlanProblems(name, plans, expected):
+    problems = [f"no {fragment}" for fragment in expected if not any(fragment in plan for plan in plans)]
+    if any(re.search(r"\bSCAN Tasks\b", plan) for plan in plans):
+        problems.append("reads all of Tasks")
+    if name not in SORTED_CALLS and any("USE TEMP B-TREE" in plan for plan in plans):
+        problems.append("sorts in a temporary b-tree")
+    if not plans:
+        problems.append("sent no statements")
+    return problems
+
+#Prints every hot call's plans and exits non-zero if one of them isn't using its index
+def Main():
+    path = TemporaryDatabase()
+    failures = 0
+    try:
+        db = Database(path)
+        for name, call, expected in HOT_CALLS:
+            plans = [QueryPlan(db, query, parameters) for query, parameters in SentStatements(db, call)]
+            problems = PlanProblems(name, plans, expected)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {name} {', '.join(problems)}")
+            for plan in plans:
+                print(f"     {plan}")
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    return failures
+
+if __name__ == '__main__':
+    sys.exit(1 if Main() else 0)
@@ -0,0 +1,64 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+from main import PagedRowSource
+from records import Task
+
+#Bytes held per row by whatever build() returns, and how long building it took
+def Measure(build, rows):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / rows, elapsed
+
+#The old task list: every full row as a tuple, plus a click handler closing over each one
+def TuplesWithHandlers(db):
+    rows = db.execute_query("SELECT * FROM Tasks WHERE ProjectID = ?", (1,))
+    return rows, [lambda event, data=row: data for row in rows]
+
+def Records(db):
+    return db.execute_query("SELECT * FROM Tasks WHERE ProjectID = ?", (1,), Task.FromRow)
+
+#The list view now: IDs and descriptions for the pages that have been scrolled through, with
+#the full record fetched only when a row is clicked
+def ScrolledList(db, rows):
+    source = PagedRowSource(lambda: db.count_rows("Tasks", "WHERE ProjectID = ?", (1,)),
+                            lambda pageSize: db.page_anchors("Tasks", pageSize, "WHERE ProjectID = ?", (1,)),
+                            lambda afterID, limit: db.page_tasks(1, afterID, limit))
+    for index in range(0, rows, 50):
+        source.get(index)
+    return source
+
+def Main(rows=100000):
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        db = Database(path)
+        #Page fetches go through the query cache, which would otherwise be counted as the list's
+        db.manager.cache.maxBytes = 0
+        total = db.count_rows("Tasks", "WHERE ProjectID = ?", (1,))
+        results = [
+            ("tuples", Measure(lambda: db.execute_query("SELECT * FROM Tasks WHERE ProjectID = ?", (1,)), total)),
+            ("tuples + click closures", Measure(lambda: TuplesWithHandlers(db), total)),
+            ("Task records", Measure(lambda: Records(db), total)),
+            ("paged list, scrolled end to end", Measure(lambda: ScrolledList(db, total), total)),
+        ]
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"{total} task rows")
+    for name, (perRow, elapsed) in results:
+        print(f"{name:34} {perRow:8.1f} bytes/row  built in {elapsed * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    Main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
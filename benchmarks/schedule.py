@@ -0,0 +1,101 @@
+import graphlib
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import BuildDataset
+from database import Database, CloseAllConnections
+from schedule import Scheduler
+
+#Schedules one project with the given number of tasks, each depending on up to two of the 50 tasks
+#before it. Times the first build, recalculating after a task's dates are edited, and after a
+#dependency that goes against the current order is added, then checks every earliest start and
+#float against a plain forward and backward pass over the whole project
+#
+#   python -m benchmarks.schedule 100000
+EDITS = 100
+
+def AddDependencies(path, taskIDs, generator):
+    rows = {}
+    for position in range(1, len(taskIDs)):
+        for i in range(generator.randint(0, 2)):
+            other = taskIDs[max(0, position - generator.randint(1, 50))]
+            rows[(taskIDs[position], other)] = generator.randint(0, 3)
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany("INSERT INTO TaskDependencies VALUES (?, ?, ?)",
+                               [(taskID, other, lag) for (taskID, other), lag in rows.items()])
+    connection.close()
+    return len(rows)
+
+#(earliest start, float) of every task and the finish, worked out from scratch
+def Recalculated(db, projectID):
+    tasks = {taskID: (start, end) for rows in db.get_schedule_tasks(projectID) for taskID, start, end in rows}
+    predecessors = {taskID: [] for taskID in tasks}
+    successors = {taskID: [] for taskID in tasks}
+    for rows in db.get_project_dependencies(projectID):
+        for taskID, other, lag in rows:
+            predecessors[taskID].append((other, lag))
+            successors[other].append((taskID, lag))
+    order = list(graphlib.TopologicalSorter({taskID: [other for other, lag in edges]
+                                             for taskID, edges in predecessors.items()}).static_order())
+    starts, ends, tails = {}, {}, {}
+    for taskID in order:
+        starts[taskID] = max([tasks[taskID][0]] + [ends[other] + lag for other, lag in predecessors[taskID]])
+        ends[taskID] = starts[taskID] + tasks[taskID][1] - tasks[taskID][0]
+    finish = max(ends.values())
+    for taskID in reversed(order):
+        tails[taskID] = tasks[taskID][1] - tasks[taskID][0] + max([0] + [tails[other] + lag for other, lag in successors[taskID]])
+    return {taskID: (starts[taskID], finish - tails[taskID] - starts[taskID]) for taskID in tasks}, finish
+
+def Mismatches(db, scheduler, projectID):
+    expected, finish = Recalculated(db, projectID)
+    with scheduler.lock:
+        schedule = scheduler.Get(projectID)
+    mismatches = int(finish != schedule.finish) + abs(len(expected) - len(schedule.index))
+    for taskID, (start, slack) in expected.items():
+        slot = schedule.index.get(taskID)
+        if slot is None or (schedule.starts[slot], schedule.finish - schedule.tails[slot] - schedule.starts[slot]) != (start, slack):
+            mismatches += 1
+    return mismatches
+
+def Timed(scheduler, projectID):
+    start = time.perf_counter()
+    with scheduler.lock:
+        scheduler.Get(projectID)
+    return time.perf_counter() - start
+
+def Main(tasks):
+    folder = tempfile.mkdtemp(prefix="pyrojectbench-")
+    path = os.path.join(folder, "Database.db")
+    try:
+        BuildDataset(path, tasks, projects=1)
+        db = Database(path)
+        taskIDs = [row[0] for row in db.execute_query("SELECT ID FROM Tasks WHERE ProjectID = 1 ORDER BY ID")]
+        generator = random.Random(0)
+        dependencies = AddDependencies(path, taskIDs, generator)
+        scheduler = Scheduler(db)
+        print(f"built the schedule of {len(taskIDs)} tasks and {dependencies} dependencies in "
+              f"{Timed(scheduler, 1):.2f}s")
+        edits = []
+        for i in range(EDITS):
+            day = generator.randint(1, 28)
+            db.update_task(generator.choice(taskIDs), "Edited", f"2022-03-{day:02}", f"2022-04-{day:02}", "")
+            edits.append(Timed(scheduler, 1))
+        edits.sort()
+        print(f"after editing a task: {edits[len(edits) // 2] * 1000:.2f} ms median, {edits[-1] * 1000:.2f} ms worst")
+        db.set_dependencies(taskIDs[10], [(taskIDs[len(taskIDs) // 2], 0)])
+        print(f"after a dependency that reorders the tasks: {Timed(scheduler, 1) * 1000:.2f} ms")
+        mismatches = Mismatches(db, scheduler, 1)
+        print(f"{'ok  ' if not mismatches else 'FAIL'} {mismatches} tasks differ from recalculating from scratch")
+        CloseAllConnections()
+        return mismatches
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(1 if Main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000) else 0)
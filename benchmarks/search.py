@@ -0,0 +1,56 @@
+import itertools
+import random
+import sys
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+
+#A made up vocabulary used with a Zipf-like skew, so a few words are very common and most are rare
+def Vocabulary(size=20000, seed=1):
+    generator = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(generator.choices(letters, k=generator.randint(3, 9))) for i in range(size)]
+
+WORDS = Vocabulary()
+WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(WORDS))))
+
+def AddTasks(path, rows, seed=1):
+    generator = random.Random(seed)
+    db = Database(path)
+    db.execute_many("INSERT INTO Tasks VALUES (NULL, 1, '2023-01-01', '2023-02-01', 2, ?, ?)",
+                    ((" ".join(generator.choices(WORDS, cum_weights=WEIGHTS, k=3)), " ".join(generator.choices(WORDS, cum_weights=WEIGHTS, k=12)))
+                     for i in range(rows)))
+    CloseAllConnections()
+
+#Empties the query cache first so every call pays the full FTS cost
+def Search(db, text):
+    db.manager.cache.clear()
+    return db.search_tasks(text, 20)
+
+def Main(rows=1000000):
+    path = TemporaryDatabase()
+    try:
+        start = time.perf_counter()
+        AddTasks(path, rows)
+        print(f"built {rows} tasks in {time.perf_counter() - start:.1f}s")
+        db = Database(path)
+        generator = random.Random(2)
+        for label, makeQuery in (("common word", lambda: WORDS[0]),
+                                 ("one word", lambda: generator.choices(WORDS, cum_weights=WEIGHTS)[0]),
+                                 ("two words", lambda: " ".join(generator.choices(WORDS, cum_weights=WEIGHTS, k=2))),
+                                 ("prefix", lambda: generator.choices(WORDS, cum_weights=WEIGHTS)[0][:3])):
+            latencies = []
+            for i in range(200):
+                text = makeQuery()
+                start = time.perf_counter()
+                Search(db, text)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            print(f"{label:>12}: p50 {latencies[100]:7.2f} ms  p95 {latencies[190]:7.2f} ms")
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+
+if __name__ == '__main__':
+    Main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
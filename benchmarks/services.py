@@ -0,0 +1,48 @@
+import sys
+import threading
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+from services import ProjectService, PeopleService, TaskService
+
+#A headless user session: open the project list, open a project, add a task and edit it
+def Session(db, operations, errors):
+    projects = ProjectService(db)
+    people = PeopleService(db)
+    tasks = TaskService(db)
+    leader = people.names()[0]
+    try:
+        for i in range(operations):
+            projectID = projects.page(None, 50)[i % projects.count()][0]
+            projects.get(projectID)
+            tasks.page(projectID, None, 200)
+            taskID = tasks.add(projectID, f"Concurrent task {i}", "01/01/23", "02/01/23", leader, "")
+            tasks.update(taskID, f"Concurrent task {i} edited", "01/01/23", "03/01/23", "")
+    except Exception as error:
+        errors.append(error)
+
+def Main(threads=8, operations=500):
+    path = TemporaryDatabase()
+    try:
+        db = Database(path)
+        errors = []
+        workers = [threading.Thread(target=Session, args=(db, operations, errors)) for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        added = db.count_rows("Tasks", "WHERE Description LIKE 'Concurrent task %'")
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"{threads} sessions x {operations} operations: {threads * operations / elapsed:8.0f} sessions/s, "
+          f"{added} tasks added, {len(errors)} errors")
+    for error in errors:
+        print(f"  {error!r}")
+    return 1 if errors or added != threads * operations else 0
+
+if __name__ == '__main__':
+    sys.exit(Main(*[int(argument) for argument in sys.argv[1:]]))
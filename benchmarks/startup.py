@@ -0,0 +1,113 @@
+import re
+import subprocess
+import sys
+import time
+import tkinter as tk
+
+from benchmarks.common import REPO_DIR, TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.navigation import Settle
+
+#Times starting the app: importing main and the modules that take longest to import, then, when
+#there is a display, a cold start up to the login window in a fresh process and on to the services
+#being ready behind it, and opening a task's detail window the first time and again after closing
+#it, next to what making another tk.Tk costs
+#
+#   python -m benchmarks.startup
+RUNS = 5
+OPENS = 50
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+import main
+window = main.ShowLoginWindow()
+window.root.update()
+shown = time.perf_counter() - start
+main.ConnectServices(sys.argv[1])
+main.WarmUp()
+print(shown, time.perf_counter() - start)
+window.root.destroy()
+"""
+
+def Median(samples):
+    return sorted(samples)[len(samples) // 2]
+
+#Seconds to import main, and to import each module main imports directly, from python -X importtime
+def ImportTimes():
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True).stderr
+    total, modules = 0.0, {}
+    for line in output.splitlines():
+        match = re.fullmatch(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+        if match is None:
+            continue
+        seconds, depth, name = int(match.group(1)) / 1e6, len(match.group(2)), match.group(3)
+        if name == "main" and depth == 1:
+            total = seconds
+        elif depth == 3:
+            modules[name] = seconds
+    return total, modules
+
+#Seconds from starting to import main until the login window is drawn, and until the services
+#behind it are connected and warmed up
+def ColdStart(path):
+    output = subprocess.run([sys.executable, "-c", COLD_START, path], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    shown, ready = output.strip().splitlines()[-1].split()
+    return float(shown), float(ready)
+
+#Seconds to open a task's detail window for the first time, and the median of opening it again
+def DetailOpens(main, window):
+    task = main.taskService.get(main.taskService.page(main.projectService.page(None, 1)[0][0], None, 1)[0][0])
+    times = []
+    for i in range(OPENS):
+        start = time.perf_counter()
+        main.ShowTaskData(task, window)
+        detailWindow = main.detailWindows["task"]
+        Settle(detailWindow)
+        times.append(time.perf_counter() - start)
+        detailWindow.destroy()
+        window.root.update()
+    return times[0], Median(times[1:])
+
+def NewInterpreter():
+    start = time.perf_counter()
+    root = tk.Tk()
+    root.update()
+    elapsed = time.perf_counter() - start
+    root.destroy()
+    return elapsed
+
+def Main():
+    imports = [ImportTimes() for i in range(RUNS)]
+    total = Median([total for total, modules in imports])
+    print(f"import main: {total * 1000:.1f} ms median of {RUNS}")
+    modules = imports[-1][1]
+    for name in sorted(modules, key=modules.get, reverse=True)[:8]:
+        print(f"  {name:>12}: {modules[name] * 1000:6.1f} ms")
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("No display available, skipping the cold start and detail window timings")
+        return
+    path = TemporaryDatabase()
+    try:
+        starts = [ColdStart(path) for i in range(RUNS)]
+        print(f"cold start to the login window: {Median([shown for shown, ready in starts]) * 1000:.0f} ms, "
+              f"services ready: {Median([ready for shown, ready in starts]) * 1000:.0f} ms, median of {RUNS}")
+        interpreter = Median([NewInterpreter() for i in range(RUNS)])
+        import database
+        import main
+        main.ConnectServices(path)
+        window = main.Windows("Title Screen", 1280, 720)
+        window.admin = True
+        first, again = DetailOpens(main, window)
+        print(f"task detail window: {first * 1000:.1f} ms the first time, {again * 1000:.1f} ms median after that, "
+              f"a new tk.Tk takes {interpreter * 1000:.1f} ms")
+        window.destroy()
+        database.CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+
+if __name__ == '__main__':
+    Main()
@@ -0,0 +1,108 @@
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+
+#Peak memory of reading every task of a project that has the given number of them: as one list,
+#through an open cursor, and page by page with iter_tasks and page_tasks. Each way runs in its own
+#process, and the run fails if a streaming read grows the process's peak RSS by more than the
+#Python objects it may hold at once plus SQLite's page cache, or allocates more than those objects.
+#The reads are measured with mmap off: mapped pages of the file are the OS's cache of it, shared
+#and capped by mmap_size, and would otherwise count towards RSS whatever the reader does
+#
+#   python -m benchmarks.streaming 1000000
+
+#Most each streaming read may allocate at once, in MB
+STREAMING_LIMIT_MB = 10
+STREAMING_MODES = ("cursor", "iter_tasks", "page_tasks")
+
+def Baseline(db):
+    db.count_rows("Tasks")
+
+def WholeList(db):
+    for task in db.get_tasks(1):
+        pass
+
+def OpenCursor(db):
+    for row in db.iter_query("SELECT * FROM Tasks WHERE ProjectID = ?", (1,)):
+        pass
+
+def Keyset(db):
+    for task in db.iter_tasks(1):
+        pass
+
+#Scrolls the task list from top to bottom, as the list view would fetch it
+def Pages(db):
+    afterID = None
+    while True:
+        rows = db.page_tasks(1, afterID, 200)
+        if not rows:
+            return
+        afterID = rows[-1][0]
+
+MODES = {"baseline": Baseline, "list": WholeList, "cursor": OpenCursor, "iter_tasks": Keyset, "page_tasks": Pages}
+
+#Most memory SQLite's page cache can take on a connection, in bytes
+def PageCacheBytes(connection):
+    size = connection.execute("PRAGMA cache_size").fetchone()[0]
+    if size < 0:
+        return -size * 1024
+    return size * connection.execute("PRAGMA page_size").fetchone()[0]
+
+def Child(mode, path):
+    db = Database(path)
+    db.connection.execute("PRAGMA mmap_size = 0")
+    Baseline(db)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    tracemalloc.start()
+    MODES[mode](db)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - start
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    print(elapsed, grown * 1024, allocated, PageCacheBytes(db.connection))
+    CloseAllConnections()
+
+#(seconds, peak RSS growth, Python objects allocated at once, page cache size) of one way of
+#reading the tasks, the sizes in MB
+def Measure(mode, path):
+    output = subprocess.run([sys.executable, "-m", "benchmarks.streaming", "--child", mode, path],
+                            capture_output=True, text=True, check=True).stdout.split()
+    seconds, grown, allocated, pageCache = float(output[0]), *(int(value) / 1024 / 1024 for value in output[1:])
+    return seconds, grown, allocated, pageCache
+
+#What a streaming read went over, if anything
+def Problems(grown, allocated, pageCache):
+    problems = []
+    if grown > STREAMING_LIMIT_MB + pageCache:
+        problems.append(f"peak RSS grew {grown:.1f}MB, over {STREAMING_LIMIT_MB + pageCache:.1f}MB")
+    if allocated > STREAMING_LIMIT_MB:
+        problems.append(f"Python objects took {allocated:.1f}MB, over {STREAMING_LIMIT_MB}MB")
+    return problems
+
+def Main(rows):
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        results = {mode: Measure(mode, path) for mode in MODES}
+    finally:
+        RemoveTemporaryDatabase(path)
+    failures = 0
+    for mode, (seconds, grown, allocated, pageCache) in results.items():
+        problems = Problems(grown, allocated, pageCache) if mode in STREAMING_MODES else []
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok  '} {mode:>10}: {seconds:7.2f}s  peak RSS +{grown:7.1f}MB  "
+              f"Python objects {allocated:7.1f}MB  {', '.join(problems)}")
+    return failures
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        Child(sys.argv[2], sys.argv[3])
+    else:
+        sys.exit(1 if Main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000) else 0)
@@ -0,0 +1,214 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+from benchmarks.common import Percentile, REPO_DIR
+from benchmarks.dataset import BuildDataset
+from benchmarks.search import WORDS, WEIGHTS
+from database import Database, CloseAllConnections
+from purge import PurgeAll
+
+#Runs the everyday operations headless against a synthetic database, through the same services and
+#databaseController functions the screens call, and writes ops/sec and latency percentiles as JSON
+#so runs from different commits can be compared:
+#
+#   python -m benchmarks.suite --tasks 100000 --output before.json
+#   python -m benchmarks.suite --tasks 100000 --output after.json
+#   python -m benchmarks.suite --compare before.json after.json
+
+#Stands in for the detail window the controller closes after a save
+class ClosedWindow:
+    def destroy(self):
+        pass
+
+#How many rows of a list are on screen when it opens
+VISIBLE_ROWS = 30
+
+class Scenarios:
+    def __init__(self, main, db, seed):
+        self.main = main
+        self.db = db
+        self.generator = random.Random(seed)
+        self.projectIDs = [row[0] for row in db.execute_query("SELECT ID FROM Projects ORDER BY ID")]
+        self.taskCount = db.execute_query("SELECT MAX(ID) FROM Tasks")[0][0] or 0
+        self.leaderName = main.peopleService.get(1).fullName
+
+    #Projects are picked with the same skew the dataset was built with, so big ones come up most
+    def Project(self):
+        return self.projectIDs[min(int(self.generator.paretovariate(1.0)) - 1, len(self.projectIDs) - 1)]
+
+    def FirstRows(self, source):
+        for index in range(min(source.count, VISIBLE_ROWS)):
+            source.get(index)
+
+    def ListProjects(self):
+        projects = self.main.projectService
+        self.FirstRows(self.main.PagedRowSource(projects.count, projects.page_anchors, projects.page))
+
+    def OpenProject(self):
+        projectID = self.Project()
+        tasks = self.main.taskService
+        self.main.projectService.dashboard(projectID)
+        self.FirstRows(self.main.PagedRowSource(lambda: tasks.count(projectID),
+                                                lambda pageSize: tasks.page_anchors(projectID, pageSize),
+                                                lambda afterID, limit: tasks.page(projectID, afterID, limit)))
+
+    def AddTask(self):
+        self.main.databaseController.SubmitNewTask(ClosedWindow(), "Benchmark task", "2024-03-01", self.leaderName,
+                                                   "2024-04-01", "added by the suite", self.Project())
+
+    def EditTask(self):
+        taskID = self.generator.randint(1, self.taskCount)
+        self.main.databaseController.SubmitTaskChanges(ClosedWindow(), taskID, "Edited task", "2024-03-01",
+                                                       "2024-05-01", "edited by the suite")
+
+    #The project and its tasks are made before the clock starts. The delete and the purge of its
+    #tasks are both timed, the purge here rather than on the purge job's thread
+    def PrepareDeleteProject(self):
+        projectID = self.main.projectService.add("Doomed project", "2024-01-01", "2024-12-31", 1000, self.leaderName)
+        for i in range(20):
+            self.main.taskService.add(projectID, f"Doomed task {i}", "2024-01-01", "2024-02-01", self.leaderName, "")
+        return projectID
+
+    def DeleteProject(self, projectID):
+        self.main.databaseController.DeleteProject(projectID)
+        PurgeAll(self.db)
+
+    def Search(self):
+        word = self.generator.choices(WORDS, cum_weights=WEIGHTS)[0]
+        self.main.taskService.search(word)
+        self.main.peopleService.search(word[:3])
+
+    #name -> (prepare or None, operation)
+    def All(self):
+        return {
+            "list_projects": (None, self.ListProjects),
+            "open_project": (None, self.OpenProject),
+            "add_task": (None, self.AddTask),
+            "edit_task": (None, self.EditTask),
+            "delete_project": (self.PrepareDeleteProject, self.DeleteProject),
+            "search": (None, self.Search),
+        }
+
+#Runs one scenario for about the given time. Unless warm, the query cache is emptied before every
+#operation so the numbers are for the database work rather than cache hits
+def RunScenario(db, prepare, operation, seconds, minimumOps, warm):
+    latencies = []
+    busy = 0.0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end or len(latencies) < minimumOps:
+        argument = prepare() if prepare is not None else None
+        if not warm:
+            db.manager.cache.clear()
+        start = time.perf_counter()
+        if prepare is not None:
+            operation(argument)
+        else:
+            operation()
+        elapsed = time.perf_counter() - start
+        busy += elapsed
+        latencies.append(elapsed * 1000)
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "opsPerSecond": len(latencies) / busy if busy else 0.0,
+        "meanMs": sum(latencies) / len(latencies),
+        "p50Ms": Percentile(latencies, 0.50),
+        "p90Ms": Percentile(latencies, 0.90),
+        "p99Ms": Percentile(latencies, 0.99),
+        "maxMs": latencies[-1],
+    }
+
+def CurrentCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def RunSuite(tasks=100000, seconds=2.0, minimumOps=20, warm=False, seed=0, databasePath=None, only=None):
+    folder = tempfile.mkdtemp(prefix="pyrojectsuite-")
+    path = os.path.join(folder, "Database.db")
+    try:
+        start = time.perf_counter()
+        if databasePath:
+            shutil.copyfile(databasePath, path)
+            dataset = {"source": os.path.abspath(databasePath)}
+        else:
+            dataset = BuildDataset(path, tasks, seed=seed)
+        dataset["buildSeconds"] = time.perf_counter() - start
+        import main
+        db = Database(path)
+        main.ConnectServices(path)
+        #Deleted projects are purged by the delete_project scenario itself
+        main.projectService.purger.Stop()
+        scenarios = Scenarios(main, db, seed)
+        results = {}
+        for name, (prepare, operation) in scenarios.All().items():
+            if only and name not in only:
+                continue
+            results[name] = RunScenario(db, prepare, operation, seconds, minimumOps, warm)
+        CloseAllConnections()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return {
+        "commit": CurrentCommit(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "dataset": dataset,
+        "warm": warm,
+        "secondsPerScenario": seconds,
+        "scenarios": results,
+    }
+
+def PrintResults(results):
+    print(f"commit {results['commit']}  dataset {results['dataset']}")
+    for name, result in results["scenarios"].items():
+        print(f"{name:>15}: {result['opsPerSecond']:9.1f} ops/s  p50 {result['p50Ms']:8.2f} ms  "
+              f"p90 {result['p90Ms']:8.2f} ms  p99 {result['p99Ms']:8.2f} ms  ({result['ops']} ops)")
+
+#Prints how each scenario changed between two result files
+def Compare(beforePath, afterPath):
+    with open(beforePath, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(afterPath, encoding="utf-8") as file:
+        after = json.load(file)
+    print(f"{before['commit']} -> {after['commit']}")
+    for name, result in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            print(f"{name:>15}: new")
+            continue
+        speed = result["opsPerSecond"] / old["opsPerSecond"] if old["opsPerSecond"] else float("inf")
+        print(f"{name:>15}: {speed:6.2f}x ops/s  p99 {old['p99Ms']:8.2f} -> {result['p99Ms']:8.2f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless benchmark of the everyday operations")
+    parser.add_argument("--tasks", type=int, default=100000, help="size of the synthetic database to build")
+    parser.add_argument("--database", help="benchmark a copy of this database instead of building one")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on each scenario")
+    parser.add_argument("--min-ops", type=int, default=20)
+    parser.add_argument("--warm", action="store_true", help="leave the query cache on between operations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="scenarios to run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    arguments = parser.parse_args()
+    if arguments.compare:
+        Compare(*arguments.compare)
+    else:
+        results = RunSuite(arguments.tasks, arguments.seconds, arguments.min_ops, arguments.warm, arguments.seed,
+                           arguments.database, arguments.only)
+        PrintResults(results)
+        if arguments.output:
+            with open(arguments.output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
@@ -0,0 +1,72 @@
+import sys
+import time
+import tkinter as tk
+
+from background import BackgroundExecutor
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.virtual_list import AddTasks
+from database import Database, CloseAllConnections
+
+FRAME_INTERVAL = 10
+
+#Ticks every FRAME_INTERVAL ms on the Tk thread and records the longest gap between ticks
+class StallMonitor:
+    def __init__(self, root):
+        self.root = root
+        self.maxStall = 0.0
+        self.last = time.perf_counter()
+        self.root.after(FRAME_INTERVAL, self.Tick)
+
+    def Tick(self):
+        now = time.perf_counter()
+        self.maxStall = max(self.maxStall, now - self.last)
+        self.last = now
+        self.root.after(FRAME_INTERVAL, self.Tick)
+
+#A click that needs a full scan of the task table, standing in for a slow or locked query
+def SlowQuery(db):
+    return db.execute_query("SELECT COUNT(*), MAX(length(Description || Comments)) FROM Tasks")
+
+def Measure(path, clicks, background):
+    root = tk.Tk()
+    db = Database(path)
+    monitor = StallMonitor(root)
+    executor = BackgroundExecutor(root)
+    remaining = [clicks]
+
+    def Click():
+        if background:
+            executor.Submit("click", lambda: SlowQuery(db), lambda result: None)
+        else:
+            SlowQuery(db)
+        remaining[0] -= 1
+        if remaining[0] > 0:
+            root.after(50, Click)
+        else:
+            root.after(500, root.quit)
+
+    root.after(50, Click)
+    root.mainloop()
+    executor.Shutdown()
+    root.destroy()
+    return monitor.maxStall
+
+def Main(rows=500000, clicks=20):
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("No display available, skipping the UI stall benchmark")
+        return
+    path = TemporaryDatabase()
+    try:
+        AddTasks(path, rows)
+        inline = Measure(path, clicks, False)
+        background = Measure(path, clicks, True)
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"max frame stall, queries on the Tk thread: {inline * 1000:8.1f} ms")
+    print(f"max frame stall, queries in background:    {background * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    Main(*[int(argument) for argument in sys.argv[1:]])
@@ -0,0 +1,66 @@
+import resource
+import subprocess
+import sys
+import time
+import tkinter as tk
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+
+def AddTasks(path, rows):
+    db = Database(path)
+    db.execute_many("INSERT INTO Tasks VALUES (NULL, 1, '2023-01-01', '2023-02-01', 2, ?, '')",
+                    ((f"Task {i}",) for i in range(rows)))
+    CloseAllConnections()
+
+#How the task list used to be built: every row fetched and packed as its own label
+def OpenPacked(root, db):
+    from main import ScrollableWindow
+    scrollable = ScrollableWindow(root, 733, 635, 0, 0)
+    for row in db.get_tasks(1):
+        box = tk.Label(scrollable.scrollable_frame, text=row.description, bg="white", relief="solid", bd=1, width=103)
+        box.pack()
+        box.bind("<Button-1>", lambda event, data=row: None)
+
+def OpenVirtual(root, db):
+    from main import VirtualListWindow, PagedRowSource
+    source = PagedRowSource(lambda: db.count_rows("Tasks", "WHERE ProjectID = ?", (1,)),
+                            lambda pageSize: db.page_anchors("Tasks", pageSize, "WHERE ProjectID = ?", (1,)),
+                            lambda afterID, limit: db.page_tasks(1, afterID, limit))
+    VirtualListWindow(root, 733, 635, 0, 0, source, lambda taskID: None, 103)
+
+#Runs in a child process so each measurement gets a clean peak RSS
+def Child(mode, path):
+    root = tk.Tk()
+    db = Database(path)
+    start = time.perf_counter()
+    (OpenVirtual if mode == "virtual" else OpenPacked)(root, db)
+    root.update()
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def Main(sizes):
+    try:
+        tk.Tk().destroy()
+    except tk.TclError:
+        print("No display available, skipping the list view benchmark")
+        return
+    for rows in sizes:
+        path = TemporaryDatabase()
+        try:
+            AddTasks(path, rows)
+            results = {}
+            for mode in ("packed", "virtual"):
+                output = subprocess.run([sys.executable, "-m", "benchmarks.virtual_list", "--child", mode, path],
+                                        capture_output=True, text=True, check=True).stdout.split()
+                results[mode] = (float(output[0]), int(output[1]) // 1024)
+        finally:
+            RemoveTemporaryDatabase(path)
+        print(f"{rows:>8} rows  packed {results['packed'][0]:7.3f}s {results['packed'][1]:5d}MB"
+              f"  virtual {results['virtual'][0]:7.3f}s {results['virtual'][1]:5d}MB")
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        Child(sys.argv[2], sys.argv[3])
+    else:
+        Main([int(size) for size in sys.argv[1:]] or [1000, 10000, 50000])
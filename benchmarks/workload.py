@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from analytics import Workload
+from benchmarks.dataset import BuildDataset
+from database import Database, CloseAllConnections
+from dates import DayText
+
+#Builds the workload profiles over a synthetic database with the given number of tasks, times the
+#build, the conflict and suggestion queries and keeping up with edits, then checks the profiles
+#against counting each person's tasks straight from the Tasks table
+#
+#   python -m benchmarks.workload 1000000
+WINDOW = ("2023-01-01", "2023-01-31")
+
+def Counted(db, leader, day):
+    rows = db.execute_query('SELECT StartDate, EndDate FROM Tasks WHERE "Task Leader" = ? AND '
+                            'IFNULL(ProjectID, 0) NOT IN (SELECT ID FROM DeletedProjects)', (leader,))
+    return sum(1 for start, end in rows if start <= day <= max(start, end))
+
+#Compares the peak on single days for random people against Counted; returns how many differ
+def Check(db, workload, samples=200):
+    generator = random.Random(0)
+    leaders = [row[0] for row in db.execute_query("SELECT ID FROM Employees")]
+    first, last = workload.Window(*WINDOW)
+    mismatches = 0
+    for i in range(samples):
+        leader = generator.choice(leaders)
+        day = DayText(generator.randrange(first - 1500, last + 1500))
+        mismatches += workload.Peak(leader, day, day) != Counted(db, leader, day)
+    return mismatches
+
+def Edits(db, workload, count=200):
+    generator = random.Random(1)
+    taskIDs = [row[0] for row in db.execute_query("SELECT ID FROM Tasks ORDER BY ID LIMIT ?", (count,))]
+    start = time.perf_counter()
+    for taskID in taskIDs:
+        db.update_task(taskID, "Edited", f"2023-01-{generator.randint(1, 28):02}", "2023-02-15", "")
+        with workload.lock:
+            workload.Refresh()
+    return (time.perf_counter() - start) / len(taskIDs)
+
+def Main(tasks):
+    folder = tempfile.mkdtemp(prefix="pyrojectbench-")
+    path = os.path.join(folder, "Database.db")
+    try:
+        BuildDataset(path, tasks)
+        db = Database(path)
+        workload = Workload(db)
+        tracemalloc.start()
+        start = time.perf_counter()
+        with workload.lock:
+            workload.Refresh()
+        built = time.perf_counter() - start
+        allocated = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"built profiles for {tasks} tasks in {built:.2f}s, {allocated / 1024 / 1024:.1f}MB allocated")
+        start = time.perf_counter()
+        conflicts = workload.Conflicts(*WINDOW, limit=None)
+        print(f"{len(conflicts)} over-allocated spells in {WINDOW[0]} to {WINDOW[1]} found in "
+              f"{time.perf_counter() - start:.3f}s")
+        start = time.perf_counter()
+        suggestions = workload.Suggestions(*WINDOW, limit=20)
+        print(f"{len(suggestions)} reassignments suggested in {time.perf_counter() - start:.3f}s")
+        print(f"edit followed by a refresh: {Edits(db, workload) * 1000:.2f} ms")
+        mismatches = Check(db, workload)
+        print(f"{'ok  ' if not mismatches else 'FAIL'} {mismatches} of 200 sampled days differ from the Tasks table")
+        CloseAllConnections()
+        return mismatches
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(1 if Main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000) else 0)
@@ -0,0 +1,41 @@
+import sqlite3
+import sys
+import time
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+
+#Bulk edits the way execute_query used to run them: a new cursor and a commit per statement
+def CommitPerStatement(path, edits):
+    connection = sqlite3.connect(path)
+    start = time.perf_counter()
+    for i in range(edits):
+        cursor = connection.cursor()
+        cursor.execute("UPDATE Tasks SET Comments = ? WHERE ID = (SELECT MIN(ID) FROM Tasks)", (str(i),))
+        connection.commit()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return elapsed
+
+#The same edits grouped into a single transaction on a pooled connection
+def SingleTransaction(path, edits):
+    db = Database(path)
+    start = time.perf_counter()
+    with db.transaction():
+        for i in range(edits):
+            db.execute_query("UPDATE Tasks SET Comments = ? WHERE ID = (SELECT MIN(ID) FROM Tasks)", (str(i),))
+    return time.perf_counter() - start
+
+def Main(edits=2000):
+    path = TemporaryDatabase()
+    try:
+        before = CommitPerStatement(path, edits)
+        after = SingleTransaction(path, edits)
+        CloseAllConnections()
+    finally:
+        RemoveTemporaryDatabase(path)
+    print(f"commit per statement: {edits / before:10.0f} edits/s")
+    print(f"single transaction:   {edits / after:10.0f} edits/s")
+
+if __name__ == '__main__':
+    Main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
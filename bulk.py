@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import sys
+from functools import lru_cache
+from itertools import islice
+
+from database import Database, DATABASE_NAME, DATE_COLUMNS
+from dates import NormalizeDate
+
+#Column order of each table, matching the schema in Database.db
+TABLE_COLUMNS = {
+    "Projects": ["ID", "Name", "Start Date", "End Date", "Budget", "Owner"],
+    "Employees": ["ID", "Forename", "Surname", "Age", "Expertise", "Comments"],
+    "Tasks": ["ID", "ProjectID", "StartDate", "EndDate", "Task Leader", "Description", "Comments"],
+}
+
+#Columns that hold an employee, which files may give as "Forename Surname" instead of an ID
+LEADER_COLUMNS = {
+    "Projects": "Owner",
+    "Tasks": "Task Leader",
+}
+
+CHUNK_SIZE = 5000
+
+#Triggers that keep the search indexes, the leader counts and the change log up to date a row at a
+#time, with a statement doing the same work for a whole chunk. An import drops the triggers inside
+#its transaction and runs the statements after each chunk instead, which loads tasks about five
+#times faster. {rows} picks out the chunk's rows
+DEFERRED_TRIGGERS = {
+    "Projects": {
+        "ProjectsChangeInsert": "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) "
+                                "SELECT 'Projects', 'insert', ID, ID FROM Projects WHERE {rows} ORDER BY ID",
+    },
+    "Employees": {
+        "EmployeesSearchInsert": "INSERT INTO EmployeesSearch (rowid, Forename, Surname, Expertise, Comments) "
+                                 "SELECT ID, Forename, Surname, Expertise, Comments FROM Employees WHERE {rows}",
+        "EmployeesChangeInsert": "INSERT INTO ChangeLog (TableName, Action, RowID) "
+                                 "SELECT 'Employees', 'insert', ID FROM Employees WHERE {rows} ORDER BY ID",
+    },
+    "Tasks": {
+        "TasksSearchInsert": "INSERT INTO TasksSearch (rowid, Description, Comments) "
+                             "SELECT ID, Description, Comments FROM Tasks WHERE {rows}",
+        "ProjectLeaderCountsInsert": 'INSERT INTO ProjectLeaderCounts SELECT ProjectID, IFNULL("Task Leader", 0), COUNT(*) '
+                                     'FROM Tasks WHERE ({rows}) AND ProjectID IS NOT NULL GROUP BY ProjectID, IFNULL("Task Leader", 0) '
+                                     'ON CONFLICT (ProjectID, LeaderID) DO UPDATE SET Tasks = Tasks + excluded.Tasks',
+        "TasksChangeInsert": "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) "
+                             "SELECT 'Tasks', 'insert', ID, ProjectID FROM Tasks WHERE {rows} ORDER BY ID",
+    },
+}
+
+#Files repeat the same few thousand dates over and over, and parsing one with strptime costs more
+#than inserting its row
+NormalizeFileDate = lru_cache(maxsize=8192)(NormalizeDate)
+
+#A chunk's rows are those with an ID above the highest one before it, which SQLite allocated, and
+#those whose ID the file gave
+CHUNK_ROWS = "ID > ? OR ID IN (SELECT value FROM json_each(?))"
+
+def CheckTable(table):
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table {table!r}, expected one of {', '.join(TABLE_COLUMNS)}")
+
+def IsJsonLines(path):
+    return os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson")
+
+#Streams records out of a CSV (with a header row) or JSON Lines file as dictionaries
+def ReadRecords(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        if IsJsonLines(path):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+def Chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+#Builds the "Forename Surname" -> ID table once per load so rows don't each need a query
+def LeaderLookup(db):
+    lookup = {}
+    for row in db.iter_query("SELECT ID, Forename, Surname FROM Employees"):
+        lookup.setdefault(f"{row[1]} {row[2]}", row[0])
+    return lookup
+
+def ResolveLeader(value, lookup):
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) or str(value).isdigit():
+        return value
+    if value not in lookup:
+        raise ValueError(f"No employee called {value!r}")
+    return lookup[value]
+
+#Turns a record into a row tuple; a missing or empty ID leaves it to SQLite to allocate. Dates are
+#stored as YYYY-MM-DD whatever form the file has them in
+def RecordToRow(record, columns, leaderColumn, lookup, dateColumns=()):
+    row = []
+    for column in columns:
+        value = record.get(column)
+        if value == "":
+            value = None
+        if column == leaderColumn:
+            value = ResolveLeader(value, lookup)
+        elif column in dateColumns:
+            value = NormalizeFileDate(value)
+        row.append(value)
+    return row
+
+#Loads a whole file into a table in one transaction and returns how many rows were added
+def ImportFile(table, path, db=None, chunkSize=CHUNK_SIZE):
+    CheckTable(table)
+    db = db or Database(DATABASE_NAME)
+    columns = TABLE_COLUMNS[table]
+    leaderColumn = LEADER_COLUMNS.get(table)
+    dateColumns = DATE_COLUMNS.get(table, ())
+    placeholders = ", ".join("?" for column in columns)
+    query = f"INSERT INTO {table} VALUES ({placeholders})"
+    count = 0
+    with db.transaction():
+        deferred = DeferTriggers(db, table)
+        lookup = LeaderLookup(db) if leaderColumn else {}
+        for chunk in Chunks(ReadRecords(path), chunkSize):
+            rows = [RecordToRow(record, columns, leaderColumn, lookup, dateColumns) for record in chunk]
+            highest = db.execute_query(f"SELECT IFNULL(MAX(ID), 0) FROM {table}")[0][0]
+            db.execute_many(query, rows)
+            given = json.dumps([row[0] for row in rows if row[0] is not None])
+            for statement in deferred.values():
+                db.execute_query(statement.format(rows=CHUNK_ROWS), (highest, given))
+            count += len(rows)
+        RestoreTriggers(db, deferred)
+    return count
+
+#Drops the table's DEFERRED_TRIGGERS that the database has, returning their chunk statements keyed
+#by the SQL that puts each trigger back. Has to run inside the import's transaction, so the
+#triggers are only ever missing for the import itself
+def DeferTriggers(db, table):
+    deferred = {}
+    for name, statement in DEFERRED_TRIGGERS[table].items():
+        found = db.execute_query("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+        if found:
+            db.execute_query(f"DROP TRIGGER {name}")
+            deferred[found[0][0]] = statement
+    return deferred
+
+def RestoreTriggers(db, deferred):
+    for trigger in deferred:
+        db.execute_query(trigger)
+
+#Streams a table out to CSV or JSON Lines without loading it into memory, returns the row count
+def ExportFile(table, path, db=None, chunkSize=CHUNK_SIZE):
+    CheckTable(table)
+    db = db or Database(DATABASE_NAME)
+    columns = TABLE_COLUMNS[table]
+    rows = db.iter_query(f"SELECT * FROM {table} ORDER BY ID", batch_size=chunkSize)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if IsJsonLines(path):
+            for row in rows:
+                file.write(json.dumps(dict(zip(columns, row))))
+                file.write("\n")
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for chunk in Chunks(rows, chunkSize):
+                writer.writerows(chunk)
+                count += len(chunk)
+    return count
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (4, 5) or sys.argv[1] not in ("import", "export"):
+        print("Usage: python bulk.py import|export <Projects|Employees|Tasks> <file.csv|file.jsonl> [database]")
+        sys.exit(1)
+    action, table, path = sys.argv[1:4]
+    db = Database(sys.argv[4] if len(sys.argv) == 5 else DATABASE_NAME)
+    if action == "import":
+        print(f"Imported {ImportFile(table, path, db)} rows into {table}")
+    else:
+        print(f"Exported {ExportFile(table, path, db)} rows from {table}")
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+#Rough size in bytes of a cached query result, used to keep the cache under its memory bound
+def EstimateSize(rows):
+    size = 64
+    if isinstance(rows, (list, tuple)):
+        for row in rows:
+            size += EstimateSize(row) if isinstance(row, (list, tuple)) else 16 + len(str(row))
+    else:
+        size += len(str(rows))
+    return size
+
+#An LRU cache of query results with a time to live and bounds on both entries and bytes. Every
+#entry is tagged with the tables it read, so a write to a table drops exactly the entries that
+#depended on it
+class QueryCache:
+    def __init__(self, maxEntries=512, maxBytes=32 * 1024 * 1024, ttl=30.0):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tableKeys = {}
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, tables, size, expires = entry
+            if expires < time.monotonic():
+                self.remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, value, tables):
+        size = EstimateSize(value)
+        if size > self.maxBytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (value, tables, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            for table in tables:
+                self.tableKeys.setdefault(table, set()).add(key)
+            while len(self.entries) > self.maxEntries or self.bytes > self.maxBytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    #Must be called with the lock held
+    def remove(self, key):
+        value, tables, size, expires = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self.tableKeys.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, tables):
+        with self.lock:
+            for table in tables:
+                for key in list(self.tableKeys.pop(table, ())):
+                    if key in self.entries:
+                        self.remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tableKeys.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+            }
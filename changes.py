@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+
+from metrics import metrics
+
+#How many ChangeLog rows are kept, and the least time between trims. Every process that writes
+#trims the log after a commit once TRIM_INTERVAL seconds have passed, whether or not anything in it
+#reads the log, so the Tk app, the server and bulk imports all keep it bounded
+CHANGE_LOG_KEEP = 100000
+TRIM_INTERVAL = 60.0
+
+#One row level change, as recorded in ChangeLog by the triggers from migration 6. action is
+#"insert", "update" or "delete". projectID is the project a task belongs to (for a project, its own
+#ID), so a view of one project can skip changes to other projects' tasks without a query
+class Change:
+    __slots__ = ("sequence", "table", "action", "rowID", "projectID")
+
+    def __init__(self, sequence, table, action, rowID, projectID):
+        self.sequence = sequence
+        self.table = table
+        self.action = action
+        self.rowID = rowID
+        self.projectID = projectID
+
+    def __iter__(self):
+        return iter((self.sequence, self.table, self.action, self.rowID, self.projectID))
+
+    def __repr__(self):
+        return f"Change({self.sequence}, {self.table}, {self.action}, {self.rowID}, {self.projectID})"
+
+#Publishes the changes in ChangeLog to subscribers in this process. Because the log is written by
+#triggers, it holds changes made through any connection: this process's own writes (delivered as
+#soon as they commit, see ConnectionManager), and other processes' such as a server or a bulk
+#import (picked up by PollIfChanged, which checks PRAGMA data_version before reading anything)
+class ChangeFeed:
+    def __init__(self, manager, batchSize=1000):
+        self.manager = manager
+        self.batchSize = batchSize
+        #Reentrant so a subscriber can subscribe or unsubscribe from inside its callback
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        self.subscribers = {}
+        self.nextToken = 0
+        self.cursor = None
+        self.trimLock = threading.Lock()
+        self.lastTrim = None
+
+    #Calls callback(changes) with a list of Changes to any of tables (all tables when None), from now
+    #on. Callbacks run on whichever thread committed or polled, so UI code has to hand them over
+    #to its own thread. Returns a token for Unsubscribe
+    def Subscribe(self, callback, tables=None):
+        with self.lock:
+            if self.cursor is None:
+                self.cursor = self.Latest()
+            self.nextToken += 1
+            self.subscribers[self.nextToken] = (callback, frozenset(tables) if tables else None)
+            return self.nextToken
+
+    def Unsubscribe(self, token):
+        with self.lock:
+            self.subscribers.pop(token, None)
+
+    #The sequence number of the newest change, the cursor to start reading from
+    def Latest(self):
+        connection = self.manager.get_connection()
+        return connection.execute("SELECT IFNULL(MAX(Sequence), 0) FROM ChangeLog").fetchone()[0]
+
+    def Since(self, cursor, limit):
+        connection = self.manager.get_connection()
+        rows = connection.execute("SELECT Sequence, TableName, Action, RowID, ProjectID FROM ChangeLog "
+                                  "WHERE Sequence > ? ORDER BY Sequence LIMIT ?", (cursor, limit)).fetchall()
+        return [Change(*row) for row in rows]
+
+    #Called after every commit in this process. Apart from trimming the log now and then, costs
+    #nothing until someone subscribes
+    def Notify(self):
+        self.TrimIfDue()
+        if self.subscribers:
+            self.Poll()
+
+    #Trims the log if it hasn't been for TRIM_INTERVAL. The commit has already happened, so a trim
+    #that fails, e.g. because another process holds the write lock, is only reported
+    def TrimIfDue(self):
+        now = time.monotonic()
+        with self.trimLock:
+            if self.lastTrim is not None and now - self.lastTrim < TRIM_INTERVAL:
+                return
+            self.lastTrim = now
+        try:
+            self.Trim()
+        except sqlite3.Error as error:
+            metrics.RecordError("changes", error)
+
+    #For changes committed by other processes: only reads the log when the file has changed
+    def PollIfChanged(self):
+        connection = self.manager.get_connection()
+        version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if version != getattr(self.local, "version", None):
+            self.local.version = version
+            self.Poll()
+
+    #Reads everything after the cursor and hands it to the subscribers, a batch at a time
+    def Poll(self):
+        with self.lock:
+            if self.cursor is None or not self.subscribers:
+                return
+            while True:
+                changes = self.Since(self.cursor, self.batchSize)
+                if not changes:
+                    break
+                self.cursor = changes[-1].sequence
+                subscribers = list(self.subscribers.values())
+                for callback, tables in subscribers:
+                    wanted = changes if tables is None else [change for change in changes if change.table in tables]
+                    if wanted:
+                        try:
+                            callback(wanted)
+                        except Exception as error:
+                            metrics.RecordError("changes", error)
+
+    def Trim(self, keep=CHANGE_LOG_KEEP):
+        connection = self.manager.get_connection()
+        connection.execute("DELETE FROM ChangeLog WHERE Sequence <= (SELECT MAX(Sequence) FROM ChangeLog) - ?", (keep,))
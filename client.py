@@ -0,0 +1,70 @@
+import json
+from urllib.parse import urlsplit
+
+from records import Project, Employee, Task
+from changes import Change
+from analytics import Conflict, Suggestion
+
+#Environment variable that points the Tk client at a server started with server.py
+SERVER_VARIABLE = "PYROJECT_SERVER"
+
+#Records arrive as lists of column values, so results of these methods are turned back into them
+def Records(recordClass):
+    return lambda values: None if values is None else recordClass(*values)
+
+def Dashboard(values):
+    if values is not None:
+        values["project"] = Project(*values["project"])
+    return values
+
+RESULT_TYPES = {
+    ("projects", "get"): Records(Project),
+    ("projects", "dashboard"): Dashboard,
+    ("people", "get"): Records(Employee),
+    ("tasks", "get"): Records(Task),
+    ("tasks", "for_project"): lambda rows: [Task(*values) for values in rows],
+    ("changes", "since"): lambda rows: [Change(*values) for values in rows],
+    ("workload", "overallocated"): lambda rows: [Conflict(*values) for values in rows],
+    ("workload", "suggestions"): lambda rows: [Suggestion(*values) for values in rows],
+    ("archive", "tasks"): lambda rows: [Task(*values) for values in rows],
+}
+
+#Stands in for one of the services in services.py, but forwards every method call to a server
+#started with server.py
+class RemoteService:
+    def __init__(self, url, name, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.name = name
+        self.timeout = timeout
+
+    def __getattr__(self, methodName):
+        if methodName.startswith("__"):
+            raise AttributeError(methodName)
+        return lambda *args: self.Call(methodName, list(args))
+
+    def Call(self, methodName, args):
+        body = json.dumps({"args": args})
+        #Imported on first use, as it is slow to import and the app only needs it with a server
+        import http.client
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            connection.request("POST", f"/api/{self.name}/{methodName}", body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            payload = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status == 400:
+            raise ValueError(payload["error"])
+        if response.status != 200:
+            raise RuntimeError(payload["error"])
+        resultType = RESULT_TYPES.get((self.name, methodName))
+        return payload["result"] if resultType is None else resultType(payload["result"])
+
+#Returns remote project, people, task, change, workload, schedule and archive services for a server
+#URL such as http://127.0.0.1:8765
+def RemoteServices(url):
+    return (RemoteService(url, "projects"), RemoteService(url, "people"), RemoteService(url, "tasks"),
+            RemoteService(url, "changes"), RemoteService(url, "workload"), RemoteService(url, "schedule"),
+            RemoteService(url, "archive"))
@@ -0,0 +1,1027 @@
+import sqlite3
+import threading
+import atexit
+import json
+import re
+import time
+from contextlib import contextmanager
+
+from cache import QueryCache
+from dates import NormalizeDate
+from records import Project, Employee, Task
+from metrics import metrics, log
+from changes import ChangeFeed
+
+DATABASE_NAME = 'Database.db'
+
+#Pragmas applied once to every connection the manager opens
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+    "PRAGMA temp_store = MEMORY",
+]
+
+#How many prepared statements each connection keeps compiled for reuse
+STATEMENT_CACHE_SIZE = 256
+
+#Columns holding dates, per table, for the date migration
+DATE_COLUMNS = {
+    "Projects": ["Start Date", "End Date"],
+    "Tasks": ["StartDate", "EndDate"],
+}
+
+ISO_DATE_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]"
+
+#The tables as the first Database.db had them, which MIGRATIONS start from. New database files,
+#such as archives, are created from these and then migrated like any other
+BASE_SCHEMA = [
+    'CREATE TABLE "Projects" ("ID" INTEGER, "Name" TEXT, "Start Date" TEXT, "End Date" TEXT, "Budget" INTEGER, '
+    '"Owner" TEXT, PRIMARY KEY("ID"))',
+    'CREATE TABLE "Employees" ("ID" INTEGER, "Forename" TEXT, "Surname" TEXT, "Age" INTEGER, "Expertise" TEXT, '
+    '"Comments" TEXT, PRIMARY KEY("ID"))',
+    'CREATE TABLE "Tasks" ("ID" INTEGER, "ProjectID" INTEGER, "StartDate" TEXT, "EndDate" TEXT, "Task Leader" TEXT, '
+    '"Description" TEXT, "Comments" TEXT, FOREIGN KEY("Task Leader") REFERENCES "Employees"("ID"), '
+    'FOREIGN KEY("ProjectID") REFERENCES "Projects"("ID"), PRIMARY KEY("ID"))',
+]
+
+#Rewrites every stored date as YYYY-MM-DD. Values that aren't dates at all (left over from typing
+#in the entry boxes) become NULL so they can't turn up in a date range
+def NormalizeStoredDates(connection):
+    for table, columns in DATE_COLUMNS.items():
+        selected = ", ".join(f'"{column}"' for column in columns)
+        assignments = ", ".join(f'"{column}" = ?' for column in columns)
+        #Rows whose dates are already YYYY-MM-DD or NULL are skipped without parsing
+        skipped = " AND ".join(f'IFNULL("{column}" GLOB \'{ISO_DATE_GLOB}\', 1)' for column in columns)
+        changes = []
+        for row in connection.execute(f"SELECT ID, {selected} FROM {table} WHERE NOT ({skipped})"):
+            values = []
+            for value in row[1:]:
+                try:
+                    values.append(NormalizeDate(value))
+                except ValueError:
+                    values.append(None)
+            if values != list(row[1:]):
+                changes.append(values + [row[0]])
+        connection.executemany(f"UPDATE {table} SET {assignments} WHERE ID = ?", changes)
+    #The timeline index replaces TasksStartIndex: it still gives the first task date of a project,
+    #and also lets a window query check EndDate without reading the table
+    for statement in [
+        "DROP INDEX IF EXISTS TasksStartIndex",
+        "CREATE INDEX TasksTimelineIndex ON Tasks (ProjectID, StartDate, EndDate)",
+        "CREATE INDEX TasksDueIndex ON Tasks (EndDate)",
+        'CREATE INDEX ProjectsDatesIndex ON Projects ("Start Date", "End Date")',
+    ]:
+        connection.execute(statement)
+
+#Rewrites any date stored in another form since migration 4, e.g. by a program from before it, and
+#leaves values that aren't dates as they are. Date range queries only look at values matching
+#ISO_DATE_GLOB, so such text can stay without turning up in a range. Only databases that went
+#through 4 while it kept that text still have any
+def NormalizeStoredDatesAgain(connection):
+    for table, columns in DATE_COLUMNS.items():
+        selected = ", ".join(f'"{column}"' for column in columns)
+        assignments = ", ".join(f'"{column}" = ?' for column in columns)
+        skipped = " AND ".join(f'IFNULL("{column}" GLOB \'{ISO_DATE_GLOB}\', 1)' for column in columns)
+        changes = []
+        for row in connection.execute(f"SELECT ID, {selected} FROM {table} WHERE NOT ({skipped})"):
+            values = []
+            for value in row[1:]:
+                try:
+                    values.append(NormalizeDate(value))
+                except ValueError:
+                    values.append(value)
+            if values != list(row[1:]):
+                changes.append(values + [row[0]])
+        connection.executemany(f"UPDATE {table} SET {assignments} WHERE ID = ?", changes)
+
+#Replaces a table with one created by createStatement, copying the rows across with selectStatement,
+#then puts back the table's own indexes and triggers. This is SQLite's recommended way of changing
+#constraints, which ALTER TABLE can't do. Foreign key enforcement has to be off while it runs.
+#The rename is done the legacy way, which doesn't check other tables' triggers that name the table
+#in the moment it doesn't exist
+def RebuildTable(connection, table, createStatement, selectStatement):
+    attached = connection.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+                                  "AND sql IS NOT NULL", (table,)).fetchall()
+    connection.execute(createStatement.format(table=f"{table}Rebuilt"))
+    connection.execute(f"INSERT INTO {table}Rebuilt {selectStatement}")
+    connection.execute(f"DROP TABLE {table}")
+    connection.execute("PRAGMA legacy_alter_table = ON")
+    connection.execute(f"ALTER TABLE {table}Rebuilt RENAME TO {table}")
+    connection.execute("PRAGMA legacy_alter_table = OFF")
+    for (statement,) in attached:
+        connection.execute(statement)
+
+#References migration 5 clears because the row they point to is gone, as (table, column, what it
+#points to). The values are kept in ClearedReferences rather than lost
+DANGLING_REFERENCES = [
+    ("Projects", "Owner", "Employees"),
+    ("Tasks", "ProjectID", "Projects"),
+    ("Tasks", "Task Leader", "Employees"),
+]
+
+#Copies every reference DANGLING_REFERENCES would clear into ClearedReferences, logs how many there
+#were, and returns them as (table, row ID, column, value)
+def KeepDanglingReferences(connection):
+    connection.execute("CREATE TABLE ClearedReferences (TableName TEXT NOT NULL, RowID INTEGER NOT NULL, "
+                       "ColumnName TEXT NOT NULL, Value, Cleared TEXT NOT NULL)")
+    cleared = []
+    for table, column, target in DANGLING_REFERENCES:
+        cleared += connection.execute(f'SELECT ?, ID, ?, "{column}" FROM {table} WHERE "{column}" IS NOT NULL '
+                                      f'AND NOT ("{column}" IN (SELECT ID FROM {target}))', (table, column)).fetchall()
+    connection.executemany("INSERT INTO ClearedReferences VALUES (?, ?, ?, ?, datetime('now'))", cleared)
+    if cleared:
+        log.warning("Cleared %d references to rows that no longer exist, the old values are in ClearedReferences: %s",
+                    len(cleared), ", ".join(f"{table} {rowID} {column}={value!r}" for table, rowID, column, value in cleared[:20]))
+    return cleared
+
+#Declares the foreign keys with actions: deleting a project deletes its tasks, and deleting an
+#employee leaves their projects and tasks without a leader. Leader and owner IDs become INTEGER
+#columns, and references to rows that no longer exist are cleared so the constraints hold, after
+#KeepDanglingReferences has saved them
+def AddForeignKeyActions(connection):
+    KeepDanglingReferences(connection)
+    RebuildTable(connection, "Projects",
+                 'CREATE TABLE {table} ("ID" INTEGER PRIMARY KEY, "Name" TEXT, "Start Date" TEXT, "End Date" TEXT, '
+                 '"Budget" INTEGER, "Owner" INTEGER REFERENCES Employees (ID) ON DELETE SET NULL)',
+                 'SELECT ID, Name, "Start Date", "End Date", Budget, '
+                 'CASE WHEN Owner IN (SELECT ID FROM Employees) THEN Owner END FROM Projects')
+    RebuildTable(connection, "Tasks",
+                 'CREATE TABLE {table} ("ID" INTEGER PRIMARY KEY, '
+                 '"ProjectID" INTEGER REFERENCES Projects (ID) ON DELETE CASCADE, "StartDate" TEXT, "EndDate" TEXT, '
+                 '"Task Leader" INTEGER REFERENCES Employees (ID) ON DELETE SET NULL, "Description" TEXT, "Comments" TEXT)',
+                 'SELECT ID, CASE WHEN ProjectID IN (SELECT ID FROM Projects) THEN ProjectID END, StartDate, EndDate, '
+                 'CASE WHEN "Task Leader" IN (SELECT ID FROM Employees) THEN "Task Leader" END, Description, Comments FROM Tasks')
+    for statement in [
+        "DELETE FROM ProjectLeaderCounts",
+        'INSERT INTO ProjectLeaderCounts SELECT ProjectID, IFNULL("Task Leader", 0), COUNT(*) FROM Tasks '
+        'WHERE ProjectID IS NOT NULL GROUP BY ProjectID, IFNULL("Task Leader", 0)',
+        "CREATE INDEX ProjectsOwnerIndex ON Projects (Owner)",
+        #Projects deleted from the UI straight away, whose tasks are still being purged in batches
+        "CREATE TABLE DeletedProjects (ID INTEGER PRIMARY KEY REFERENCES Projects (ID) ON DELETE CASCADE, Deleted TEXT NOT NULL)",
+    ]:
+        connection.execute(statement)
+    violations = connection.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        raise sqlite3.IntegrityError(f"Foreign key violations after rebuilding tables: {violations[:10]}")
+
+#Makes Projects and Tasks IDs AUTOINCREMENT, so an ID is never handed out twice even after the row
+#with the highest one has gone, e.g. moved to an archive database
+def UseAutoincrementIDs(connection):
+    RebuildTable(connection, "Projects",
+                 'CREATE TABLE {table} ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, "Name" TEXT, "Start Date" TEXT, '
+                 '"End Date" TEXT, "Budget" INTEGER, "Owner" INTEGER REFERENCES Employees (ID) ON DELETE SET NULL)',
+                 'SELECT * FROM Projects')
+    RebuildTable(connection, "Tasks",
+                 'CREATE TABLE {table} ("ID" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                 '"ProjectID" INTEGER REFERENCES Projects (ID) ON DELETE CASCADE, "StartDate" TEXT, "EndDate" TEXT, '
+                 '"Task Leader" INTEGER REFERENCES Employees (ID) ON DELETE SET NULL, "Description" TEXT, "Comments" TEXT)',
+                 'SELECT * FROM Tasks')
+
+#Schema changes in the order they were introduced. The database records how many of them it has
+#had applied in PRAGMA user_version, so each one runs exactly once on startup
+MIGRATIONS = [
+    #1: indexes for the hot lookups, plus covering indexes for the list screens
+    [
+        'CREATE INDEX IF NOT EXISTS TasksProjectIndex ON Tasks (ProjectID, ID, Description)',
+        'CREATE INDEX IF NOT EXISTS TasksLeaderIndex ON Tasks ("Task Leader")',
+        'CREATE INDEX IF NOT EXISTS EmployeesNameIndex ON Employees (Forename, Surname)',
+        'CREATE INDEX IF NOT EXISTS ProjectsNameIndex ON Projects (Name)',
+    ],
+    #2: full text search over task descriptions and comments, and employee names, expertise and
+    #comments, kept up to date by triggers
+    [
+        "CREATE VIRTUAL TABLE TasksSearch USING fts5(Description, Comments, content='Tasks', content_rowid='ID', prefix='2 3 4 5 6')",
+        "CREATE TRIGGER TasksSearchInsert AFTER INSERT ON Tasks BEGIN "
+        "INSERT INTO TasksSearch (rowid, Description, Comments) VALUES (new.ID, new.Description, new.Comments); END",
+        "CREATE TRIGGER TasksSearchDelete AFTER DELETE ON Tasks BEGIN "
+        "INSERT INTO TasksSearch (TasksSearch, rowid, Description, Comments) VALUES ('delete', old.ID, old.Description, old.Comments); END",
+        "CREATE TRIGGER TasksSearchUpdate AFTER UPDATE OF ID, Description, Comments ON Tasks BEGIN "
+        "INSERT INTO TasksSearch (TasksSearch, rowid, Description, Comments) VALUES ('delete', old.ID, old.Description, old.Comments); "
+        "INSERT INTO TasksSearch (rowid, Description, Comments) VALUES (new.ID, new.Description, new.Comments); END",
+        "INSERT INTO TasksSearch (TasksSearch) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE EmployeesSearch USING fts5(Forename, Surname, Expertise, Comments, content='Employees', content_rowid='ID', prefix='2 3 4 5 6')",
+        "CREATE TRIGGER EmployeesSearchInsert AFTER INSERT ON Employees BEGIN "
+        "INSERT INTO EmployeesSearch (rowid, Forename, Surname, Expertise, Comments) "
+        "VALUES (new.ID, new.Forename, new.Surname, new.Expertise, new.Comments); END",
+        "CREATE TRIGGER EmployeesSearchDelete AFTER DELETE ON Employees BEGIN "
+        "INSERT INTO EmployeesSearch (EmployeesSearch, rowid, Forename, Surname, Expertise, Comments) "
+        "VALUES ('delete', old.ID, old.Forename, old.Surname, old.Expertise, old.Comments); END",
+        "CREATE TRIGGER EmployeesSearchUpdate AFTER UPDATE ON Employees BEGIN "
+        "INSERT INTO EmployeesSearch (EmployeesSearch, rowid, Forename, Surname, Expertise, Comments) "
+        "VALUES ('delete', old.ID, old.Forename, old.Surname, old.Expertise, old.Comments); "
+        "INSERT INTO EmployeesSearch (rowid, Forename, Surname, Expertise, Comments) "
+        "VALUES (new.ID, new.Forename, new.Surname, new.Expertise, new.Comments); END",
+        "INSERT INTO EmployeesSearch (EmployeesSearch) VALUES ('rebuild')",
+    ],
+    #3: per project, per leader task counts kept up to date by triggers, and indexes that make the
+    #first and last task date of a project a single seek. A task with no leader counts under 0
+    [
+        "CREATE TABLE ProjectLeaderCounts (ProjectID INTEGER NOT NULL, LeaderID INTEGER NOT NULL, Tasks INTEGER NOT NULL, "
+        "PRIMARY KEY (ProjectID, LeaderID)) WITHOUT ROWID",
+        'INSERT INTO ProjectLeaderCounts SELECT ProjectID, IFNULL("Task Leader", 0), COUNT(*) FROM Tasks '
+        'WHERE ProjectID IS NOT NULL GROUP BY ProjectID, IFNULL("Task Leader", 0)',
+        'CREATE TRIGGER ProjectLeaderCountsInsert AFTER INSERT ON Tasks WHEN new.ProjectID IS NOT NULL BEGIN '
+        'INSERT INTO ProjectLeaderCounts VALUES (new.ProjectID, IFNULL(new."Task Leader", 0), 1) '
+        'ON CONFLICT (ProjectID, LeaderID) DO UPDATE SET Tasks = Tasks + 1; END',
+        'CREATE TRIGGER ProjectLeaderCountsDelete AFTER DELETE ON Tasks WHEN old.ProjectID IS NOT NULL BEGIN '
+        'UPDATE ProjectLeaderCounts SET Tasks = Tasks - 1 WHERE ProjectID = old.ProjectID AND LeaderID = IFNULL(old."Task Leader", 0); '
+        'DELETE FROM ProjectLeaderCounts WHERE ProjectID = old.ProjectID AND LeaderID = IFNULL(old."Task Leader", 0) AND Tasks <= 0; END',
+        'CREATE TRIGGER ProjectLeaderCountsUpdate AFTER UPDATE OF ProjectID, "Task Leader" ON Tasks BEGIN '
+        'UPDATE ProjectLeaderCounts SET Tasks = Tasks - 1 WHERE ProjectID = old.ProjectID AND LeaderID = IFNULL(old."Task Leader", 0); '
+        'DELETE FROM ProjectLeaderCounts WHERE ProjectID = old.ProjectID AND LeaderID = IFNULL(old."Task Leader", 0) AND Tasks <= 0; '
+        'INSERT INTO ProjectLeaderCounts SELECT new.ProjectID, IFNULL(new."Task Leader", 0), 1 WHERE new.ProjectID IS NOT NULL '
+        'ON CONFLICT (ProjectID, LeaderID) DO UPDATE SET Tasks = Tasks + 1; END',
+        'CREATE INDEX TasksStartIndex ON Tasks (ProjectID, StartDate)',
+        'CREATE INDEX TasksEndIndex ON Tasks (ProjectID, EndDate)',
+    ],
+    #4: dates stored as YYYY-MM-DD, with indexes for overdue, due between and timeline queries
+    NormalizeStoredDates,
+    #5: foreign keys that cascade deletes, enforced with PRAGMA foreign_keys on every connection
+    AddForeignKeyActions,
+    #6: a log of row level changes written by triggers, read by ChangeFeed. Moving a task to another
+    #project is logged as a delete from the old one and an insert into the new one. Tasks purged
+    #from a soft deleted project aren't logged one by one, the project's own delete covers them
+    [
+        "CREATE TABLE ChangeLog (Sequence INTEGER PRIMARY KEY AUTOINCREMENT, TableName TEXT NOT NULL, "
+        "Action TEXT NOT NULL, RowID INTEGER NOT NULL, ProjectID INTEGER)",
+        "CREATE TRIGGER TasksChangeInsert AFTER INSERT ON Tasks BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Tasks', 'insert', new.ID, new.ProjectID); END",
+        "CREATE TRIGGER TasksChangeUpdate AFTER UPDATE ON Tasks BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) SELECT 'Tasks', 'update', new.ID, new.ProjectID "
+        "WHERE old.ProjectID IS new.ProjectID; "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) SELECT 'Tasks', 'delete', old.ID, old.ProjectID "
+        "WHERE old.ProjectID IS NOT new.ProjectID; "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) SELECT 'Tasks', 'insert', new.ID, new.ProjectID "
+        "WHERE old.ProjectID IS NOT new.ProjectID; END",
+        "CREATE TRIGGER TasksChangeDelete AFTER DELETE ON Tasks "
+        "WHEN old.ProjectID IS NULL OR old.ProjectID NOT IN (SELECT ID FROM DeletedProjects) BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Tasks', 'delete', old.ID, old.ProjectID); END",
+        "CREATE TRIGGER ProjectsChangeInsert AFTER INSERT ON Projects BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Projects', 'insert', new.ID, new.ID); END",
+        "CREATE TRIGGER ProjectsChangeUpdate AFTER UPDATE ON Projects BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Projects', 'update', new.ID, new.ID); END",
+        "CREATE TRIGGER ProjectsChangeDelete AFTER DELETE ON Projects BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Projects', 'delete', old.ID, old.ID); END",
+        "CREATE TRIGGER ProjectsChangeSoftDelete AFTER INSERT ON DeletedProjects BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) VALUES ('Projects', 'delete', new.ID, new.ID); END",
+        "CREATE TRIGGER EmployeesChangeInsert AFTER INSERT ON Employees BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID) VALUES ('Employees', 'insert', new.ID); END",
+        "CREATE TRIGGER EmployeesChangeUpdate AFTER UPDATE ON Employees BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID) VALUES ('Employees', 'update', new.ID); END",
+        "CREATE TRIGGER EmployeesChangeDelete AFTER DELETE ON Employees BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID) VALUES ('Employees', 'delete', old.ID); END",
+    ],
+    #7: finish to start dependencies between tasks, with an optional lag in days. They go when
+    #either task does; those cascaded deletes aren't logged, as the task's own delete covers them.
+    #A change is logged against the dependent task, whose project is looked up for the feed
+    [
+        "CREATE TABLE TaskDependencies (TaskID INTEGER NOT NULL REFERENCES Tasks (ID) ON DELETE CASCADE, "
+        "DependsOn INTEGER NOT NULL REFERENCES Tasks (ID) ON DELETE CASCADE, Lag INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (TaskID, DependsOn)) WITHOUT ROWID",
+        "CREATE INDEX TaskDependenciesDependsOnIndex ON TaskDependencies (DependsOn)",
+        "CREATE TRIGGER TaskDependenciesChangeInsert AFTER INSERT ON TaskDependencies BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) "
+        "SELECT 'TaskDependencies', 'insert', new.TaskID, ProjectID FROM Tasks WHERE ID = new.TaskID; END",
+        "CREATE TRIGGER TaskDependenciesChangeUpdate AFTER UPDATE ON TaskDependencies BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) "
+        "SELECT 'TaskDependencies', 'update', new.TaskID, ProjectID FROM Tasks WHERE ID = new.TaskID; END",
+        "CREATE TRIGGER TaskDependenciesChangeDelete AFTER DELETE ON TaskDependencies "
+        "WHEN old.DependsOn IN (SELECT ID FROM Tasks) BEGIN "
+        "INSERT INTO ChangeLog (TableName, Action, RowID, ProjectID) "
+        "SELECT 'TaskDependencies', 'delete', old.TaskID, ProjectID FROM Tasks WHERE ID = old.TaskID; END",
+    ],
+    #8: IDs that are never reused, see UseAutoincrementIDs
+    UseAutoincrementIDs,
+    #9: finished projects moved to a yearly archive database (see archive.py), and which year's
+    #file each is in. They are soft deleted here and purged like any deleted project
+    [
+        'CREATE TABLE ArchivedProjects (ID INTEGER PRIMARY KEY, Name TEXT, "Start Date" TEXT, "End Date" TEXT, '
+        'Year INTEGER NOT NULL, Archived TEXT NOT NULL)',
+        "CREATE INDEX ArchivedProjectsYearIndex ON ArchivedProjects (Year)",
+    ],
+    #10: someone's tasks in a window read newest first straight from an index, without a sort. It
+    #starts with the leader, so it also serves the lookups TasksLeaderIndex was there for
+    [
+        'CREATE INDEX TasksLeaderDatesIndex ON Tasks ("Task Leader", StartDate, EndDate)',
+        "DROP INDEX TasksLeaderIndex",
+    ],
+    #11: dates written in another form since 4, normalized without clearing text, see NormalizeStoredDatesAgain
+    NormalizeStoredDatesAgain,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def GetSchemaVersion(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+#Brings a database up to SCHEMA_VERSION. A migration is either a list of SQL statements or a
+#function taking the connection; each one commits together with its new version number
+def Migrate(connection):
+    if GetSchemaVersion(connection) >= SCHEMA_VERSION:
+        return
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        version = GetSchemaVersion(connection)
+        for number in range(version, SCHEMA_VERSION):
+            migration = MIGRATIONS[number]
+            if callable(migration):
+                migration(connection)
+            else:
+                for statement in migration:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {number + 1}")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+#Turns what was typed into the search box into an FTS5 query: every word has to match, and the
+#last one is treated as a prefix so results appear while a word is still being typed
+def SearchExpression(text):
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+#Leaves out projects that have been soft deleted but not purged yet
+LIVE_PROJECTS = "WHERE ID NOT IN (SELECT ID FROM DeletedProjects)"
+#The same for tasks, keeping tasks that have lost their project
+LIVE_TASKS = "IFNULL(ProjectID, 0) NOT IN (SELECT ID FROM DeletedProjects)"
+#julianday() of 0001-01-01 is 1721425.5, so this turns a stored date into its date ordinal
+TASK_INTERVALS = ('SELECT ID, IFNULL(ProjectID, 0), "Task Leader", '
+                  'CAST(julianday(StartDate) - 1721424.5 AS INTEGER), '
+                  'CAST(julianday(MAX(StartDate, EndDate)) - 1721423.5 AS INTEGER) FROM Tasks '
+                  f'WHERE "Task Leader" IS NOT NULL AND StartDate GLOB \'{ISO_DATE_GLOB}\' '
+                  f'AND EndDate GLOB \'{ISO_DATE_GLOB}\' AND {LIVE_TASKS}')
+
+#(ID, start, end) of a project's tasks for the scheduler, as day numbers with the end exclusive like
+#TASK_INTERVALS. A date that can't be read comes back as NULL
+SCHEDULE_TASKS = ('SELECT ID, CAST(julianday(StartDate) - 1721424.5 AS INTEGER), '
+                  'CAST(julianday(MAX(StartDate, EndDate)) - 1721423.5 AS INTEGER) FROM Tasks')
+
+#Searches matching more rows than this are returned newest first instead of ranked
+SEARCH_CANDIDATES = 2000
+
+#Matches the table a write statement changes, so the cache can drop whatever read from it
+WRITE_PATTERN = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+def WrittenTable(query):
+    match = WRITE_PATTERN.match(query)
+    return match.group(1) if match else None
+
+#Holds long lived connections to one database file, one per thread, so that screens and the
+#controller don't reopen the file and re-parse the schema on every click
+class ConnectionManager:
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.migrated = False
+        self.migration_lock = threading.Lock()
+        self.cache = QueryCache()
+        self.feed = ChangeFeed(self)
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            #Autocommit mode, so reads never commit and writes are grouped with transaction()
+            connection = sqlite3.connect(self.db_name, check_same_thread=False, isolation_level=None,
+                                         cached_statements=STATEMENT_CACHE_SIZE)
+            for pragma in CONNECTION_PRAGMAS:
+                connection.execute(pragma)
+            #Threads opening their first connection at once wait for one of them to migrate, rather
+            #than each starting the same migration
+            if not self.migrated:
+                with self.migration_lock:
+                    if not self.migrated:
+                        Migrate(connection)
+                        self.migrated = True
+            #Turned on after migrating, as rebuilding a table with it on would cascade the drop
+            connection.execute("PRAGMA foreign_keys = ON")
+            self.local.connection = connection
+            self.local.depth = 0
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    #Starts a transaction on this thread's connection, or joins the one already open
+    @contextmanager
+    def transaction(self):
+        connection = self.get_connection()
+        if self.local.depth > 0:
+            self.local.depth += 1
+            try:
+                yield connection
+            finally:
+                self.local.depth -= 1
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        self.local.depth = 1
+        self.local.written = set()
+        try:
+            yield connection
+        except BaseException:
+            try:
+                connection.execute("ROLLBACK")
+            finally:
+                self.local.depth = 0
+            raise
+        try:
+            connection.execute("COMMIT")
+        except BaseException:
+            #A COMMIT that fails, e.g. with SQLITE_BUSY, leaves the transaction open. Roll it back
+            #so later writes on this thread don't quietly join it
+            try:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+            finally:
+                self.local.depth = 0
+            raise
+        self.local.depth = 0
+        #Another thread may have cached the old rows between the write and the commit
+        self.cache.invalidate(self.local.written)
+        if self.local.written:
+            self.feed.Notify()
+
+    def in_transaction(self):
+        return getattr(self.local, "depth", 0) > 0
+
+    #Drops cached reads of a table that was just written to, and publishes the change once it is
+    #committed
+    def wrote(self, table):
+        self.cache.invalidate((table,))
+        if self.in_transaction():
+            self.local.written.add(table)
+        else:
+            self.feed.Notify()
+
+    def close_all(self):
+        with self.lock:
+            for connection in self.connections:
+                try:
+                    connection.close()
+                except sqlite3.Error:
+                    pass
+            self.connections = []
+        self.local = threading.local()
+
+connectionManagers = {}
+connectionManagersLock = threading.Lock()
+
+#Returns the shared manager for a database file, creating it the first time it is asked for
+def GetConnectionManager(db_name=DATABASE_NAME):
+    with connectionManagersLock:
+        manager = connectionManagers.get(db_name)
+        if manager is None:
+            manager = ConnectionManager(db_name)
+            connectionManagers[db_name] = manager
+        return manager
+
+#Closes every pooled connection, registered to run when the program exits
+def CloseAllConnections():
+    with connectionManagersLock:
+        managers = list(connectionManagers.values())
+        connectionManagers.clear()
+    for manager in managers:
+        manager.close_all()
+
+atexit.register(CloseAllConnections)
+
+class Database:
+    def __init__(self, db_name=DATABASE_NAME):
+        self.db_name = db_name
+        self.manager = GetConnectionManager(db_name)
+
+    #Always the calling thread's own pooled connection, so one Database can be shared between the
+    #UI and background workers
+    @property
+    def connection(self):
+        return self.manager.get_connection()
+
+    def connect(self):
+        self.manager.get_connection()
+
+    #The connection belongs to the manager and stays open until shutdown
+    def disconnect(self):
+        pass
+
+    #Statements go through the connection's statement cache. Writes outside of a transaction()
+    #block commit on their own, reads never commit. factory is an optional sqlite3 row factory,
+    #e.g. Task.FromRow to get Task records instead of tuples. Every statement is timed into metrics
+    def execute_query(self, query, parameters=None, factory=None):
+        start = time.perf_counter()
+        cursor = self.connection.cursor()
+        if factory is not None:
+            cursor.row_factory = factory
+        if parameters:
+            cursor.execute(query, parameters)
+        else:
+            cursor.execute(query)
+        self.invalidate_for(query)
+        rows = cursor.fetchall()
+        metrics.RecordStatement(query, time.perf_counter() - start, len(rows) or max(cursor.rowcount, 0))
+        return rows
+
+    #Runs an INSERT and returns the rowid SQLite allocated for it
+    def execute_insert(self, query, parameters):
+        start = time.perf_counter()
+        rowID = self.connection.execute(query, parameters).lastrowid
+        self.invalidate_for(query)
+        metrics.RecordStatement(query, time.perf_counter() - start, 1)
+        return rowID
+
+    #Read-through cache in front of execute_query. tables lists every table the query reads, so
+    #that writes to any of them drop the cached result
+    def cached_query(self, tables, query, parameters=None, factory=None):
+        key = (query, tuple(parameters) if parameters else (), factory)
+        entry = self.manager.cache.get(key)
+        if entry is not None:
+            return entry[0]
+        rows = self.execute_query(query, parameters, factory)
+        #Reads inside a write transaction can see rows that aren't committed, and may never be if it
+        #or one of its savepoints is rolled back, so they are left out of the shared cache
+        if not self.manager.in_transaction():
+            self.manager.cache.put(key, rows, tables)
+        return rows
+
+    def invalidate(self, tables):
+        self.manager.cache.invalidate(tables)
+
+    def invalidate_for(self, query):
+        table = WrittenTable(query)
+        if table is not None:
+            self.manager.wrote(table)
+
+    #The change feed for this database file, see changes.py
+    @property
+    def changes(self):
+        return self.manager.feed
+
+    #(Sequence, TableName, Action, RowID, ProjectID) of up to limit changes after a cursor, for
+    #clients that poll for changes instead of subscribing
+    def get_changes_since(self, cursor, limit=1000):
+        query = ("SELECT Sequence, TableName, Action, RowID, ProjectID FROM ChangeLog "
+                 "WHERE Sequence > ? ORDER BY Sequence LIMIT ?")
+        return self.execute_query(query, (cursor, limit))
+
+    def get_latest_change(self):
+        return self.execute_query("SELECT IFNULL(MAX(Sequence), 0) FROM ChangeLog")[0][0]
+
+    #Hit, miss and eviction counters for tuning the cache sizes
+    def cache_stats(self):
+        return self.manager.cache.stats()
+
+    #Yields the rows of a query a batch at a time instead of building the whole list
+    #Only the time spent inside SQLite is recorded, not the time the caller spends between batches
+    def iter_query(self, query, parameters=None, batch_size=1000):
+        for rows in self.iter_batches(query, parameters, batch_size):
+            yield from rows
+
+    #The same, but yielding each batch as a list, for callers that work a column at a time
+    def iter_batches(self, query, parameters=None, batch_size=1000):
+        start = time.perf_counter()
+        cursor = self.connection.execute(query, parameters or ())
+        elapsed = time.perf_counter() - start
+        count = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                count += len(rows)
+                yield rows
+        finally:
+            metrics.RecordStatement(query, elapsed, count)
+
+    def execute_many(self, query, rows):
+        start = time.perf_counter()
+        with self.transaction():
+            cursor = self.connection.executemany(query, rows)
+        self.invalidate_for(query)
+        metrics.RecordStatement(query, time.perf_counter() - start, max(cursor.rowcount, 0))
+
+    #Groups several statements into one commit, e.g. "with db.transaction(): ..."
+    def transaction(self):
+        return self.manager.transaction()
+
+    #Deletes go through the foreign keys: removing a project removes its tasks, and removing a person
+    #clears them as the leader of their projects and tasks. The cascades write to tables the
+    #statement doesn't name, so those are invalidated as well
+    def delete_person(self, person_id):
+        self.delete_people([person_id])
+
+    def delete_people(self, person_ids):
+        query = "DELETE FROM Employees WHERE ID IN (SELECT value FROM json_each(?))"
+        with self.transaction():
+            self.execute_query(query, (json.dumps(list(person_ids)),))
+            self.invalidate(("Projects", "Tasks", "ProjectLeaderCounts"))
+
+    def delete_project(self, project_id):
+        self.delete_projects([project_id])
+
+    #The per leader counts of the projects are dropped first, so the delete trigger that keeps them
+    #up to date finds nothing to do for each cascaded task
+    def delete_projects(self, project_ids):
+        ids = json.dumps(list(project_ids))
+        with self.transaction():
+            self.execute_query("DELETE FROM ProjectLeaderCounts WHERE ProjectID IN (SELECT value FROM json_each(?))", (ids,))
+            self.execute_query("DELETE FROM Projects WHERE ID IN (SELECT value FROM json_each(?))", (ids,))
+            self.invalidate(("Tasks",))
+
+    #Soft delete: the projects vanish from the lists at once, and purge_deleted_projects removes them
+    #and their tasks later in small transactions, so a huge project never holds the write lock for long
+    def mark_projects_deleted(self, project_ids):
+        query = "INSERT OR IGNORE INTO DeletedProjects SELECT value, datetime('now') FROM json_each(?)"
+        self.execute_query(query, (json.dumps(list(project_ids)),))
+        self.invalidate(("Projects",))
+
+    def has_deleted_projects(self):
+        return bool(self.execute_query("SELECT 1 FROM DeletedProjects LIMIT 1"))
+
+    #Deletes up to batch_size tasks of one soft deleted project, or the project itself once it has
+    #none left. Returns how many rows went, 0 when there is nothing left to purge
+    def purge_deleted_projects(self, batch_size=5000):
+        with self.transaction():
+            rows = self.execute_query("SELECT ID FROM DeletedProjects ORDER BY Deleted, ID LIMIT 1")
+            if not rows:
+                return 0
+            project_id = rows[0][0]
+            self.execute_query("DELETE FROM ProjectLeaderCounts WHERE ProjectID = ?", (project_id,))
+            deleted = self.connection.execute("DELETE FROM Tasks WHERE ID IN (SELECT ID FROM Tasks WHERE ProjectID = ? LIMIT ?)",
+                                              (project_id, batch_size)).rowcount
+            self.invalidate(("Tasks",))
+            if deleted == 0:
+                self.execute_query("DELETE FROM Projects WHERE ID = ?", (project_id,))
+                deleted = 1
+            return deleted
+
+    #Merges a step's worth of pages of the task search index. FTS5 only records that a row was
+    #deleted until the segments holding it are merged, so this is what frees the space after many
+    #tasks have gone. Returns whether there is more merging to do
+    def merge_search_index(self, pages=100):
+        with self.transaction():
+            before = self.connection.total_changes
+            self.connection.execute("INSERT INTO TasksSearch (TasksSearch, rank) VALUES ('merge', ?)", (-pages,))
+            return self.connection.total_changes - before >= 2
+
+    def delete_task(self, task_id):
+        query = "DELETE FROM Tasks WHERE ID == ?"
+        self.execute_query(query, (task_id,))
+
+    def update_project(self, project_id, project_name, start_date, end_date, budget, owner):
+        query = 'UPDATE Projects SET "NAME" = ?, "Start Date" = ?, "End Date" = ?, "Budget" = ?, "Owner" = ? WHERE "ID" = ?'
+        self.execute_query(query, (project_name, NormalizeDate(start_date), NormalizeDate(end_date), budget, owner, project_id))
+
+    def update_person(self, person_id, forename, surname, age, expertise, comments):
+        query = "UPDATE Employees SET Forename = ?, Surname = ?, Age = ?, Expertise = ?, Comments = ? WHERE ID = ?"
+        self.execute_query(query, (forename, surname, age, expertise, comments, person_id))
+
+    def update_task(self, id, taskName, startDate, endDate, comments):
+        query = "UPDATE Tasks SET Description = ?, StartDate = ?, EndDate = ?, Comments = ? WHERE ID == ?"
+        self.execute_query(query, (taskName, NormalizeDate(startDate), NormalizeDate(endDate), comments, id))
+
+    def get_projects(self):
+        query = f"SELECT * FROM Projects {LIVE_PROJECTS}"
+        return self.cached_query(("Projects",), query, factory=Project.FromRow)
+
+    def get_project_names(self):
+        query = f"SELECT Name FROM Projects {LIVE_PROJECTS}"
+        return self.cached_query(("Projects",), query)
+
+    def get_employees(self):
+        query = "SELECT * FROM Employees"
+        return self.cached_query(("Employees",), query, factory=Employee.FromRow)
+
+    def get_employee_names(self):
+        query = "SELECT Forename, Surname FROM Employees"
+        return self.cached_query(("Employees",), query)
+
+    def get_employee_forenames(self):
+        query = "SELECT Forename FROM Employees"
+        return self.cached_query(("Employees",), query)
+
+    def get_employee_forename(self, person_id):
+        query = "SELECT Forename FROM Employees WHERE ID == ?"
+        return self.cached_query(("Employees",), query, (person_id,))
+
+    def get_employee_id(self, forename, surname):
+        query = "SELECT ID FROM Employees WHERE Forename == ? AND Surname == ?"
+        return self.cached_query(("Employees",), query, (forename, surname))
+
+    def get_tasks(self, data):
+        query = "SELECT * FROM Tasks WHERE ProjectID = ?"
+        return self.cached_query(("Tasks",), query, (data,), Task.FromRow)
+
+    #Keyset pagination helpers. Pages are ordered by ID and a page starts after the last ID of the
+    #one before it, so fetching page 500 costs the same index seek as fetching page 1
+    def count_rows(self, table, where="", parameters=()):
+        query = f"SELECT COUNT(*) FROM {table} {where}"
+        return self.cached_query((table,), query, parameters)[0][0]
+
+    #Returns the last ID of every full page, so page n can be fetched with after_id = anchors[n - 1]
+    def page_anchors(self, table, page_size, where="", parameters=()):
+        query = (f"SELECT ID FROM (SELECT ID, ROW_NUMBER() OVER (ORDER BY ID) AS Position FROM {table} {where}) "
+                 f"WHERE Position % ? == 0")
+        return [row[0] for row in self.cached_query((table,), query, tuple(parameters) + (page_size,))]
+
+    #Only the first page is cached, being what a list shows when it is opened again. Later pages are
+    #one index seek each and kept by the list itself (see PagedRowSource), and caching them would let
+    #scrolling through a big table push everything else out of the cache
+    def page_rows(self, table, columns, after_id, limit, where="", parameters=()):
+        condition = "WHERE" if not where else where + " AND"
+        query = f"SELECT {columns} FROM {table} {condition} ID > ? ORDER BY ID LIMIT ?"
+        if after_id is None:
+            return self.cached_query((table,), query, tuple(parameters) + (-1, limit))
+        return self.execute_query(query, tuple(parameters) + (after_id, limit))
+
+    def page_projects(self, after_id, limit):
+        return self.page_rows("Projects", "ID, Name", after_id, limit, LIVE_PROJECTS)
+
+    def page_employees(self, after_id, limit):
+        return self.page_rows("Employees", "ID, Forename", after_id, limit)
+
+    def page_tasks(self, project_id, after_id, limit):
+        return self.page_rows("Tasks", "ID, Description", after_id, limit, "WHERE ProjectID = ?", (project_id,))
+
+    #Yields every matching row a page at a time, in ID order. Each page is its own short statement,
+    #so only one page is held in memory and no read is left open between pages for writers to wait
+    #behind. Pages aren't cached, as a full walk would only push everything else out of the cache
+    def iter_rows(self, table, columns, where="", parameters=(), batch_size=1000, factory=None):
+        condition = "WHERE" if not where else where + " AND"
+        query = f"SELECT {columns} FROM {table} {condition} ID > ? ORDER BY ID LIMIT ?"
+        after_id = -1
+        while True:
+            rows = self.execute_query(query, tuple(parameters) + (after_id, batch_size), factory)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1].id if factory is not None else rows[-1][0]
+
+    #Task records of a project, for work that has to see all of them. Lists use page_tasks instead
+    def iter_tasks(self, project_id, batch_size=1000):
+        return self.iter_rows("Tasks", "*", "WHERE ProjectID = ?", (project_id,), batch_size, Task.FromRow)
+
+    def iter_projects(self, batch_size=1000):
+        return self.iter_rows("Projects", "*", LIVE_PROJECTS, (), batch_size, Project.FromRow)
+
+    def iter_employees(self, batch_size=1000):
+        return self.iter_rows("Employees", "*", "", (), batch_size, Employee.FromRow)
+
+    def get_project(self, project_id):
+        query = "SELECT * FROM Projects WHERE ID = ?"
+        rows = self.cached_query(("Projects",), query, (project_id,), Project.FromRow)
+        return rows[0] if rows else None
+
+    def get_employee(self, person_id):
+        query = "SELECT * FROM Employees WHERE ID = ?"
+        rows = self.cached_query(("Employees",), query, (person_id,), Employee.FromRow)
+        return rows[0] if rows else None
+
+    def get_task(self, task_id):
+        query = "SELECT * FROM Tasks WHERE ID = ?"
+        rows = self.cached_query(("Tasks",), query, (task_id,), Task.FromRow)
+        return rows[0] if rows else None
+
+    #Everything the project panel shows in one query: the project row, its owner's name, the task
+    #count, the first and last task dates and a JSON list of [leader ID, leader name, tasks]
+    def get_project_dashboard(self, project_id):
+        query = f"""SELECT Projects.*, Owner.Forename || ' ' || Owner.Surname,
+            (SELECT IFNULL(SUM(Tasks), 0) FROM ProjectLeaderCounts WHERE ProjectID = Projects.ID),
+            (SELECT MIN(StartDate) FROM Tasks WHERE ProjectID = Projects.ID AND StartDate GLOB '{ISO_DATE_GLOB}'),
+            (SELECT MAX(EndDate) FROM Tasks WHERE ProjectID = Projects.ID AND EndDate GLOB '{ISO_DATE_GLOB}'),
+            (SELECT json_group_array(json_array(Counts.LeaderID, Leader.Forename || ' ' || Leader.Surname, Counts.Tasks))
+                FROM ProjectLeaderCounts AS Counts LEFT JOIN Employees AS Leader ON Leader.ID = Counts.LeaderID
+                WHERE Counts.ProjectID = Projects.ID)
+            FROM Projects LEFT JOIN Employees AS Owner ON Owner.ID = Projects.Owner WHERE Projects.ID = ?"""
+        rows = self.cached_query(("Projects", "Employees", "Tasks", "ProjectLeaderCounts"), query, (project_id,))
+        return rows[0] if rows else None
+
+    #Date range queries. Dates are stored as YYYY-MM-DD (see dates.py), so each of these is a range
+    #over an index and takes dates in that form. Text that never was a date is left out with a GLOB
+    def get_overdue_tasks(self, today, limit=500):
+        query = ("SELECT ID, ProjectID, Description, EndDate FROM Tasks "
+                 f"WHERE EndDate < ? AND EndDate GLOB '{ISO_DATE_GLOB}' AND {LIVE_TASKS} ORDER BY EndDate LIMIT ?")
+        return self.cached_query(("Tasks", "DeletedProjects"), query, (today, limit))
+
+    def get_tasks_due_between(self, start, end, limit=500):
+        query = ("SELECT ID, ProjectID, Description, EndDate FROM Tasks "
+                 f"WHERE EndDate BETWEEN ? AND ? AND EndDate GLOB '{ISO_DATE_GLOB}' AND {LIVE_TASKS} "
+                 "ORDER BY EndDate LIMIT ?")
+        return self.cached_query(("Tasks", "DeletedProjects"), query, (start, end, limit))
+
+    #Projects whose dates overlap start to end
+    def get_projects_active_between(self, start, end):
+        query = (f'SELECT ID, Name, "Start Date", "End Date" FROM Projects {LIVE_PROJECTS} '
+                 f'AND "Start Date" <= ? AND "End Date" >= ? AND "Start Date" GLOB \'{ISO_DATE_GLOB}\' '
+                 f'AND "End Date" GLOB \'{ISO_DATE_GLOB}\' ORDER BY "Start Date"')
+        return self.cached_query(("Projects",), query, (end, start))
+
+    #Streams (ID, Description, StartDate, EndDate, leader) for the tasks of a project that overlap
+    #a date window, in start order, so a Gantt view only ever reads the part that is on screen
+    def iter_timeline(self, project_id, window_start, window_end, batch_size=500):
+        query = ('SELECT ID, Description, StartDate, EndDate, "Task Leader" FROM Tasks '
+                 'WHERE ProjectID = ? AND StartDate <= ? AND EndDate >= ? '
+                 f'AND StartDate GLOB \'{ISO_DATE_GLOB}\' AND EndDate GLOB \'{ISO_DATE_GLOB}\' ORDER BY StartDate')
+        return self.iter_query(query, (project_id, window_end, window_start), batch_size)
+
+    #Batches of (ID, ProjectID, leader, start, end) of every task the workload analytics count: led
+    #by someone, with both dates, and not in a deleted project. The dates come back as day numbers
+    #(see dates.DayNumber) with the end made exclusive, and a missing project as 0, so the rows can
+    #go straight into int arrays. Read in one pass rather than page by page, as the whole table is
+    #wanted and a single scan is several times faster
+    def iter_task_intervals(self, batch_size=5000):
+        return self.iter_batches(TASK_INTERVALS, batch_size=batch_size)
+
+    #(ProjectID, leader, start, end) of one task in the same form, or None if it doesn't count
+    def get_task_interval(self, task_id):
+        rows = self.execute_query(TASK_INTERVALS + " AND ID = ?", (task_id,))
+        return rows[0][1:] if rows else None
+
+    #(ID, Description, StartDate, EndDate) of someone's tasks overlapping a window, latest start first
+    def get_leader_tasks_between(self, leader_id, start, end):
+        query = ('SELECT ID, Description, StartDate, EndDate FROM Tasks WHERE "Task Leader" = ? '
+                 f'AND StartDate <= ? AND EndDate >= ? AND StartDate GLOB \'{ISO_DATE_GLOB}\' '
+                 f'AND EndDate GLOB \'{ISO_DATE_GLOB}\' AND {LIVE_TASKS} ORDER BY StartDate DESC')
+        return self.cached_query(("Tasks", "DeletedProjects"), query, (leader_id, end, start))
+
+    #Scheduling. A task's dependencies are the tasks that have to finish before it can start; they
+    #are cached with Tasks too, as deleting a task deletes them through the foreign keys
+    def get_schedule_tasks(self, project_id, batch_size=5000):
+        return self.iter_batches(SCHEDULE_TASKS + " WHERE ProjectID = ?", (project_id,), batch_size)
+
+    #(TaskID, DependsOn, Lag) of every dependency in a project, read in one pass
+    def get_project_dependencies(self, project_id, batch_size=5000):
+        query = ("SELECT Dependencies.TaskID, Dependencies.DependsOn, Dependencies.Lag FROM Tasks "
+                 "JOIN TaskDependencies AS Dependencies ON Dependencies.TaskID = Tasks.ID WHERE Tasks.ProjectID = ?")
+        return self.iter_batches(query, (project_id,), batch_size)
+
+    #(start, end) of one task in the scheduler's form, or None if it no longer exists
+    def get_schedule_task(self, task_id):
+        rows = self.execute_query(SCHEDULE_TASKS + " WHERE ID = ?", (task_id,))
+        return rows[0][1:] if rows else None
+
+    #(ID, Description) of the given tasks, in the order asked for
+    def get_task_descriptions(self, task_ids):
+        query = "SELECT ID, Description FROM Tasks WHERE ID IN (SELECT value FROM json_each(?))"
+        descriptions = dict(self.execute_query(query, (json.dumps(list(task_ids)),)))
+        return [(task_id, descriptions[task_id]) for task_id in task_ids if task_id in descriptions]
+
+    #(DependsOn, Lag) of the tasks one task waits for
+    def get_dependency_lags(self, task_id):
+        query = "SELECT DependsOn, Lag FROM TaskDependencies WHERE TaskID = ?"
+        return self.execute_query(query, (task_id,))
+
+    #(ID, Description, Lag) of the tasks one task waits for. Ordering by DependsOn rather than the
+    #same Tasks.ID lets the primary key give the order
+    def get_dependencies(self, task_id):
+        query = ("SELECT Tasks.ID, Tasks.Description, Dependencies.Lag FROM TaskDependencies AS Dependencies "
+                 "JOIN Tasks ON Tasks.ID = Dependencies.DependsOn WHERE Dependencies.TaskID = ? "
+                 "ORDER BY Dependencies.DependsOn")
+        return self.cached_query(("Tasks", "TaskDependencies"), query, (task_id,))
+
+    #Replaces the tasks task_id waits for with depends_on, a list of (task ID, lag) pairs. They have
+    #to be tasks of the same project, and none of them may already wait for task_id, directly or
+    #through others, as the schedule would then go round in a circle
+    def set_dependencies(self, task_id, depends_on):
+        ids = json.dumps([int(other) for other, lag in depends_on])
+        with self.transaction():
+            project = self.execute_query("SELECT ProjectID FROM Tasks WHERE ID = ?", (task_id,))
+            if not project:
+                raise ValueError(f"No task with ID {task_id}")
+            others = self.execute_query("SELECT ID, ProjectID IS ? FROM Tasks WHERE ID IN (SELECT value FROM json_each(?))",
+                                        (project[0][0], ids))
+            found = dict(others)
+            for other, lag in depends_on:
+                if other == task_id:
+                    raise ValueError("A task can't depend on itself")
+                if other not in found:
+                    raise ValueError(f"No task with ID {other}")
+                if not found[other]:
+                    raise ValueError(f"Task {other} is in another project")
+                if lag < 0:
+                    raise ValueError("The lag after a task can't be negative")
+            query = ("WITH RECURSIVE Downstream(ID) AS (SELECT ? UNION "
+                     "SELECT TaskDependencies.TaskID FROM TaskDependencies JOIN Downstream ON TaskDependencies.DependsOn = Downstream.ID) "
+                     "SELECT ID FROM Downstream WHERE ID IN (SELECT value FROM json_each(?)) LIMIT 1")
+            circular = self.execute_query(query, (task_id, ids))
+            if circular:
+                raise ValueError(f"Task {circular[0][0]} already depends on task {task_id}")
+            self.execute_query("DELETE FROM TaskDependencies WHERE TaskID = ? AND DependsOn NOT IN (SELECT value FROM json_each(?))",
+                               (task_id, ids))
+            self.execute_many("INSERT INTO TaskDependencies VALUES (?, ?, ?) ON CONFLICT (TaskID, DependsOn) "
+                              "DO UPDATE SET Lag = excluded.Lag WHERE Lag != excluded.Lag",
+                              [(task_id, other, lag) for other, lag in depends_on])
+
+    #Archiving. Finished projects, whose own end date and every task's end date are before cutoff,
+    #as (ID, Name, last date), oldest first
+    def get_archive_candidates(self, cutoff, limit=100):
+        query = (f'SELECT ID, Name, Finished FROM (SELECT ID, Name, MAX("End Date", '
+                 f'IFNULL((SELECT MAX(EndDate) FROM Tasks WHERE ProjectID = Projects.ID '
+                 f'AND EndDate GLOB \'{ISO_DATE_GLOB}\'), \'\')) AS Finished '
+                 f'FROM Projects {LIVE_PROJECTS}) WHERE Finished < ? AND Finished GLOB \'{ISO_DATE_GLOB}\' '
+                 f'ORDER BY Finished LIMIT ?')
+        return self.execute_query(query, (cutoff, limit))
+
+    #Copies a project with its tasks, their dependencies and the people named on them into the
+    #archive database at path, replacing any earlier copy, and returns the ChangeLog position the
+    #copy was read at. The copy is one transaction on the archive file only: the active database is
+    #just read, so nobody has to wait for it however big the project is
+    def copy_project_to_archive(self, project_id, path):
+        connection = self.connection
+        connection.execute("ATTACH DATABASE ? AS Archive", (path,))
+        try:
+            connection.execute("BEGIN")
+            try:
+                cursor = connection.execute("SELECT IFNULL(MAX(Sequence), 0) FROM main.ChangeLog").fetchone()[0]
+                connection.execute("DELETE FROM Archive.Projects WHERE ID = ?", (project_id,))
+                connection.execute(
+                    'INSERT INTO Archive.Employees SELECT * FROM main.Employees WHERE ID IN '
+                    '(SELECT Owner FROM main.Projects WHERE ID = ? UNION SELECT "Task Leader" FROM main.Tasks WHERE ProjectID = ?) '
+                    'ON CONFLICT (ID) DO UPDATE SET Forename = excluded.Forename, Surname = excluded.Surname, Age = excluded.Age, '
+                    'Expertise = excluded.Expertise, Comments = excluded.Comments', (project_id, project_id))
+                connection.execute("INSERT INTO Archive.Projects SELECT * FROM main.Projects WHERE ID = ?", (project_id,))
+                connection.execute("INSERT INTO Archive.Tasks SELECT * FROM main.Tasks WHERE ProjectID = ?", (project_id,))
+                connection.execute("INSERT INTO Archive.TaskDependencies SELECT Dependencies.* FROM main.Tasks "
+                                   "JOIN main.TaskDependencies AS Dependencies ON Dependencies.TaskID = Tasks.ID "
+                                   "WHERE Tasks.ProjectID = ?", (project_id,))
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.execute("DETACH DATABASE Archive")
+        return cursor
+
+    def remove_project_from_archive(self, project_id, path):
+        connection = self.connection
+        connection.execute("ATTACH DATABASE ? AS Archive", (path,))
+        try:
+            connection.execute("DELETE FROM Archive.Projects WHERE ID = ?", (project_id,))
+        finally:
+            connection.execute("DETACH DATABASE Archive")
+
+    #Records that the project now lives in year's archive and soft deletes it here, unless it has
+    #changed since the copy was read at cursor. Returns whether it was archived
+    def mark_project_archived(self, project_id, year, cursor):
+        with self.transaction():
+            if self.execute_query("SELECT 1 FROM ChangeLog WHERE Sequence > ? AND ProjectID = ? LIMIT 1", (cursor, project_id)):
+                return False
+            self.execute_query('INSERT OR REPLACE INTO ArchivedProjects SELECT ID, Name, "Start Date", "End Date", ?, '
+                               "datetime('now') FROM Projects WHERE ID = ?", (year, project_id))
+            self.mark_projects_deleted([project_id])
+            return True
+
+    def page_archived_projects(self, after_id, limit):
+        return self.page_rows("ArchivedProjects", "ID, Name", after_id, limit)
+
+    def get_archived_project(self, project_id):
+        query = 'SELECT ID, Name, "Start Date", "End Date", Year FROM ArchivedProjects WHERE ID = ?'
+        rows = self.cached_query(("ArchivedProjects",), query, (project_id,))
+        return rows[0] if rows else None
+
+    #(Year, projects) of each archive, newest first
+    def get_archive_years(self):
+        query = "SELECT Year, COUNT(*) FROM ArchivedProjects GROUP BY Year ORDER BY Year DESC"
+        return self.cached_query(("ArchivedProjects",), query)
+
+    #Full text search, returning (ID, ProjectID, Description, snippet). When a search matches no more
+    #than SEARCH_CANDIDATES tasks they are ranked with bm25, best first. A broader search would
+    #spend most of its time ranking, so it returns the newest matches instead
+    def search_tasks(self, text, limit=50):
+        return self.search("TasksSearch", "Tasks", "Tasks.ID, Tasks.ProjectID, Tasks.Description", text, limit)
+
+    #Returns (ID, Forename, Surname, snippet) in the same way as search_tasks
+    def search_employees(self, text, limit=50):
+        return self.search("EmployeesSearch", "Employees", "Employees.ID, Employees.Forename, Employees.Surname", text, limit)
+
+    def search(self, index, table, columns, text, limit):
+        expression = SearchExpression(text)
+        if expression is None:
+            return []
+        countQuery = f"SELECT COUNT(*) FROM (SELECT rowid FROM {index} WHERE {index} MATCH ? LIMIT ?)"
+        matches = self.cached_query((table,), countQuery, (expression, SEARCH_CANDIDATES + 1))[0][0]
+        order = f"{index}.rank" if matches <= SEARCH_CANDIDATES else f"{index}.rowid DESC"
+        query = (f"SELECT {columns}, snippet({index}, -1, '[', ']', '...', 8) FROM {index} "
+                 f"JOIN {table} ON {table}.ID = {index}.rowid WHERE {index} MATCH ? ORDER BY {order} LIMIT ?")
+        return self.cached_query((table,), query, (expression, limit))
+
+    #The ID columns are INTEGER PRIMARY KEYs, so inserting NULL lets SQLite allocate the next rowid
+    #atomically as part of the insert. Each add_* returns the new ID
+    def add_task(self, project_id, start_date, end_date, leader_id, task_name, comments):
+        query = "INSERT INTO Tasks VALUES (NULL, ?, ?, ?, ?, ?, ?)"
+        return self.execute_insert(query, (project_id, NormalizeDate(start_date), NormalizeDate(end_date), leader_id, task_name, comments))
+
+    def add_person(self, forename, surname, age, expertise, comments):
+        query = "INSERT INTO Employees VALUES (NULL, ?, ?, ?, ?, ?)"
+        return self.execute_insert(query, (forename, surname, age, expertise, comments))
+
+    def add_project(self, projectName, startDate, endDate, budget, leader):
+        query = "INSERT INTO Projects VALUES (NULL, ?, ?, ?, ?, ?)"
+        return self.execute_insert(query, (projectName, NormalizeDate(startDate), NormalizeDate(endDate), budget, leader))
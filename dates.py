@@ -0,0 +1,44 @@
+import datetime
+
+#Dates are stored as ISO 8601 text (YYYY-MM-DD), which sorts in date order, so range questions like
+#"overdue" or "due this week" are a plain index range instead of parsing every row in Python.
+#The forms are tried in order; the DD/MM forms are what has always been typed into the entry boxes
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%y", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%y", "%d.%m.%Y"]
+
+def ParseDate(text):
+    if isinstance(text, datetime.date):
+        return text
+    text = str(text).strip()
+    for dateFormat in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, dateFormat).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Expected a date like 31/12/24 or 2024-12-31, got {text!r}")
+
+#The stored form of a date; an empty value is stored as NULL
+def NormalizeDate(value):
+    if value is None or str(value).strip() == "":
+        return None
+    return ParseDate(value).isoformat()
+
+def Today():
+    return datetime.date.today().isoformat()
+
+#The Monday and Sunday of the week containing day, as stored dates
+def WeekBounds(day=None):
+    day = ParseDate(day) if day is not None else datetime.date.today()
+    monday = day - datetime.timedelta(days=day.weekday())
+    return monday.isoformat(), (monday + datetime.timedelta(days=6)).isoformat()
+
+#The days from day (today when None) to days later, as stored dates
+def NextDays(days, day=None):
+    day = ParseDate(day) if day is not None else datetime.date.today()
+    return day.isoformat(), (day + datetime.timedelta(days=days)).isoformat()
+
+#Stored dates as day numbers (proleptic Gregorian ordinals), for arithmetic on many dates at once
+def DayNumber(text):
+    return datetime.date.fromisoformat(text).toordinal()
+
+def DayText(number):
+    return datetime.date.fromordinal(number).isoformat()
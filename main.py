@@ -1,7 +1,77 @@
+import time
+#When main started importing, which the startup timings are measured from
+IMPORT_STARTED = time.perf_counter()
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
 import os
+from collections import OrderedDict
+from metrics import Timed, StartProfiling, metrics
+from dates import NextDays
+#The database, services, background threads, archive and backups are imported when they are first
+#used, after the login window is on screen, so they don't hold up the first window
+
+#Keeps labels and buttons that have been taken off the screen so the next screen can reuse them
+#instead of creating new ones. It remembers the options each widget was last given, so reusing one
+#only sends Tk the options that actually changed
+class WidgetPool():
+    def __init__(self, root):
+        self.root = root
+        self.free = {tk.Label: [], tk.Button: []}
+        self.options = {}
+        self.defaults = {}
+        self.created = 0
+        self.reused = 0
+
+    #Only plain labels and buttons placed straight on the window are pooled
+    def CanPool(self, widget):
+        return type(widget) in self.free and widget.master is self.root
+
+    def Take(self, kind):
+        free = self.free[kind]
+        if free:
+            self.reused += 1
+            return free.pop()
+        return None
+
+    def Give(self, widget):
+        widget.place_forget()
+        self.free[type(widget)].append(widget)
+
+    #Options left as None mean the Tk default, which is looked up once per widget type
+    def Default(self, kind, option):
+        if kind not in self.defaults:
+            sample = kind(self.root)
+            self.defaults[kind] = {key: sample.cget(key) for key in ("bg", "fg", "width", "height")}
+            sample.destroy()
+        return self.defaults[kind].get(option)
+
+    def Remember(self, widget, options):
+        self.created += 1
+        self.options[widget] = {key: (value if value is not None else self.Default(type(widget), key))
+                                for key, value in options.items()}
+
+    def Update(self, widget, options):
+        current = self.options.setdefault(widget, {})
+        changed = {}
+        for key, value in options.items():
+            if value is None:
+                value = self.Default(type(widget), key)
+            if key == "command" or current.get(key) != value:
+                changed[key] = value
+                current[key] = value
+        if changed:
+            widget.configure(**changed)
+
+#The app runs in one Tk interpreter. The first window made creates it, and every later window is a
+#Toplevel of that one, which costs a fraction of starting another interpreter with tk.Tk
+sharedRoot = None
+
+def NewRoot():
+    global sharedRoot
+    if sharedRoot is not None and Exists(sharedRoot):
+        return tk.Toplevel(sharedRoot)
+    sharedRoot = tk.Tk()
+    return sharedRoot
 
 #Basewindow is the class I use for the windows
 class BaseWindow():
@@ -11,22 +81,82 @@ class BaseWindow():
         self.height = height
         self.widgets = []
         self.tempWidgets = []
-        self.root = tk.Tk()
+        self.root = NewRoot()
         self.root.title(self.title)
         self.root.geometry(f"{self.width}x{self.height}")
         self.admin = False
+        #Reusable windows are hidden rather than destroyed when closed, see DetailWindow
+        self.reusable = False
+        self.executor = None
+        self.watcher = None
+        #Counts the record panels shown, so a panel's change listener can tell it has been cleared
+        self.panel = 0
+        self.pool = WidgetPool(self.root)
 
     def Run(self):
         self.root.mainloop()
+
+    def Resize(self, title, width, height):
+        self.title = title
+        self.width = width
+        self.height = height
+        self.root.title(title)
+        self.root.geometry(f"{width}x{height}")
+
+    #Runs function on a worker thread and calls callback with its result back on the Tk thread.
+    #A newer job with the same key replaces an older one that hasn't finished yet
+    def RunInBackground(self, key, function, callback):
+        if self.executor is None:
+            from background import BackgroundExecutor
+            self.executor = BackgroundExecutor(self.root)
+        return self.executor.Submit(key, function, callback)
+
+    #Starts reading the change log, so that changes made from now on reach the screens that watch it
+    def StartWatching(self):
+        if self.watcher is None:
+            self.watcher = ChangeWatcher(self.root)
+
+    #Calls callback(changes) on the Tk thread with new rows from the change log, for as long as
+    #alive() is true
+    def Watch(self, alive, callback):
+        self.StartWatching()
+        self.watcher.Add(alive, callback)
     
+    #Takes a widget off the screen, handing labels and buttons back to the pool for reuse
+    def Release(self, widget):
+        if self.pool.CanPool(widget):
+            self.pool.Give(widget)
+        else:
+            widget.destroy()
+
     def ClearScreen(self):
+        if self.executor is not None:
+            self.executor.CancelAll()
+        self.ClearTemporary()
         for widget in self.widgets:
-            widget.destroy()
-        for widget in self.tempWidgets:
-            widget.destroy()
+            self.Release(widget)
         self.widgets = []
+
+    #Changes a label's text after it has been added, keeping the pool's record of it up to date
+    def SetText(self, widget, text):
+        self.pool.Update(widget, {"text": text})
+
+    #Clears only the widgets belonging to the selected record, e.g. a project's detail panel
+    def ClearTemporary(self):
+        self.panel += 1
+        for widget in self.tempWidgets:
+            self.Release(widget)
+        self.tempWidgets = []
     
     def destroy(self):
+        if self.reusable and Exists(self.root):
+            self.ClearScreen()
+            self.root.withdraw()
+            return
+        if self.executor is not None:
+            self.executor.Shutdown()
+        if self.watcher is not None:
+            self.watcher.Stop()
         self.root.destroy()
         
 #This class holds the label widget and important functions for it. 
@@ -90,7 +220,7 @@ class ScrollableWindow(BaseWindow):
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
         
         self.scrollable_frame = tk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor=tk.NW)
+        self.window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor=tk.NW)
         
         self.scrollable_frame.bind("<Configure>", lambda event: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
         
@@ -99,25 +229,233 @@ class ScrollableWindow(BaseWindow):
         
 
 
+#Whether a widget is still on screen. Asking a widget whose Tk root is gone raises instead
+def Exists(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
+
+#Reads the change log in the background and hands new changes to the screens watching it. Each
+#listener belongs to a widget and is dropped once the widget has been destroyed. Polling the log
+#rather than the lists themselves means edits made by other clients of a shared database or server
+#show up too
+class ChangeWatcher():
+    def __init__(self, root, interval=500, batchSize=1000):
+        self.root = root
+        self.interval = interval
+        self.batchSize = batchSize
+        from background import BackgroundExecutor
+        self.executor = BackgroundExecutor(root, workers=1)
+        self.listeners = []
+        self.cursor = None
+        self.running = True
+        self.Poll()
+
+    def Add(self, alive, callback):
+        self.listeners.append((alive, callback))
+
+    def Poll(self):
+        if self.running:
+            self.executor.Submit("changes", self.Read, self.Deliver, self.Failed)
+
+    def Read(self):
+        if self.cursor is None:
+            return changeService.latest(), []
+        changes = changeService.since(self.cursor, self.batchSize)
+        return (changes[-1].sequence if changes else self.cursor), changes
+
+    def Deliver(self, result):
+        self.cursor, changes = result
+        try:
+            if changes:
+                self.listeners = [(alive, callback) for alive, callback in self.listeners if alive()]
+                for alive, callback in self.listeners:
+                    try:
+                        callback(changes)
+                    except Exception as error:
+                        metrics.RecordError("changes", error)
+        finally:
+            #A full batch means there is more waiting
+            self.root.after(0 if len(changes) == self.batchSize else self.interval, self.Poll)
+
+    def Failed(self, error):
+        metrics.RecordError("changes", error)
+        self.root.after(self.interval * 10, self.Poll)
+
+    def Stop(self):
+        self.running = False
+        self.executor.Shutdown()
+
+#Pulls list rows out of the database a page at a time using keyset pagination, keeping only the
+#most recently used pages in memory. Rows are (ID, display text) pairs
+class PagedRowSource():
+    def __init__(self, countFunction, anchorsFunction, pageFunction, pageSize=200, maxPages=20):
+        self.countFunction = countFunction
+        self.anchorsFunction = anchorsFunction
+        self.pageFunction = pageFunction
+        self.pageSize = pageSize
+        self.maxPages = maxPages
+        self.count = countFunction()
+        self.anchors = anchorsFunction(pageSize)
+        self.pages = OrderedDict()
+
+    def get(self, index):
+        pageNumber = index // self.pageSize
+        page = self.pages.get(pageNumber)
+        if page is None:
+            afterID = self.anchors[pageNumber - 1] if pageNumber > 0 else None
+            page = self.pageFunction(afterID, self.pageSize)
+            self.pages[pageNumber] = page
+            if len(self.pages) > self.maxPages:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(pageNumber)
+        offset = index % self.pageSize
+        return page[offset] if offset < len(page) else None
+
+    #Works out, off the UI thread, what a batch of changes to this list's rows means for it. Edited
+    #rows are read back one at a time. Added or removed rows shift everything after them, so the
+    #count and anchors are read again and the pages from the first such row on will be reloaded
+    def Prepare(self, changes):
+        patch = {"rows": {}, "first": None, "count": None, "anchors": None}
+        moved = [change.rowID for change in changes if change.action != "update"]
+        if len(changes) > self.pageSize:
+            #Cheaper to reload than to read that many rows one by one
+            moved = [0]
+        if moved:
+            patch["first"] = min(moved)
+            patch["count"] = self.countFunction()
+            patch["anchors"] = self.anchorsFunction(self.pageSize)
+            return patch
+        for rowID in {change.rowID for change in changes}:
+            rows = self.pageFunction(rowID - 1, 1)
+            if rows and rows[0][0] == rowID:
+                patch["rows"][rowID] = rows[0]
+        return patch
+
+    #Applies a patch from Prepare on the UI thread
+    def Apply(self, patch):
+        if patch["first"] is not None:
+            self.count = patch["count"]
+            self.anchors = patch["anchors"]
+            for pageNumber, page in list(self.pages.items()):
+                if len(page) < self.pageSize or page[-1][0] >= patch["first"]:
+                    del self.pages[pageNumber]
+        if patch["rows"]:
+            for page in self.pages.values():
+                for offset, row in enumerate(page):
+                    if row[0] in patch["rows"]:
+                        page[offset] = patch["rows"][row[0]]
+
+#This class is a scrollable window that only creates labels for the rows in view plus a small buffer,
+#and moves them around as the list is scrolled instead of packing one label per row up front
+class VirtualListWindow(ScrollableWindow):
+    def __init__(self, root, width, height, x, y, source, onClick, rowWidth, rowHeight=21, buffer=3):
+        super().__init__(root, width, height, x, y)
+        self.source = source
+        self.onClick = onClick
+        self.rowHeight = rowHeight
+        self.buffer = buffer
+        self.visibleRows = height // rowHeight
+        self.top = 0.0
+        self.rowIDs = {}
+        self.canvas.itemconfigure(self.window, width=width, height=height)
+        self.scrollbar.configure(command=self.OnScroll)
+
+        self.rows = []
+        for i in range(self.visibleRows + 1 + 2 * buffer):
+            box = tk.Label(self.scrollable_frame, bg="white", relief="solid", bd=1, width=rowWidth)
+            box.bind("<Button-1>", lambda event, box=box: self.OnRowClick(box))
+            self.BindWheel(box)
+            self.rows.append(box)
+        self.BindWheel(self.canvas)
+        self.BindWheel(self.scrollable_frame)
+        self.Render()
+
+    def BindWheel(self, widget):
+        widget.bind("<MouseWheel>", lambda event: self.ScrollBy(-event.delta / 120 * 3))
+        widget.bind("<Button-4>", lambda event: self.ScrollBy(-3))
+        widget.bind("<Button-5>", lambda event: self.ScrollBy(3))
+
+    def ScrollBy(self, rows):
+        self.top += rows
+        self.Render()
+
+    #Handles the scrollbar's "moveto fraction" and "scroll n units/pages" commands
+    def OnScroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = float(amount) * self.source.count
+        elif unit == "pages":
+            self.top += int(amount) * self.visibleRows
+        else:
+            self.top += int(amount)
+        self.Render()
+
+    def OnRowClick(self, box):
+        rowID = self.rowIDs.get(box)
+        if rowID is not None:
+            self.onClick(rowID)
+
+    @Timed("VirtualList.Render")
+    def Render(self):
+        count = self.source.count
+        self.top = max(0.0, min(self.top, float(max(0, count - self.visibleRows))))
+        first = int(self.top) - self.buffer
+        for i, box in enumerate(self.rows):
+            index = first + i
+            row = self.source.get(index) if 0 <= index < count else None
+            if row is None:
+                self.rowIDs.pop(box, None)
+                box.place_forget()
+                continue
+            self.rowIDs[box] = row[0]
+            text = "" if row[1] is None else str(row[1])
+            if box.cget("text") != text:
+                box.configure(text=text)
+            box.place(x=0, y=int((index - self.top) * self.rowHeight))
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + self.visibleRows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 #This class is a subclass of the basewindow, with more functions relevant to its usecase such as instantiating the
 #previously made widget classes
 class Windows(BaseWindow):
     def __init__(self, title, width, height):
         super().__init__(title, width, height)
         
+    #Labels and buttons come from the pool when one is free. A reused widget is raised to the top so
+    #it stacks the same way a newly created one would
     def AddLabel(self, passedText, size, x, y, isTemporary, width=None, height=None, bg=None, fg=None):
-        label = LabelWidget(self.root, passedText, size, x, y, width, height, bg, fg)
+        options = {"text": passedText, "font": ("Arial", size), "width": width, "height": height, "bg": bg, "fg": fg}
+        label = self.pool.Take(tk.Label)
+        if label is None:
+            label = LabelWidget(self.root, passedText, size, x, y, width, height, bg, fg).label
+            self.pool.Remember(label, options)
+        else:
+            self.pool.Update(label, options)
+            label.lift()
+            label.place(x=x, y=y)
         if isTemporary:
-            self.tempWidgets.append(label.label)
+            self.tempWidgets.append(label)
         else: 
-            self.widgets.append(label.label)
+            self.widgets.append(label)
     
     def AddButton(self, text, x, y, executedFunction, height, width, textSize, isTemporary):
-        button = ButtonWidget(self.root, text, x, y, executedFunction, height, width, textSize)
+        options = {"text": text, "command": executedFunction, "height": height, "width": width, "font": ("Arial", textSize)}
+        button = self.pool.Take(tk.Button)
+        if button is None:
+            button = ButtonWidget(self.root, text, x, y, executedFunction, height, width, textSize).button
+            self.pool.Remember(button, options)
+        else:
+            self.pool.Update(button, options)
+            button.lift()
+            button.place(x=x, y=y)
         if isTemporary:
-            self.tempWidgets.append(button.button)  
+            self.tempWidgets.append(button)  
         else:
-            self.widgets.append(button.button)
+            self.widgets.append(button)
         
     def AddEntry(self, text, x, y, width, height):
         textBox = Entry(self.root, text, x, y, width, height)
@@ -142,6 +480,31 @@ class Windows(BaseWindow):
             self.widgets.append(scrollable.scrollable_frame)
             self.widgets.append(scrollable.scrollbar)
         
+    #Adds a virtual list over source. When a watched filter is given, changes it accepts are patched
+    #into the list as they happen
+    def AddVirtualList(self, width, height, x, y, source, onClick, rowWidth, isTemporary, watched=None):
+        virtualList = VirtualListWindow(self.root, width, height, x, y, source, onClick, rowWidth)
+        if watched is not None:
+            def Patch(patch):
+                if Exists(virtualList.canvas):
+                    source.Apply(patch)
+                    virtualList.Render()
+
+            def Changed(changes):
+                changes = [change for change in changes if watched(change)]
+                if changes:
+                    self.RunInBackground(f"patch{changes[-1].sequence}", lambda: source.Prepare(changes), Patch)
+            self.Watch(lambda: Exists(virtualList.canvas), Changed)
+        if isTemporary:
+            self.tempWidgets.append(virtualList)
+            self.tempWidgets.append(virtualList.scrollable_frame)
+            self.tempWidgets.append(virtualList.scrollbar)
+        else:
+            self.widgets.append(virtualList)
+            self.widgets.append(virtualList.scrollable_frame)
+            self.widgets.append(virtualList.scrollbar)
+        return virtualList
+
     def destroy(self):
         try:
             self.widgets.destroy()
@@ -149,77 +512,61 @@ class Windows(BaseWindow):
             pass
         super().destroy()
   
-import sqlite3
+#Detail forms open in a Toplevel per kind of form, made the first time that form is opened. Closing
+#one hides it with its widgets back in its pool, so opening it again only has to fill it in
+detailWindows = {}
 
-class Database:
-    def __init__(self, db_name):
-        self.db_name = db_name
-        self.connection = None
+def DetailWindow(kind, width, height):
+    window = detailWindows.get(kind)
+    if window is None or not Exists(window.root):
+        window = Windows("Details", width, height)
+        window.reusable = True
+        window.root.protocol("WM_DELETE_WINDOW", window.destroy)
+        detailWindows[kind] = window
+    else:
+        window.ClearScreen()
+        window.root.deiconify()
+        window.root.lift()
+    return window
 
-    def connect(self):
-        self.connection = sqlite3.connect(self.db_name)
+#The screens' entry points into the data layer. The work itself is done by the headless services,
+#these only close the form that triggered it
+#Setting PYROJECT_SERVER to a server.py address makes the screens use it instead of Database.db.
+#They are built by ConnectServices once the login window is showing
+projectService = peopleService = taskService = changeService = workloadService = scheduleService = archiveService = None
 
-    def disconnect(self):
-        if self.connection:
-            self.connection.close()
+#Points the screens at the database file dbName, or at the server or Database.db when not given
+def ConnectServices(dbName=None):
+    global projectService, peopleService, taskService, changeService, workloadService, scheduleService, archiveService
+    from client import RemoteServices, SERVER_VARIABLE
+    if dbName is None and os.environ.get(SERVER_VARIABLE):
+        projectService, peopleService, taskService, changeService, workloadService, scheduleService, archiveService = RemoteServices(os.environ[SERVER_VARIABLE])
+        return
+    from database import Database, DATABASE_NAME
+    from services import ProjectService, PeopleService, TaskService, ChangeService, WorkloadService, ScheduleService, ArchiveService
+    db = Database(dbName or DATABASE_NAME)
+    projectService = ProjectService(db)
+    peopleService = PeopleService(db)
+    taskService = TaskService(db)
+    changeService = ChangeService(db)
+    workloadService = WorkloadService(db)
+    scheduleService = ScheduleService(db)
+    archiveService = ArchiveService(db)
 
-    def execute_query(self, query, parameters=None):
-        cursor = self.connection.cursor()
-        if parameters:
-            cursor.execute(query, parameters)
-        else:
-            cursor.execute(query)
-        self.connection.commit()
-        return cursor.fetchall()
+#How far ahead the workload figures look
+WORKLOAD_DAYS = 30
 
-    def delete_person(self, person_id):
-        query = "DELETE FROM Employees WHERE ID = ?"
-        self.execute_query(query, (person_id,))
+#Runs a save and reports whether it went through. Bad input such as a date that can't be read or
+#an unknown leader is shown to the user, leaving the window open to correct it
+def Submitted(save):
+    try:
+        save()
+    except ValueError as error:
+        from tkinter import messagebox
+        messagebox.showerror("Couldn't save", str(error))
+        return False
+    return True
 
-    def delete_project(self, project_id):
-        query = "DELETE FROM Projects WHERE ID = ?"
-        self.execute_query(query, (project_id,))
-        
-    def delete_task(self, task_id):
-        query = "DELETE FROM Tasks WHERE ID == ?"
-        self.execute_query(query, (task_id,))
-
-    def update_project(self, project_id, project_name, start_date, end_date, budget, owner):
-        query = 'UPDATE Projects SET "NAME" = ?, "Start Date" = ?, "End Date" = ?, "Budget" = ?, "Owner" = ? WHERE "ID" = ?'
-        self.execute_query(query, (project_name, start_date, end_date, budget, owner, project_id))
-        
-    def update_person(self, person_id, forename, surname, age, expertise, comments):
-        query = "UPDATE Employees SET Forename = ?, Surname = ?, Age = ?, Expertise = ?, Comments = ? WHERE ID = ?"
-        self.execute_query(query, (forename, surname, age, expertise, comments, person_id))
-        
-    def update_task(self, id, taskName, startDate, endDate, comments):
-        query = "UPDATE Tasks SET Description = ?, StartDate = ?, EndDate = ?, Comments = ? WHERE ID == ?"
-        self.execute_query(query, (taskName, startDate, endDate, comments, id))
-
-    def get_projects(self):
-        query = "SELECT * FROM Projects"
-        return self.execute_query(query)
-
-    def get_employees(self):
-        query = "SELECT * FROM Employees"
-        return self.execute_query(query)
-    
-    def get_tasks(self, data):
-        query = "SELECT * FROM Tasks WHERE ProjectID = ?"
-        return self.execute_query(query, (data,))
-    
-    def add_task(self, id, project_id, start_date, end_date, leader_id, task_name, comments):
-        query = "INSERT INTO Tasks VALUES (?, ?, ?, ?, ?, ?, ?)"
-        self.execute_query(query, (id, project_id, start_date, end_date, leader_id, task_name, comments))
-        
-    def add_person(self, newID, forename, surname, age, expertise, comments):
-        query = "INSERT INTO Employees VALUES (?, ?, ?, ?, ?, ?)"
-        self.execute_query(query, (newID, forename, surname, age, expertise, comments))
-        
-    def add_project(self, newID, projectName, startDate, endDate, budget, leader):
-        query = "INSERT INTO Projects VALUES (?, ?, ?, ?, ?, ?)"
-        self.execute_query(query, (newID, projectName, startDate, endDate, budget, leader))
- 
 class databaseController:
     def __init__(self):
         pass
@@ -227,152 +574,193 @@ class databaseController:
     #Executes data deletion to the database when the button was pressed
     
     def GetTasks(data):
-        db = Database('Database.db')
-        db.connect()
-        tasks = db.get_tasks(data)
-        db.disconnect()
-        return tasks
+        return taskService.for_project(data)
     
     def DeletePerson(data):
-        db = Database('Database.db')
-        db.connect()
-        db.delete_person(data)
-        db.disconnect()
+        peopleService.delete(data)
         
     def DeleteProject(data):
-        db = Database('Database.db')
-        db.connect()
-        db.delete_project(data)
-        db.disconnect()
+        projectService.delete(data)
         
     def DeleteCurrentTaskRecord(data, detailWindow):
-        db = Database('Database.db')
-        db.connect()
-        db.delete_task(data[0])
-        db.disconnect()
+        taskService.delete(data.id)
         detailWindow.destroy()
     
     #Executes data changes to the database when the button was pressed
     def SubmitPersonChanges(detailWindow, id, foreName, surName, age, expertise, comments):
-        db = Database('Database.db')
-        db.connect()
-        db.update_person(id, foreName, surName, age, expertise, comments)
-        db.disconnect()
-        detailWindow.destroy()
+        if Submitted(lambda: peopleService.update(id, foreName, surName, age, expertise, comments)):
+            detailWindow.destroy()
 
-    #Busted for some reason now??
     def SubmitProjectChanges(detailWindow, ID, projectName, startDate, endDate, budget, leader):
-        db = Database('Database.db')
-        db.connect()
-        leader = leader.split(" ", 2)
-        forename = leader[0]
-        surname = leader[1]
-        leader = db.execute_query("SELECT ID FROM Employees WHERE Forename == ? AND Surname == ?", (forename, surname))
-        leader = leader[0][0]
-        db.update_project(ID, projectName, startDate, endDate, budget, leader)
-        db.disconnect()
-        detailWindow.destroy()    
-
-    def SubmitTaskChanges(detailWindow, id, taskName, startDate, endDate, comments):
-        db = Database('Database.db')
-        db.connect()
-        db.update_task(id, taskName, startDate, endDate, comments)
-        db.disconnect()
-        detailWindow.destroy()
+        if Submitted(lambda: projectService.update(ID, projectName, startDate, endDate, budget, leader)):
+            detailWindow.destroy()    
+
+    #dependsOn is None when the task's dependencies hadn't been read yet, leaving them as they are
+    def SubmitTaskChanges(detailWindow, id, taskName, startDate, endDate, comments, dependsOn=None):
+        def Save():
+            from services import ParseDependencies
+            dependencies = None if dependsOn is None else ParseDependencies(dependsOn)
+            taskService.update(id, taskName, startDate, endDate, comments)
+            if dependencies is not None:
+                scheduleService.set_dependencies(id, dependencies)
+        if Submitted(Save):
+            detailWindow.destroy()
         
     def SubmitNewTask(detailWindow, taskName, startDate, leader, endDate, comments, projectID):
-        db = Database('Database.db')
-        db.connect()
-        newID = db.execute_query("SELECT MAX(ID) FROM Tasks")
-        newID = int(newID[0][0]) + 1
-        leader = leader.split(" ", 2)
-        forename = leader[0]
-        surname = leader[1]
-        leader = db.execute_query("SELECT ID FROM Employees WHERE Forename == ? AND Surname == ?", (forename, surname))
-        db.add_task(newID, projectID, startDate, endDate, leader[0][0], taskName, comments)
-        db.disconnect()
-        detailWindow.destroy()
+        if Submitted(lambda: taskService.add(projectID, taskName, startDate, endDate, leader, comments)):
+            detailWindow.destroy()
 
     def SubmitNewPerson(detailWindow, forename, surname, age, expertise, comments):
-        db = Database('Database.db')
-        db.connect()
-        newID = db.execute_query("SELECT MAX(ID) FROM Employees")
-        newID = int(newID[0][0]) + 1
-        db.add_person(newID, forename, surname, age, expertise, comments)
-        db.disconnect()
-        detailWindow.destroy()
+        if Submitted(lambda: peopleService.add(forename, surname, age, expertise, comments)):
+            detailWindow.destroy()
         
     def SubmitNewProject(detailWindow, projectName, startDate, leader, endDate, budget):
-        db = Database('Database.db')
-        db.connect()
-        newID = db.execute_query("SELECT MAX(ID) FROM Projects")
-        newID = int(newID[0][0]) + 1
-        leader = leader.split(" ", 2)
-        forename = leader[0]
-        surname = leader[1]
-        leader = db.execute_query("SELECT ID FROM Employees WHERE Forename == ? AND Surname == ?", (forename, surname))
-        db.add_project(newID, projectName, startDate, endDate, budget, leader[0][0])
-        db.disconnect()
-        detailWindow.destroy()
+        if Submitted(lambda: projectService.add(projectName, startDate, endDate, budget, leader)):
+            detailWindow.destroy()
     
-#Brings up the home window
+#Makes a window the app's main window, e.g. the login window once someone has logged in
+def BecomeMainWindow(mainWindow, admin):
+    global databasecontroller
+    databasecontroller = databaseController
+    if admin == False:
+        mainWindow.admin = False
+    else:
+        mainWindow.admin = True
+    mainWindow.Resize("Title Screen", 1280, 720)
+    mainWindow.StartWatching()
+
+#Brings up the home window. Without a window it makes one and runs it until it is closed
+@Timed()
 def ShowHomeWindow(mainWindow=None, admin=False):
-    if mainWindow is None:
+    created = mainWindow is None
+    if created:
         mainWindow = Windows("Title Screen", 1280, 720)
-        global databasecontroller
-        databasecontroller = databaseController
-        if admin == False:
-            mainWindow.admin = False
-        else:
-            mainWindow.admin = True
+        BecomeMainWindow(mainWindow, admin)
     mainWindow.ClearScreen()
     mainWindow.AddLabel("Project Management Software", 35, 305, 100, False)
     mainWindow.AddButton("Projects", 200, 350, lambda: ShowProjectWindow(mainWindow), 5, 20, 20, False)
     mainWindow.AddButton("People", 750, 350, lambda: ShowPeopleWindow(mainWindow), 5, 20, 20, False)
-    mainWindow.Run()
+    mainWindow.AddLabel("Search:", 15, 380, 600, False)
+    mainWindow.AddEntry("", 470, 606, 45, 20)
+    searchBox = mainWindow.widgets[-1]
+    searchBox.bind("<Return>", lambda event: ShowSearchResults(mainWindow, searchBox.get()))
+    mainWindow.AddButton("Search", 760, 600, lambda: ShowSearchResults(mainWindow, searchBox.get()), 1, 10, 10, False)
+    if created:
+        mainWindow.Run()
+
+#Shows the tasks and people matching the search box, best matches first
+@Timed()
+def ShowSearchResults(mainWindow, text):
+    mainWindow.ClearScreen()
+
+    mainWindow.AddLabel("", 0, 0, 0, False, width=mainWindow.width, height=3, bg="gray")
+    mainWindow.AddLabel("", 0, 0, 60, False, width=mainWindow.width, height=40, bg="lightgray")
+    mainWindow.AddLabel("Search: " + text, 20, 500, 10, False, bg="gray", fg="white")
+    mainWindow.AddButton("Back", 10, 10, lambda: ShowHomeWindow(mainWindow), 2, 10, 10, False)
+
+    mainWindow.AddLabel("Tasks", 15, 10, 70, False, bg="lightgray")
+    mainWindow.AddScrollableWindow(733, 590, 10, 105, False)
+    taskFrame = mainWindow.widgets[-2]
+    mainWindow.AddLabel("People", 15, 780, 70, False, bg="lightgray")
+    mainWindow.AddScrollableWindow(460, 590, 780, 105, False)
+    peopleFrame = mainWindow.widgets[-2]
+
+    mainWindow.RunInBackground("search", lambda: (taskService.search(text), peopleService.search(text)),
+                               lambda results: FillSearchResults(mainWindow, taskFrame, peopleFrame, results))
+
+    #The archives are only searched when asked, their results go under the active tasks
+    searchArchive = lambda: mainWindow.RunInBackground("archiveSearch", lambda: archiveService.search(text),
+                                                       lambda tasks: FillArchiveResults(mainWindow, taskFrame, tasks))
+    mainWindow.AddButton("Search Archive", 120, 10, searchArchive, 2, 13, 10, False)
+
+@Timed()
+def FillSearchResults(mainWindow, taskFrame, peopleFrame, results):
+    tasks, people = results
+    for task in tasks:
+        box = tk.Label(taskFrame, text=f"{task[2]}  -  {task[3]}", bg="white", relief="solid", bd=1, width=103, anchor="w")
+        box.pack()
+        box.bind("<Button-1>", lambda event, taskID=task[0]: mainWindow.RunInBackground("record", lambda: taskService.get(taskID), lambda data: ShowTaskData(data, mainWindow)))
+        mainWindow.widgets.append(box)
+    for person in people:
+        box = tk.Label(peopleFrame, text=f"{person[1]} {person[2]}  -  {person[3]}", bg="white", relief="solid", bd=1, width=65, anchor="w")
+        box.pack()
+        box.bind("<Button-1>", lambda event, personID=person[0]: OpenPerson(mainWindow, personID))
+        mainWindow.widgets.append(box)
+
+def FillArchiveResults(mainWindow, taskFrame, tasks):
+    if not Exists(taskFrame):
+        return
+    if not tasks:
+        tk.Label(taskFrame, text="Nothing in the archive matches", bg="lightgray", width=103, anchor="w").pack()
+    for task in tasks:
+        box = tk.Label(taskFrame, text=f"{task[2]}  -  {task[3]}  ({task[4]} archive)", bg="lightyellow", relief="solid", bd=1, width=103, anchor="w")
+        box.pack()
+        box.bind("<Button-1>", lambda event, projectID=task[1]: OpenArchivedProject(mainWindow, projectID))
+        mainWindow.widgets.append(box)
+
+#Goes to the archive screen with one archived project already shown
+def OpenArchivedProject(mainWindow, projectID):
+    ShowArchiveWindow(mainWindow)
+    ShowArchivedProject(mainWindow, projectID)
+
+#Goes to the people screen with one person already selected
+def OpenPerson(mainWindow, personID):
+    ShowPeopleWindow(mainWindow)
+    mainWindow.RunInBackground("record", lambda: peopleService.get(personID), lambda data: ShowPeopleData(mainWindow, data))
     
 #Opens the window to edit people
+@Timed()
 def EditCurrentPerson(data):
-    detailWindow = Windows("Details", 600, 300)
+    detailWindow = DetailWindow("editPerson", 600, 300)
     detailWindow.AddLabel("Forename:", 15, 10, 10, False)
-    detailWindow.AddEntry(str(data[1]), 15, 40, 30, 20)
+    detailWindow.AddEntry(str(data.forename), 15, 40, 30, 20)
     foreName = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Surname:", 15, 10, 60, False)
-    detailWindow.AddEntry(str(data[2]), 15, 90, 30, 20)
+    detailWindow.AddEntry(str(data.surname), 15, 90, 30, 20)
     surName = detailWindow.widgets[-1]
 
     detailWindow.AddLabel("Age:", 15, 10, 110, False)
-    detailWindow.AddEntry(str(data[3]), 15, 140, 30, 20)
+    detailWindow.AddEntry(str(data.age), 15, 140, 30, 20)
     age = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Expertise:", 15, 350, 10, False)
-    detailWindow.AddEntry(str(data[4]), 350, 40, 30, 20)
+    detailWindow.AddEntry(str(data.expertise), 350, 40, 30, 20)
     expertise = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Comments:", 15, 10, 160, False)
-    detailWindow.AddMultiEntry(str(data[5]), 15, 190, 60, 300)
+    detailWindow.AddMultiEntry(str(data.comments), 15, 190, 60, 300)
     comments = detailWindow.widgets[-1]
     
-    detailWindow.AddButton("Submit", 450, 250, lambda: databasecontroller.SubmitPersonChanges(detailWindow, data[0], foreName.get(), surName.get(), age.get(), expertise.get(), comments.get()), 2, 10, 10, False)
+    detailWindow.AddButton("Submit", 450, 250, lambda: databasecontroller.SubmitPersonChanges(detailWindow, data.id, foreName.get(), surName.get(), age.get(), expertise.get(), comments.get()), 2, 10, 10, False)
 
 #Opens the window to show people
+@Timed()
 def ShowPeopleData(mainWindow, data):
-    for widget in mainWindow.tempWidgets:
-        widget.destroy()
-    mainWindow.AddLabel(data[1], 35, 300, 100, True)
-    mainWindow.AddLabel(data[2], 35, 500, 100, True)
-    mainWindow.AddLabel("Age: " + str(data[3]), 25, 300, 170, True)
-    mainWindow.AddLabel("Expertise: " + data[4], 25, 300, 220, True)
-    mainWindow.AddLabel("Comments: " + data[5], 15, 300, 280, True)
+    if data is None:
+        ShowDeletedRecord(mainWindow, 300)
+        return
+    mainWindow.ClearTemporary()
+    mainWindow.AddLabel(data.forename, 35, 300, 100, True)
+    mainWindow.AddLabel(data.surname, 35, 500, 100, True)
+    mainWindow.AddLabel("Age: " + str(data.age), 25, 300, 170, True)
+    mainWindow.AddLabel("Expertise: " + data.expertise, 25, 300, 220, True)
+    mainWindow.AddLabel("Comments: " + data.comments, 15, 300, 280, True)
+    mainWindow.AddLabel("", 15, 300, 240, True)
+    loadLabel = mainWindow.tempWidgets[-1]
+    panel = mainWindow.panel
+    def FillLoad(peak):
+        if mainWindow.panel == panel:
+            mainWindow.SetText(loadLabel, f"Busiest in the next {WORKLOAD_DAYS} days: {peak} tasks at once")
+    mainWindow.RunInBackground("load", lambda: workloadService.peak(data.id, *NextDays(WORKLOAD_DAYS)), FillLoad)
     if mainWindow.admin == True:
-        mainWindow.AddButton("Delete Person", 1035, 9, lambda: databasecontroller.DeletePerson(data[0]), 2, 12, 11, True)
+        mainWindow.AddButton("Delete Person", 1035, 9, lambda: databasecontroller.DeletePerson(data.id), 2, 12, 11, True)
         mainWindow.AddButton("Edit Person", 915, 9, lambda: EditCurrentPerson(data), 2, 12, 11, True)
 
 #Executes the SQL statement to add a new project and close the window
 
 def AddNewTask(projectID):
-    detailWindow = Windows("Details", 600, 600)
+    detailWindow = DetailWindow("newTask", 600, 600)
     detailWindow.AddLabel("Task Name:", 15, 10, 10, False)
     detailWindow.AddEntry("", 15, 40, 30, 20)
     taskName = detailWindow.widgets[-1]
@@ -382,12 +770,7 @@ def AddNewTask(projectID):
     startDate = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Task Leader:", 15, 300, 10, False)
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Forename, Surname FROM Employees")
-    IDs = c.fetchall()
-    conn.commit()
-    conn.close()
+    IDs = peopleService.names()
     detailWindow.AddOptionMenu(IDs, 300, 40)
     leader = detailWindow.widgets[-1]
 
@@ -401,113 +784,249 @@ def AddNewTask(projectID):
     
     detailWindow.AddButton("Submit", 250, 525, lambda: databasecontroller.SubmitNewTask(detailWindow, taskName.get(), startDate.get(), leader.get(), endDate.get(), comments.get("0.0", tk.END), projectID), 2, 10, 10, False)
     
+@Timed()
 def EditCurrentProject(data):
-    detailWindow = Windows("Details", 600, 300)
+    detailWindow = DetailWindow("editProject", 600, 300)
     detailWindow.AddLabel("Project Name:", 15, 10, 10, False)
-    detailWindow.AddEntry(str(data[1]), 15, 40, 30, 20)
+    detailWindow.AddEntry(str(data.name), 15, 40, 30, 20)
     projectName = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Start Date:", 15, 10, 60, False)
-    detailWindow.AddEntry(str(data[2]), 15, 90, 30, 20)
+    detailWindow.AddEntry(str(data.startDate), 15, 90, 30, 20)
     startDate = detailWindow.widgets[-1]
 
     detailWindow.AddLabel("End Date:", 15, 10, 110, False)
-    detailWindow.AddEntry(str(data[3]), 15, 140, 30, 20)
+    detailWindow.AddEntry(str(data.endDate), 15, 140, 30, 20)
     endDate = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Budget:", 15, 350, 10, False)
-    detailWindow.AddEntry(str(data[4]), 350, 40, 30, 20)
+    detailWindow.AddEntry(str(data.budget), 350, 40, 30, 20)
     budget = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Project Lead:", 15, 350, 60, False)
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Forename, Surname FROM Employees")
-    IDs = c.fetchall()
-    conn.commit()
-    conn.close()
+    IDs = peopleService.names()
     detailWindow.AddOptionMenu(IDs, 350, 90)
     projectLead = detailWindow.widgets[-1] 
     
-    detailWindow.AddButton("Submit", 450, 250, lambda: databasecontroller.SubmitProjectChanges(detailWindow, data[0], projectName.get(), startDate.get(), endDate.get(), budget.get(), projectLead.get()), 2, 10, 10, False)
+    detailWindow.AddButton("Submit", 450, 250, lambda: databasecontroller.SubmitProjectChanges(detailWindow, data.id, projectName.get(), startDate.get(), endDate.get(), budget.get(), projectLead.get()), 2, 10, 10, False)
+
+#Shown in a record panel when the row clicked was deleted after the list was drawn, e.g. by
+#another client
+def ShowDeletedRecord(mainWindow, x):
+    mainWindow.ClearTemporary()
+    mainWindow.AddLabel("This record has been deleted", 15, x, 80, True)
 
-def ShowProjectData(mainWindow, data):
-    for widget in mainWindow.tempWidgets:
-        widget.destroy()
-    mainWindow.AddLabel("Project id: " + str(data[0]), 10, 295, 80, True)
+def ShowProjectDashboard(mainWindow, dashboard):
+    if dashboard is None:
+        ShowDeletedRecord(mainWindow, 295)
+    else:
+        ShowProjectData(mainWindow, dashboard["project"], dashboard)
+
+@Timed()
+def ShowProjectData(mainWindow, data, dashboard=None):
+    mainWindow.ClearTemporary()
+    mainWindow.AddLabel("Project id: " + str(data.id), 10, 295, 80, True)
     mainWindow.AddLabel("Project Title: ", 18, 295, 110, True)
-    mainWindow.AddLabel(str(data[1]), 15, 295, 140, True)
+    mainWindow.AddLabel(str(data.name), 15, 295, 140, True)
+    nameLabel = mainWindow.tempWidgets[-1]
     mainWindow.AddLabel("Start Date: ", 10, 295, 180, True)
-    mainWindow.AddLabel(str(data[2]), 15, 295, 200, True)
+    mainWindow.AddLabel(str(data.startDate), 15, 295, 200, True)
+    startLabel = mainWindow.tempWidgets[-1]
     mainWindow.AddLabel("End Date: ", 10, 295, 250, True)
-    mainWindow.AddLabel(str(data[3]), 15, 295, 270, True)
+    mainWindow.AddLabel(str(data.endDate), 15, 295, 270, True)
+    endLabel = mainWindow.tempWidgets[-1]
     mainWindow.AddLabel("Budget: ", 10, 295, 320, True)
-    mainWindow.AddLabel("£" + str(data[4]), 15, 295, 340, True)
+    mainWindow.AddLabel("£" + str(data.budget), 15, 295, 340, True)
+    budgetLabel = mainWindow.tempWidgets[-1]
     mainWindow.AddLabel("Project Lead: ", 10, 295, 390, True)
-    if mainWindow.admin == True:
-        mainWindow.AddButton("Add New Task", 1155, 9, lambda: AddNewTask(data[0]), 2, 12, 11, True)
-        mainWindow.AddButton("Delete Project", 1035, 9, lambda: databasecontroller.DeleteProject(data[0]), 2, 12, 11, True)
-        mainWindow.AddButton("Edit Project", 915, 9, lambda: EditCurrentProject(data), 2, 12, 11, True)
-        
-    newData = databaseController.GetTasks(data[0])
-    
-    mainWindow.AddScrollableWindow(733, 635, 522, 75, True)
+    mainWindow.AddLabel("", 15, 295, 410, True)
+    leadLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("Tasks: ", 10, 295, 450, True)
+    mainWindow.AddLabel("", 15, 295, 470, True)
+    countLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("Task Dates: ", 10, 295, 510, True)
+    mainWindow.AddLabel("", 12, 295, 530, True)
+    datesLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("Tasks per Leader: ", 10, 295, 570, True)
+    mainWindow.AddLabel("", 9, 295, 590, True)
+    leadersLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("Scheduled Finish: ", 10, 420, 250, True)
+    mainWindow.AddLabel("", 12, 420, 270, True)
+    finishLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("Critical Tasks: ", 10, 420, 450, True)
+    mainWindow.AddLabel("", 12, 420, 470, True)
+    criticalLabel = mainWindow.tempWidgets[-1]
+    leaderNames = {}
 
-    scrollable_frame2 = mainWindow.tempWidgets[-2]
+    panel = mainWindow.panel
 
-    for i, newData in enumerate(newData):
-        
-        box = tk.Label(scrollable_frame2, text=newData[5], bg="white", relief="solid", bd=1, width=103)
-        box.pack()
+    #Fills in the rollups from ProjectService.dashboard, which gets them all in one query
+    def FillDashboard(dashboard):
+        if mainWindow.panel != panel:
+            return
+        if dashboard is None:
+            mainWindow.SetText(nameLabel, f"{data.name} (deleted)")
+            return
+        project = dashboard["project"]
+        mainWindow.SetText(nameLabel, str(project.name))
+        mainWindow.SetText(startLabel, str(project.startDate))
+        mainWindow.SetText(endLabel, str(project.endDate))
+        mainWindow.SetText(budgetLabel, "£" + str(project.budget))
+        mainWindow.SetText(leadLabel, dashboard["ownerName"])
+        mainWindow.SetText(countLabel, str(dashboard["taskCount"]))
+        if dashboard["firstStart"] or dashboard["lastEnd"]:
+            mainWindow.SetText(datesLabel, f"{dashboard['firstStart'] or '?'} - {dashboard['lastEnd'] or '?'}")
+        leaders = sorted(dashboard["leaders"], key=lambda leader: -leader["tasks"])
+        mainWindow.SetText(leadersLabel, "\n".join(f"{leader['name'] or 'Nobody'}: {leader['tasks']}" for leader in leaders[:5]))
+        leaderNames.update((str(leader["id"]), leader["name"]) for leader in leaders)
 
-        # Bind the click event to a function to show text on a different canvas
-        box.bind("<Button-1>", lambda event, data=newData: ShowTaskData(data, mainWindow))
+    #The finish date the task dependencies allow, and how many tasks would delay it if they slipped
+    def FillSchedule(summary):
+        if mainWindow.panel != panel or summary is None:
+            return
+        mainWindow.SetText(finishLabel, summary["finish"])
+        mainWindow.SetText(criticalLabel, f"{summary['critical']} of {summary['tasks']}")
 
-        mainWindow.widgets.append(box)
+    if dashboard is None:
+        mainWindow.RunInBackground("dashboard", lambda: projectService.dashboard(data.id), FillDashboard)
+    else:
+        FillDashboard(dashboard)
+    mainWindow.RunInBackground("schedule", lambda: scheduleService.project(data.id), FillSchedule)
+
+    #The rollups are read again, in one query, when the project or any of its tasks changes. The
+    #schedule only recalculates the tasks around the change
+    def Changed(changes):
+        if any(change.projectID == data.id for change in changes if change.table in ("Projects", "Tasks")):
+            mainWindow.RunInBackground("dashboard", lambda: projectService.dashboard(data.id), FillDashboard)
+        if any(change.projectID == data.id for change in changes if change.table in ("Tasks", "TaskDependencies")):
+            mainWindow.RunInBackground("schedule", lambda: scheduleService.project(data.id), FillSchedule)
+    mainWindow.Watch(lambda: mainWindow.panel == panel, Changed)
+
+    if mainWindow.admin == True:
+        mainWindow.AddButton("Add New Task", 1155, 9, lambda: AddNewTask(data.id), 2, 12, 11, True)
+        mainWindow.AddButton("Delete Project", 1035, 9, lambda: databasecontroller.DeleteProject(data.id), 2, 12, 11, True)
+        mainWindow.AddButton("Edit Project", 915, 9, lambda: EditCurrentProject(data), 2, 12, 11, True)
+        
+    loadSource = lambda: PagedRowSource(lambda: taskService.count(data.id),
+                                        lambda pageSize: taskService.page_anchors(data.id, pageSize),
+                                        lambda afterID, limit: taskService.page(data.id, afterID, limit))
+
+    #Clicking a row fetches the full task record to show it on a different window, the leader's
+    #name is already known from the dashboard
+    showTask = lambda taskID: mainWindow.RunInBackground("record", lambda: taskService.get(taskID),
+                                                         lambda task: ShowTaskData(task, mainWindow, leaderNames.get(str(task.leader))))
+    #The list is counted off the UI thread; clicking another project first drops this result
+    watched = lambda change: change.table == "Tasks" and change.projectID == data.id
+    mainWindow.RunInBackground("projectTasks", loadSource, lambda source: mainWindow.AddVirtualList(733, 635, 522, 75, source, showTask, 103, True, watched))
     
+@Timed()
 def EditCurrentTaskRecord(data, detailWindow):
     detailWindow.ClearScreen()
     detailWindow.AddLabel("Task Name:", 15, 10, 10, False)
-    detailWindow.AddEntry(str(data[5]), 15, 40, 30, 20)
+    detailWindow.AddEntry(str(data.description), 15, 40, 30, 20)
     taskName = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Start Date:", 15, 10, 60, False)
-    detailWindow.AddEntry(str(data[2]), 15, 90, 30, 20)
+    detailWindow.AddEntry(str(data.startDate), 15, 90, 30, 20)
     startDate = detailWindow.widgets[-1]
 
     detailWindow.AddLabel("End Date:", 15, 10, 110, False)
-    detailWindow.AddEntry(str(data[3]), 15, 140, 30, 20)
+    detailWindow.AddEntry(str(data.endDate), 15, 140, 30, 20)
     endDate = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Comments:", 15, 10, 160, False)
-    detailWindow.AddMultiEntry(str(data[6]), 15, 190, 60, 300)
+    detailWindow.AddMultiEntry(str(data.comments), 15, 190, 60, 300)
     comments = detailWindow.widgets[-1]
+
+    #Task IDs, each with an optional +days of lag, filled in once they have been read
+    detailWindow.AddLabel("Depends on:", 15, 350, 60, False)
+    detailWindow.AddEntry("", 350, 90, 20, 20)
+    dependsOn = detailWindow.widgets[-1]
+    dependsOn.config(state="disabled")
+    loaded = {"dependencies": False}
+    def FillDependencies(dependencies):
+        if Exists(dependsOn):
+            dependsOn.config(state="normal")
+            dependsOn.insert(0, ", ".join(f"{taskID}+{lag}" if lag else str(taskID) for taskID, description, lag in dependencies))
+            loaded["dependencies"] = True
+    detailWindow.RunInBackground("dependencies", lambda: scheduleService.dependencies(data.id), FillDependencies)
+
+    detailWindow.AddButton("Submit", 250, 525, lambda: databasecontroller.SubmitTaskChanges(detailWindow, data.id, taskName.get(), startDate.get(), endDate.get(), comments.get("0.0", tk.END), dependsOn.get() if loaded["dependencies"] else None), 2, 10, 10, False)
     
-    detailWindow.AddButton("Submit", 250, 525, lambda: databasecontroller.SubmitTaskChanges(detailWindow, data[0], taskName.get(), startDate.get(), endDate.get(), comments.get("0.0", tk.END)), 2, 10, 10, False)
-    
-def ShowTaskData(data, mainWindow):
-    detailWindow = Windows("Details", 600, 600)
+@Timed()
+def ShowTaskData(data, mainWindow, leaderName=None):
+    detailWindow = DetailWindow("task", 600, 600)
     detailWindow.AddLabel("", 0, 0, 0, False, width=detailWindow.width, height=3, bg="gray")
-    detailWindow.AddLabel(str(data[5]), 20, 10, 20, False)
+    detailWindow.AddLabel(str(data.description), 20, 10, 20, False)
+    descriptionLabel = detailWindow.widgets[-1]
     detailWindow.AddLabel("Start Date: ", 10, 5, 80, False)
-    detailWindow.AddLabel(str(data[2]), 15, 5, 100, False)
+    detailWindow.AddLabel(str(data.startDate), 15, 5, 100, False)
+    startLabel = detailWindow.widgets[-1]
     detailWindow.AddLabel("End Date: ", 10, 200, 80, False)
-    detailWindow.AddLabel(str(data[3]), 15, 200, 100, False)
+    detailWindow.AddLabel(str(data.endDate), 15, 200, 100, False)
+    endLabel = detailWindow.widgets[-1]
     detailWindow.AddLabel("Comments: ", 15, 5, 140, False)
-    detailWindow.AddLabel(str(data[6]), 10, 5, 170, False)
+    detailWindow.AddLabel(str(data.comments), 10, 5, 170, False)
+    commentsLabel = detailWindow.widgets[-1]
     detailWindow.AddLabel("Task Leader: ", 10, 400, 80, False)
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Forename FROM Employees WHERE ID == ?", (data[4],))
-    name = c.fetchall()
-    name = str(name).strip("[(,')]")
-    detailWindow.AddLabel(name, 15, 400, 100, False)
+    detailWindow.AddLabel(leaderName or "", 15, 400, 100, False)
+    leaderLabel = detailWindow.widgets[-1]
+    if leaderName is None:
+        detailWindow.RunInBackground("leader", lambda: peopleService.forename(data.leader), lambda name: detailWindow.SetText(leaderLabel, name))
+    detailWindow.AddLabel("Schedule: ", 10, 5, 420, False)
+    detailWindow.AddLabel("", 12, 5, 440, False)
+    earliestLabel = detailWindow.widgets[-1]
+    detailWindow.AddLabel("", 12, 5, 465, False)
+    latestLabel = detailWindow.widgets[-1]
+    detailWindow.AddLabel("", 12, 5, 490, False)
+    floatLabel = detailWindow.widgets[-1]
+    detailWindow.AddLabel("Depends on: ", 10, 5, 525, False)
+    detailWindow.AddLabel("", 10, 5, 545, False)
+    dependenciesLabel = detailWindow.widgets[-1]
+    shown = {"task": data}
+    #Editing the record clears the window, and the labels go back to the pool
+    panel = detailWindow.panel
+    showing = lambda: Exists(detailWindow.root) and detailWindow.panel == panel
+
+    def FillSchedule(schedule):
+        dates, dependencies = schedule
+        if not showing() or dates is None:
+            return
+        detailWindow.SetText(earliestLabel, f"Earliest: {dates['earliestStart']} - {dates['earliestFinish']}")
+        detailWindow.SetText(latestLabel, f"Latest: {dates['latestStart']} - {dates['latestFinish']}")
+        detailWindow.SetText(floatLabel, "On the critical path" if dates["critical"] else f"Float: {dates['float']} days")
+        detailWindow.SetText(dependenciesLabel, ", ".join(f"{description} (+{lag} days)" if lag else str(description)
+                                                          for taskID, description, lag in dependencies) or "Nothing")
+    readSchedule = lambda: detailWindow.RunInBackground("schedule", lambda: (scheduleService.task(data.id), scheduleService.dependencies(data.id)), FillSchedule)
+    readSchedule()
+
+    #Keeps the window up to date when the task is edited or deleted elsewhere
+    def Refresh(task):
+        if not showing():
+            return
+        if task is None:
+            detailWindow.SetText(descriptionLabel, f"{shown['task'].description} (deleted)")
+            return
+        shown["task"] = task
+        detailWindow.SetText(descriptionLabel, str(task.description))
+        detailWindow.SetText(startLabel, str(task.startDate))
+        detailWindow.SetText(endLabel, str(task.endDate))
+        detailWindow.SetText(commentsLabel, str(task.comments))
+
+    #A change to any task of the project can move this one's dates and float
+    def Changed(changes):
+        if any(change.table == "Tasks" and change.rowID == data.id for change in changes):
+            detailWindow.RunInBackground("refresh", lambda: taskService.get(data.id), Refresh)
+        if any(change.table in ("Tasks", "TaskDependencies") and change.projectID == data.projectID for change in changes):
+            readSchedule()
+    mainWindow.Watch(showing, Changed)
+
     if mainWindow.admin == True:
-        detailWindow.AddButton("Delete Record", 470, 10, lambda: databasecontroller.DeleteCurrentTaskRecord(data, detailWindow), 2, 12, 12, False)
-    detailWindow.AddButton("Edit Record", 330, 10, lambda: EditCurrentTaskRecord(data, detailWindow), 2, 12, 12, False)
+        detailWindow.AddButton("Delete Record", 470, 10, lambda: databasecontroller.DeleteCurrentTaskRecord(shown["task"], detailWindow), 2, 12, 12, False)
+    detailWindow.AddButton("Edit Record", 330, 10, lambda: EditCurrentTaskRecord(shown["task"], detailWindow), 2, 12, 12, False)
     
 def AddNewPerson():
-    detailWindow = Windows("Details", 600, 600)
+    detailWindow = DetailWindow("newPerson", 600, 600)
     detailWindow.AddLabel("Forename:", 15, 10, 10, False)
     detailWindow.AddEntry("", 15, 40, 30, 20)
     name = detailWindow.widgets[-1]
@@ -530,6 +1049,7 @@ def AddNewPerson():
     
     detailWindow.AddButton("Submit", 250, 525, lambda: databasecontroller.SubmitNewPerson(detailWindow, name.get(), name2.get(), age.get(), expertise.get(), comments.get("0.0", tk.END)), 2, 10, 10, False) 
 
+@Timed()
 def ShowPeopleWindow(mainWindow):
     mainWindow.ClearScreen()
 
@@ -542,30 +1062,87 @@ def ShowPeopleWindow(mainWindow):
     
     if mainWindow.admin == True:
         mainWindow.AddButton("Add New Person", 1155, 9, lambda: AddNewPerson(), 2, 12, 11, False)
+    mainWindow.AddButton("Workload", 1035, 9, lambda: ShowWorkload(mainWindow), 2, 12, 11, False)
  
-    mainWindow.AddScrollableWindow(250, 635, 10, 70, False)
- 
-    scrollable_frame = mainWindow.widgets[-2]
-    
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Forename FROM Employees")
-    names = c.fetchall()
-    c.execute("SELECT * FROM Employees")
-    allData = c.fetchall()
-    conn.close()
-
-    for i, name in enumerate(names):
-        box = tk.Label(scrollable_frame, text=name, bg="white", relief="solid", bd=1, width=34)
-        box.pack()
+    loadSource = lambda: PagedRowSource(peopleService.count, peopleService.page_anchors, peopleService.page)
 
-        # Bind the click event to a function to show text on a different canvas
-        box.bind("<Button-1>", lambda event, data=allData[i]: ShowPeopleData(mainWindow, data))
+    #Clicking a row fetches the full record to show it on a different canvas
+    showPerson = lambda personID: mainWindow.RunInBackground("record", lambda: peopleService.get(personID), lambda person: ShowPeopleData(mainWindow, person))
+    watched = lambda change: change.table == "Employees"
+    mainWindow.RunInBackground("list", loadSource, lambda source: mainWindow.AddVirtualList(250, 635, 10, 70, source, showPerson, 34, False, watched))
 
-        mainWindow.widgets.append(box)
+#Shows who is leading more tasks at once than they can over the next month, and who with the same
+#expertise could take some of them over
+@Timed()
+def ShowWorkload(mainWindow):
+    mainWindow.ClearTemporary()
+    mainWindow.AddLabel(f"Over-allocated in the next {WORKLOAD_DAYS} days", 20, 300, 80, True)
+    mainWindow.AddScrollableWindow(940, 560, 300, 130, True)
+    frame = mainWindow.tempWidgets[-2]
+    panel = mainWindow.panel
+    window = NextDays(WORKLOAD_DAYS)
+
+    def Fill(results):
+        if mainWindow.panel != panel:
+            return
+        conflicts, suggestions = results
+        if not conflicts:
+            tk.Label(frame, text="Nobody is over-allocated", bg="white", anchor="w", width=132).pack()
+        for conflict in conflicts:
+            text = f"{conflict.name}: {conflict.load} tasks at once from {conflict.start} to {conflict.end}"
+            tk.Label(frame, text=text, bg="white", relief="solid", bd=1, anchor="w", width=132).pack()
+        for suggestion in suggestions:
+            text = f"Move '{suggestion.description}' from {suggestion.fromName} to {suggestion.toName}"
+            tk.Label(frame, text=text, bg="lightyellow", relief="solid", bd=1, anchor="w", width=132).pack()
+
+    mainWindow.RunInBackground("record", lambda: (workloadService.overallocated(*window), workloadService.suggestions(*window)), Fill)
+
+#Lists the finished projects that have been moved into the yearly archives
+@Timed()
+def ShowArchiveWindow(mainWindow):
+    mainWindow.ClearScreen()
+
+    mainWindow.AddLabel("", 0, 0, 0, False, width=mainWindow.width, height=3, bg="gray")
+    mainWindow.AddLabel("", 0, 0, 60, False, width=mainWindow.width, height=40, bg="lightgray")
+    mainWindow.AddLabel("", 0, 285, 70, False, width=109, height=35, bg="white")
+    mainWindow.AddLabel("Archived Projects", 20, 500, 10, False, bg="gray", fg="white")
+    mainWindow.AddButton("Back", 10, 10, lambda: ShowProjectWindow(mainWindow), 2, 12, 10, False)
+
+    loadSource = lambda: PagedRowSource(archiveService.count, archiveService.page_anchors, archiveService.page)
+    showProject = lambda projectID: ShowArchivedProject(mainWindow, projectID)
+    watched = lambda change: change.table == "Projects"
+    mainWindow.RunInBackground("list", loadSource, lambda source: mainWindow.AddVirtualList(250, 635, 10, 70, source, showProject, 34, False, watched))
+
+#Shows an archived project and its tasks, read from its year's archive. They can't be edited
+@Timed()
+def ShowArchivedProject(mainWindow, projectID):
+    mainWindow.ClearTemporary()
+    mainWindow.AddLabel("Project id: " + str(projectID), 10, 295, 80, True)
+    mainWindow.AddLabel("", 15, 295, 110, True)
+    nameLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("", 12, 295, 140, True)
+    datesLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddLabel("", 10, 295, 170, True)
+    yearLabel = mainWindow.tempWidgets[-1]
+    mainWindow.AddScrollableWindow(940, 500, 300, 200, True)
+    frame = mainWindow.tempWidgets[-2]
+    panel = mainWindow.panel
+
+    def Fill(results):
+        project, tasks = results
+        if mainWindow.panel != panel or project is None:
+            return
+        mainWindow.SetText(nameLabel, str(project[1]))
+        mainWindow.SetText(datesLabel, f"{project[2]} - {project[3]}")
+        mainWindow.SetText(yearLabel, f"In the {project[4]} archive")
+        for task in tasks:
+            text = f"{task.description}  -  {task.startDate} to {task.endDate}"
+            tk.Label(frame, text=text, bg="white", relief="solid", bd=1, anchor="w", width=132).pack()
+
+    mainWindow.RunInBackground("record", lambda: (archiveService.get(projectID), archiveService.tasks(projectID)), Fill)
 
 def AddNewProject():
-    detailWindow = Windows("Details", 600, 235)
+    detailWindow = DetailWindow("newProject", 600, 235)
     detailWindow.AddLabel("Project Name:", 15, 10, 10, False)
     detailWindow.AddEntry("", 15, 40, 30, 20)
     projectName = detailWindow.widgets[-1]
@@ -575,12 +1152,7 @@ def AddNewProject():
     startDate = detailWindow.widgets[-1]
     
     detailWindow.AddLabel("Task Leader:", 15, 300, 10, False)
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Forename, Surname FROM Employees")
-    IDs = c.fetchall()
-    conn.commit()
-    conn.close()
+    IDs = peopleService.names()
     detailWindow.AddOptionMenu(IDs, 300, 40)
     leader = detailWindow.widgets[-1]  
 
@@ -594,6 +1166,7 @@ def AddNewProject():
     
     detailWindow.AddButton("Submit", 450, 175, lambda: databasecontroller.SubmitNewProject(detailWindow, projectName.get(), startDate.get(), leader.get(), endDate.get(), budget.get("0.0", tk.END)), 2, 10, 10, False)
         
+@Timed()
 def ShowProjectWindow(mainWindow):
     mainWindow.ClearScreen()
 
@@ -606,41 +1179,72 @@ def ShowProjectWindow(mainWindow):
         mainWindow.AddButton("Add New Project", 120, 10, lambda: AddNewProject(), 2, 13, 10, False)
         
     mainWindow.AddButton("Back", 10, 10, lambda: ShowHomeWindow(mainWindow), 2, 12, 10, False)
+    mainWindow.AddButton("Archive", 250, 10, lambda: ShowArchiveWindow(mainWindow), 2, 10, 10, False)
  
-    mainWindow.AddScrollableWindow(250, 635, 10, 70, False)
- 
-    scrollable_frame = mainWindow.widgets[-2]
-    
-    conn = sqlite3.connect('Database.db')
-    c = conn.cursor()
-    c.execute("SELECT Name FROM Projects")
-    names = c.fetchall()
-    c.execute("SELECT * FROM Projects")
-    allData = c.fetchall()
-    conn.close()
-
-    for i, name in enumerate(names):
-        box = tk.Label(scrollable_frame, text=name, bg="white", relief="solid", bd=1, width=34)
-        box.pack()
+    loadSource = lambda: PagedRowSource(projectService.count, projectService.page_anchors, projectService.page)
 
-        # Bind the click event to a function to show text on a different canvas
-        box.bind("<Button-1>", lambda event, data=allData[i]: ShowProjectData(mainWindow, data))
-
-        mainWindow.widgets.append(box)
+    #Clicking a row fetches the full record to show it on a different canvas
+    showProject = lambda projectID: mainWindow.RunInBackground("record", lambda: projectService.dashboard(projectID),
+                                                               lambda dashboard: ShowProjectDashboard(mainWindow, dashboard))
+    watched = lambda change: change.table == "Projects"
+    mainWindow.RunInBackground("list", loadSource, lambda source: mainWindow.AddVirtualList(250, 635, 10, 70, source, showProject, 34, False, watched))
     
+#The login window goes on to be the main window, so the app only ever starts one Tk interpreter
 def LoginCheck(loginWindow, password):
     if password == "admin":
         verification = True
     else:
         verification = False
-    loginWindow.destroy()
-    ShowHomeWindow(None, verification)
+    BecomeMainWindow(loginWindow, verification)
+    ShowHomeWindow(loginWindow)
 
-if __name__ == '__main__':
+#Opens the database and reads what the first screens show while the login window is up, so that
+#the migrations and a cold page cache are out of the way before anyone logs in
+def WarmUp():
+    start = time.perf_counter()
+    for service in (projectService, peopleService):
+        service.count()
+        service.page_anchors(200)
+        service.page(None, 200)
+    metrics.RecordStartup("warm up", time.perf_counter() - start)
+
+@Timed()
+def ShowLoginWindow():
     loginWindow = Windows("Details", 600, 235)
     loginWindow.AddLabel("Login Page", 25, 220, 10, False)
     loginWindow.AddLabel("Admin Password: (Optional)", 10, 80, 110, False)
     loginWindow.AddEntry("", 45, 150, 40, 20)
     password = loginWindow.widgets[-1]
-    loginWindow.AddButton("Log In", 400, 115, lambda: ShowHomeWindow(LoginCheck(loginWindow, password.get())), 2, 12, 10, False)
-    loginWindow.Run()
\ No newline at end of file
+    loginWindow.AddButton("Log In", 400, 115, lambda: LoginCheck(loginWindow, password.get()), 2, 12, 10, False)
+    return loginWindow
+
+#Archiving and backups are opt in, and with a server it is the server that runs them
+def StartBackgroundJobs():
+    from client import SERVER_VARIABLE
+    from archive import ArchiveJob, ARCHIVE_VARIABLE
+    from backup import BackupJob, BACKUP_VARIABLE
+    if os.environ.get(SERVER_VARIABLE):
+        return
+    if os.environ.get(ARCHIVE_VARIABLE):
+        ArchiveJob(projectService.db, projectService.purger, int(os.environ[ARCHIVE_VARIABLE])).Start()
+    if os.environ.get(BACKUP_VARIABLE):
+        BackupJob(projectService.db.db_name, float(os.environ[BACKUP_VARIABLE])).Start()
+
+#Runs on the Tk thread as soon as the login window has been drawn. Nothing can be clicked before
+#it, so the screens always find the services built
+def StartServices(loginWindow):
+    loginWindow.root.update_idletasks()
+    metrics.RecordStartup("first window", time.perf_counter() - IMPORT_STARTED)
+    ConnectServices()
+    StartBackgroundJobs()
+    loginWindow.RunInBackground("warmUp", WarmUp, lambda result: None)
+
+metrics.RecordStartup("imports", time.perf_counter() - IMPORT_STARTED)
+
+if __name__ == '__main__':
+    StartProfiling()
+    loginWindow = ShowLoginWindow()
+    loginWindow.root.after(0, lambda: StartServices(loginWindow))
+    loginWindow.Run()
+    from database import CloseAllConnections
+    CloseAllConnections()
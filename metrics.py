@@ -0,0 +1,206 @@
+import atexit
+import cProfile
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+#Where time goes in a session: every statement the Database runs (count, time, rows), every
+#screen that is drawn, and the statements slower than a threshold. Collected in memory and written
+#out as JSON or Prometheus text, e.g.
+#
+#   PYROJECT_METRICS=session.json         write the metrics to this file on exit (.prom for Prometheus)
+#   PYROJECT_SLOW_QUERY_MS=50             statements slower than this go in the slow query log
+#   PYROJECT_PROFILE=session.prof         run the UI thread under cProfile and dump the stats on exit
+METRICS_VARIABLE = "PYROJECT_METRICS"
+SLOW_QUERY_VARIABLE = "PYROJECT_SLOW_QUERY_MS"
+PROFILE_VARIABLE = "PYROJECT_PROFILE"
+SLOW_QUERY_MS = 100.0
+
+#Errors that background work recovers from are logged here as well as counted. Without any logging
+#set up they go to stderr; the server or a wrapper script can send them elsewhere
+log = logging.getLogger("pyroject")
+
+#Statements are grouped by their text with the whitespace collapsed; parameters are never recorded
+def StatementKey(query):
+    return " ".join(query.split())
+
+#Prometheus label values have to escape backslashes, quotes and newlines
+def EscapeLabel(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def MetricName(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+class Metrics:
+    def __init__(self, slowQueryMs=None, maxSlowQueries=200):
+        if slowQueryMs is None:
+            slowQueryMs = float(os.environ.get(SLOW_QUERY_VARIABLE, SLOW_QUERY_MS))
+        self.slowQuerySeconds = slowQueryMs / 1000
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.screens = {}
+        self.slowQueries = deque(maxlen=maxSlowQueries)
+        self.startup = {}
+        self.errors = {}
+        self.recentErrors = deque(maxlen=maxSlowQueries)
+        self.started = time.time()
+
+    #[calls, total seconds, slowest seconds, rows] per statement
+    def RecordStatement(self, query, seconds, rows):
+        key = StatementKey(query)
+        with self.lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                self.statements[key] = [1, seconds, seconds, rows]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[3] += rows
+                if seconds > entry[2]:
+                    entry[2] = seconds
+            if seconds >= self.slowQuerySeconds:
+                self.slowQueries.append((time.time(), key, seconds, rows))
+
+    #[calls, total seconds, slowest seconds] per screen
+    def RecordScreen(self, name, seconds):
+        with self.lock:
+            entry = self.screens.get(name)
+            if entry is None:
+                self.screens[name] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    #Seconds each step of starting the app took, such as importing it or the first window appearing
+    def RecordStartup(self, step, seconds):
+        with self.lock:
+            self.startup[step] = seconds
+
+    #An error that a background job or callback carried on after, counted per source (e.g. "purge")
+    #with the latest ones kept, and logged, as nothing else would show it
+    def RecordError(self, source, error):
+        with self.lock:
+            self.errors[source] = self.errors.get(source, 0) + 1
+            self.recentErrors.append((time.time(), source, repr(error)))
+        log.error("%s failed: %r", source, error, exc_info=error if isinstance(error, BaseException) else None)
+
+    def Reset(self):
+        with self.lock:
+            self.statements.clear()
+            self.screens.clear()
+            self.slowQueries.clear()
+            self.startup.clear()
+            self.errors.clear()
+            self.recentErrors.clear()
+            self.started = time.time()
+
+    def ToDict(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "exported": time.time(),
+                "slowQueryMs": self.slowQuerySeconds * 1000,
+                "statements": [{"statement": key, "calls": calls, "seconds": total, "maxSeconds": slowest, "rows": rows}
+                               for key, (calls, total, slowest, rows) in self.statements.items()],
+                "screens": [{"screen": name, "calls": calls, "seconds": total, "maxSeconds": slowest}
+                            for name, (calls, total, slowest) in self.screens.items()],
+                "slowQueries": [{"time": at, "statement": key, "seconds": seconds, "rows": rows}
+                                for at, key, seconds, rows in self.slowQueries],
+                "startup": [{"step": step, "seconds": seconds} for step, seconds in self.startup.items()],
+                "errors": [{"source": source, "count": count} for source, count in self.errors.items()],
+                "recentErrors": [{"time": at, "source": source, "error": error}
+                                 for at, source, error in self.recentErrors],
+            }
+
+    def ToJson(self):
+        return json.dumps(self.ToDict(), indent=2)
+
+    def ToPrometheus(self):
+        data = self.ToDict()
+        lines = []
+
+        def Family(name, kind, help, samples):
+            lines.append(f"# HELP pyroject_{name} {help}")
+            lines.append(f"# TYPE pyroject_{name} {kind}")
+            for label, value, sample in samples:
+                lines.append(f'pyroject_{name}{{{label}="{EscapeLabel(value)}"}} {sample}')
+
+        statements = data["statements"]
+        Family("statement_calls_total", "counter", "Statements run.",
+               [("statement", entry["statement"], entry["calls"]) for entry in statements])
+        Family("statement_seconds_total", "counter", "Time spent running statements.",
+               [("statement", entry["statement"], entry["seconds"]) for entry in statements])
+        Family("statement_max_seconds", "gauge", "Slowest single run of a statement.",
+               [("statement", entry["statement"], entry["maxSeconds"]) for entry in statements])
+        Family("statement_rows_total", "counter", "Rows returned or changed by statements.",
+               [("statement", entry["statement"], entry["rows"]) for entry in statements])
+        screens = data["screens"]
+        Family("screen_renders_total", "counter", "Screens drawn.",
+               [("screen", entry["screen"], entry["calls"]) for entry in screens])
+        Family("screen_seconds_total", "counter", "Time spent drawing screens.",
+               [("screen", entry["screen"], entry["seconds"]) for entry in screens])
+        Family("screen_max_seconds", "gauge", "Slowest single draw of a screen.",
+               [("screen", entry["screen"], entry["maxSeconds"]) for entry in screens])
+        Family("startup_seconds", "gauge", "Time each step of starting the app took.",
+               [("step", entry["step"], entry["seconds"]) for entry in data["startup"]])
+        Family("errors_total", "counter", "Errors background work recovered from.",
+               [("source", entry["source"], entry["count"]) for entry in data["errors"]])
+        lines.append("# HELP pyroject_slow_queries Statements in the slow query log.")
+        lines.append("# TYPE pyroject_slow_queries gauge")
+        lines.append(f"pyroject_slow_queries {len(data['slowQueries'])}")
+        return "\n".join(lines) + "\n"
+
+    #Writes Prometheus text for a .prom or .txt path and JSON for anything else
+    def Export(self, path):
+        text = self.ToPrometheus() if os.path.splitext(path)[1] in (".prom", ".txt") else self.ToJson()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+#The metrics for this process, which the Database and the screens record into
+metrics = Metrics()
+
+#Decorator that records how long a screen function takes to build its widgets
+def Timed(name=None):
+    def Decorate(function):
+        screen = MetricName(name or function.__name__)
+
+        @functools.wraps(function)
+        def Wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.RecordScreen(screen, time.perf_counter() - start)
+        return Wrapper
+    return Decorate
+
+#Runs the calling thread under cProfile when PYROJECT_PROFILE is set, dumping the stats to that
+#path on exit for "python -m pstats". Returns the profiler, or None when profiling is off
+def StartProfiling():
+    path = os.environ.get(PROFILE_VARIABLE)
+    if not path:
+        return None
+    profiler = cProfile.Profile()
+
+    def Dump():
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}", file=sys.stderr)
+    atexit.register(Dump)
+    profiler.enable()
+    return profiler
+
+def ExportOnExit():
+    path = os.environ.get(METRICS_VARIABLE)
+    if path:
+        metrics.Export(path)
+
+atexit.register(ExportOnExit)
@@ -0,0 +1,81 @@
+import sqlite3
+import sys
+import threading
+import time
+
+from database import Database, DATABASE_NAME, CloseAllConnections
+from metrics import metrics
+
+#Removes soft deleted projects and their tasks on a background thread, one small transaction at a
+#time. After each batch it waits as long as the batch took, leaving the write lock free half the
+#time: a writer waiting in SQLite's busy handler only checks the lock every few tens of
+#milliseconds, and would miss a short gap between batches. Failures are recorded in the metrics
+#(source "purge") and the latest is kept in error until a batch succeeds again
+class PurgeJob:
+    def __init__(self, db, batchSize=1000, pause=0.005):
+        self.db = db
+        self.batchSize = batchSize
+        self.pause = pause
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = True
+        self.error = None
+
+    #Starts the purge thread the first time, and tells it there is more to do after that
+    def Wake(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.Run, name="purge", daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def Run(self):
+        while self.running:
+            self.wake.wait()
+            self.wake.clear()
+            while self.running:
+                start = time.perf_counter()
+                try:
+                    purged = self.db.purge_deleted_projects(self.batchSize)
+                except sqlite3.ProgrammingError:
+                    #The connections were closed on shutdown; the rest is purged next time
+                    return
+                except sqlite3.OperationalError as error:
+                    #Couldn't get the write lock within the busy timeout, so try again shortly
+                    self.Failed(error)
+                    time.sleep(1.0)
+                    continue
+                except sqlite3.Error as error:
+                    #Won't go away by retrying; the next delete wakes the job to try again
+                    self.Failed(error)
+                    break
+                self.error = None
+                if not purged:
+                    break
+                time.sleep(max(self.pause, time.perf_counter() - start))
+
+    def Failed(self, error):
+        self.error = error
+        metrics.RecordError("purge", error)
+
+    #Waits for the batch in progress, if any, to commit
+    def Stop(self):
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+
+#Purges everything left over, e.g. from a session that closed part way through, and returns the row count
+def PurgeAll(db, batchSize=1000):
+    total = 0
+    while True:
+        deleted = db.purge_deleted_projects(batchSize)
+        if not deleted:
+            return total
+        total += deleted
+
+if __name__ == '__main__':
+    db = Database(sys.argv[1] if len(sys.argv) > 1 else DATABASE_NAME)
+    print(f"Purged {PurgeAll(db)} rows")
+    CloseAllConnections()
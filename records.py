@@ -0,0 +1,63 @@
+#Typed records for full rows of the three tables. They use __slots__, so an instance is no bigger
+#than the tuple it replaces, and screens read fields by name instead of by position. The Database
+#builds them straight from the cursor with FromRow as the row factory
+class Record:
+    __slots__ = ()
+
+    #sqlite3 row factory: Database passes e.g. Task.FromRow to have a query return Tasks
+    @classmethod
+    def FromRow(cls, cursor, row):
+        return cls(*row)
+
+    #Iterating gives the column values in table order, which is how records are sent as JSON
+    def __iter__(self):
+        for name in self.__slots__:
+            yield getattr(self, name)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+class Project(Record):
+    __slots__ = ("id", "name", "startDate", "endDate", "budget", "owner")
+
+    def __init__(self, id, name, startDate, endDate, budget, owner):
+        self.id = id
+        self.name = name
+        self.startDate = startDate
+        self.endDate = endDate
+        self.budget = budget
+        self.owner = owner
+
+class Employee(Record):
+    __slots__ = ("id", "forename", "surname", "age", "expertise", "comments")
+
+    def __init__(self, id, forename, surname, age, expertise, comments):
+        self.id = id
+        self.forename = forename
+        self.surname = surname
+        self.age = age
+        self.expertise = expertise
+        self.comments = comments
+
+    @property
+    def fullName(self):
+        return f"{self.forename} {self.surname}"
+
+class Task(Record):
+    __slots__ = ("id", "projectID", "startDate", "endDate", "leader", "description", "comments")
+
+    def __init__(self, id, projectID, startDate, endDate, leader, description, comments):
+        self.id = id
+        self.projectID = projectID
+        self.startDate = startDate
+        self.endDate = endDate
+        self.leader = leader
+        self.description = description
+        self.comments = comments
@@ -0,0 +1,399 @@
+import heapq
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import repeat
+from operator import add, eq, sub
+
+from dates import DayNumber, DayText, Today
+
+#How many projects' schedules are kept in memory, least recently asked about dropped first
+MAX_SCHEDULES = 8
+#Past this many unread changes it is quicker to rebuild the schedules when next asked
+REBUILD_AFTER = 20000
+#Earliest start given to a removed task's slot, so it never counts as the project's start
+REMOVED = 2 ** 31 - 1
+
+#The critical path schedule of one project's tasks. Each task is a slot in flat int arrays holding
+#its planned start and length in days (dates.DayNumber, ends exclusive), its earliest start, and its
+#tail: its own length plus the longest chain of lags and tasks that has to follow it. A task can't
+#start before its planned start or before the tasks it depends on have finished plus their lag.
+#
+#The backward pass is kept as tails rather than latest finishes, because a tail only depends on
+#what comes after a task, not on when the project finishes. Latest start is then finish - tail and
+#float is latest start - earliest start, so a change to the finish date costs nothing. Editing a
+#task only has to push new earliest starts down through the tasks after it, and new tails up
+#through the tasks before it, stopping wherever a value doesn't change.
+#
+#Tasks are kept in a topological order (rank) so both passes can visit each task once, in order.
+#A new dependency that goes against the order only reorders the tasks between its two ends
+#(Pearce and Kelly's algorithm), which is also how a dependency that would close a circle is found
+class Schedule:
+    def __init__(self):
+        self.index = {}
+        self.ids = []
+        self.planned = array("i")
+        self.lengths = array("i")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.tails = array("i")
+        self.ranks = array("i")
+        self.order = []
+        self.predecessors = []
+        self.successors = []
+        self.origin = DayNumber(Today())
+        self.forward = set()
+        self.backward = set()
+        self.finish = 0
+
+    #Fills the schedule from (ID, start, end) task rows and (TaskID, DependsOn, Lag) dependency
+    #rows, then runs both passes over everything. The task columns go into the arrays whole rather
+    #than a task at a time. Dependencies that form a circle are left out
+    def Build(self, taskBatches, dependencyBatches):
+        rows = [row for rows in taskBatches for row in rows]
+        if not rows:
+            return
+        ids, planned, ends = (list(column) for column in zip(*rows))
+        known = [start for start, end in zip(planned, ends) if start is not None and end is not None]
+        if known:
+            self.origin = min(known)
+        if len(known) < len(rows):
+            #Tasks whose dates can't be read take no time, from the project's first day
+            for slot, (start, end) in enumerate(zip(planned, ends)):
+                if start is None or end is None:
+                    planned[slot] = ends[slot] = self.origin
+        count = len(ids)
+        self.ids = ids
+        self.index = dict(zip(ids, range(count)))
+        self.planned = array("i", planned)
+        self.lengths = array("i", map(sub, ends, planned))
+        self.starts = array("i", planned)
+        self.ends = array("i", ends)
+        self.tails = array("i", self.lengths)
+        self.predecessors = [{} for slot in range(count)]
+        self.successors = [{} for slot in range(count)]
+        index = self.index
+        for rows in dependencyBatches:
+            for taskID, dependsOn, lag in rows:
+                task = index.get(taskID)
+                other = index.get(dependsOn)
+                if task is not None and other is not None and task != other:
+                    self.predecessors[task][other] = lag
+                    self.successors[other][task] = lag
+        self.Sort()
+        for slot in self.order:
+            if self.predecessors[slot]:
+                self.starts[slot] = self.EarliestStart(slot)
+                self.ends[slot] = self.starts[slot] + self.lengths[slot]
+        for slot in reversed(self.order):
+            if self.successors[slot]:
+                self.tails[slot] = self.Tail(slot)
+        self.finish = max(self.ends)
+        self.forward.clear()
+        self.backward.clear()
+
+    #Kahn's algorithm. Whatever is left once no task is free of unplaced dependencies is part of a
+    #circle; those tasks go last and the dependencies pointing backwards are dropped
+    def Sort(self):
+        waiting = [len(predecessors) for predecessors in self.predecessors]
+        ready = [slot for slot, count in enumerate(waiting) if count == 0]
+        order = []
+        while ready:
+            slot = ready.pop()
+            order.append(slot)
+            for successor in self.successors[slot]:
+                waiting[successor] -= 1
+                if waiting[successor] == 0:
+                    ready.append(successor)
+        placed = len(order)
+        if placed < len(self.ids):
+            order.extend(slot for slot, count in enumerate(waiting) if count > 0)
+        self.order = order
+        self.ranks = array("i", bytes(4 * len(order)))
+        for rank, slot in enumerate(order):
+            self.ranks[slot] = rank
+        for slot in order[placed:]:
+            for other in [other for other in self.predecessors[slot] if self.ranks[other] > self.ranks[slot]]:
+                self.RemoveDependency(slot, other)
+
+    #A new task has no dependencies yet, so it can go at the end of the order
+    def Add(self, taskID, start, end):
+        slot = len(self.ids)
+        self.index[taskID] = slot
+        self.ids.append(taskID)
+        if start is None or end is None:
+            start, end = self.origin, self.origin
+        self.planned.append(start)
+        self.lengths.append(end - start)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.tails.append(end - start)
+        self.ranks.append(len(self.order))
+        self.order.append(slot)
+        self.predecessors.append({})
+        self.successors.append({})
+        self.forward.add(slot)
+        self.backward.add(slot)
+        return slot
+
+    def Update(self, taskID, start, end):
+        slot = self.index.get(taskID)
+        if slot is None:
+            self.Add(taskID, start, end)
+            return
+        if start is None or end is None:
+            start, end = self.origin, self.origin
+        self.planned[slot] = start
+        self.lengths[slot] = end - start
+        self.forward.add(slot)
+        self.backward.add(slot)
+
+    #The slot is left in place, empty, so no other task's slot or rank has to move
+    def Remove(self, taskID):
+        slot = self.index.pop(taskID, None)
+        if slot is None:
+            return
+        for other in list(self.predecessors[slot]):
+            self.RemoveDependency(slot, other)
+        for other in list(self.successors[slot]):
+            self.RemoveDependency(other, slot)
+        self.ids[slot] = 0
+        self.planned[slot] = self.lengths[slot] = self.tails[slot] = self.ends[slot] = 0
+        self.starts[slot] = REMOVED
+        self.forward.discard(slot)
+        self.backward.discard(slot)
+
+    #Replaces what a task depends on with dependsOn, (task ID, lag) pairs. Returns the IDs that
+    #were left out because they would close a circle
+    def SetDependencies(self, taskID, dependsOn):
+        slot = self.index.get(taskID)
+        if slot is None:
+            return []
+        wanted = {self.index[other]: lag for other, lag in dependsOn if other in self.index and other != taskID}
+        for other in [other for other in self.predecessors[slot] if other not in wanted]:
+            self.RemoveDependency(slot, other)
+        circular = []
+        for other, lag in wanted.items():
+            if self.predecessors[slot].get(other) != lag and not self.AddDependency(slot, other, lag):
+                circular.append(self.ids[other])
+        return circular
+
+    def AddDependency(self, slot, other, lag):
+        if self.ranks[other] > self.ranks[slot] and not self.Reorder(other, slot):
+            return False
+        self.predecessors[slot][other] = lag
+        self.successors[other][slot] = lag
+        self.forward.add(slot)
+        self.backward.add(other)
+        return True
+
+    def RemoveDependency(self, slot, other):
+        del self.predecessors[slot][other]
+        del self.successors[other][slot]
+        self.forward.add(slot)
+        self.backward.add(other)
+
+    #Makes room for a dependency from first to last, where last is ranked before first. Only the
+    #tasks ranked between them that have to come after last or before first are moved: those that
+    #must precede first take the lowest of their ranks, in their old order, and those that must
+    #follow last the rest. Returns False if last already leads to first
+    def Reorder(self, first, last):
+        lower, upper = self.ranks[last], self.ranks[first]
+        after = self.Reach(last, self.successors, lambda rank: rank <= upper)
+        if first in after:
+            return False
+        before = self.Reach(first, self.predecessors, lambda rank: rank >= lower)
+        byRank = self.ranks.__getitem__
+        slots = sorted(before, key=byRank) + sorted(after, key=byRank)
+        for rank, slot in zip(sorted(map(byRank, slots)), slots):
+            self.ranks[slot] = rank
+            self.order[rank] = slot
+        return True
+
+    def Reach(self, slot, edges, within):
+        reached = {slot}
+        stack = [slot]
+        while stack:
+            for other in edges[stack.pop()]:
+                if other not in reached and within(self.ranks[other]):
+                    reached.add(other)
+                    stack.append(other)
+        return reached
+
+    def EarliestStart(self, slot):
+        start = self.planned[slot]
+        ends = self.ends
+        for other, lag in self.predecessors[slot].items():
+            if ends[other] + lag > start:
+                start = ends[other] + lag
+        return start
+
+    def Tail(self, slot):
+        longest = 0
+        tails = self.tails
+        for other, lag in self.successors[slot].items():
+            if tails[other] + lag > longest:
+                longest = tails[other] + lag
+        return self.lengths[slot] + longest
+
+    #Runs both passes from the tasks changed since the last call, visiting tasks in rank order
+    #through a heap and going no further than the values that changed. Returns how many tasks it
+    #looked at
+    def Propagate(self):
+        visited = 0
+        ranks = self.ranks
+        heap = [(ranks[slot], slot) for slot in self.forward]
+        heapq.heapify(heap)
+        queued = set(self.forward)
+        while heap:
+            slot = heapq.heappop(heap)[1]
+            visited += 1
+            start = self.EarliestStart(slot)
+            end = start + self.lengths[slot]
+            if start != self.starts[slot] or end != self.ends[slot]:
+                self.starts[slot] = start
+                self.ends[slot] = end
+                for other in self.successors[slot]:
+                    if other not in queued:
+                        queued.add(other)
+                        heapq.heappush(heap, (ranks[other], other))
+        heap = [(-ranks[slot], slot) for slot in self.backward]
+        heapq.heapify(heap)
+        queued = set(self.backward)
+        while heap:
+            slot = heapq.heappop(heap)[1]
+            visited += 1
+            tail = self.Tail(slot)
+            if tail != self.tails[slot]:
+                self.tails[slot] = tail
+                for other in self.predecessors[slot]:
+                    if other not in queued:
+                        queued.add(other)
+                        heapq.heappush(heap, (-ranks[other], other))
+        if self.forward or self.backward:
+            self.finish = max(self.ends, default=0)
+        self.forward.clear()
+        self.backward.clear()
+        return visited
+
+    def Critical(self, slot):
+        return self.ids[slot] != 0 and self.starts[slot] + self.tails[slot] == self.finish
+
+    #Start, finish and the number of tasks with no float, as stored dates
+    def Summary(self):
+        if not self.index:
+            return None
+        critical = sum(map(eq, map(add, self.starts, self.tails), repeat(self.finish)))
+        return {"start": DayText(min(self.starts)), "finish": DayText(max(self.finish - 1, min(self.starts))),
+                "tasks": len(self.index), "critical": critical}
+
+    #IDs of the tasks with no float, in the order they have to happen
+    def CriticalPath(self, limit=None):
+        path = []
+        for slot in self.order:
+            if self.Critical(slot):
+                path.append(self.ids[slot])
+                if limit is not None and len(path) >= limit:
+                    break
+        return path
+
+    #Earliest and latest start and finish of a task as stored dates, both ends inclusive, and its
+    #float in days
+    def Dates(self, taskID):
+        slot = self.index.get(taskID)
+        if slot is None:
+            return None
+        start, length = self.starts[slot], self.lengths[slot]
+        latest = self.finish - self.tails[slot]
+        return {"earliestStart": DayText(start), "earliestFinish": DayText(start + max(length - 1, 0)),
+                "latestStart": DayText(latest), "latestFinish": DayText(latest + max(length - 1, 0)),
+                "float": latest - start, "critical": latest == start}
+
+#The schedules of the projects being looked at, built on first use and kept up to date from the
+#change feed in the same way as analytics.Workload: a changed task is re-read and only its own
+#part of the graph recalculated
+class Scheduler:
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.RLock()
+        self.schedules = OrderedDict()
+        self.pending = []
+        self.stale = False
+        self.pendingLock = threading.Lock()
+        self.token = None
+
+    #Runs on whichever thread committed; the changes are applied at the next question
+    def Queue(self, changes):
+        with self.pendingLock:
+            if len(self.pending) + len(changes) > REBUILD_AFTER:
+                self.pending = []
+                self.stale = True
+            else:
+                self.pending.extend(changes)
+
+    def Close(self):
+        if self.token is not None:
+            self.db.changes.Unsubscribe(self.token)
+
+    def Refresh(self):
+        if self.token is None:
+            self.token = self.db.changes.Subscribe(self.Queue, ("Tasks", "TaskDependencies", "Projects"))
+        self.db.changes.PollIfChanged()
+        with self.pendingLock:
+            changes, self.pending = self.pending, []
+            stale, self.stale = self.stale, False
+        if stale:
+            self.schedules.clear()
+        affected = {}
+        for change in changes:
+            if change.projectID in self.schedules:
+                affected.setdefault(change.projectID, []).append(change)
+        for projectID, projectChanges in affected.items():
+            self.Apply(self.schedules[projectID], projectChanges)
+            if any(change.table == "Projects" and change.action == "delete" for change in projectChanges):
+                del self.schedules[projectID]
+
+    def Apply(self, schedule, changes):
+        tasks = {}
+        dependencies = set()
+        for change in changes:
+            if change.table == "Tasks":
+                tasks[change.rowID] = change.action
+                dependencies.add(change.rowID)
+            elif change.table == "TaskDependencies":
+                dependencies.add(change.rowID)
+        for taskID, action in tasks.items():
+            row = None if action == "delete" else self.db.get_schedule_task(taskID)
+            if row is None:
+                schedule.Remove(taskID)
+            else:
+                schedule.Update(taskID, *row)
+        for taskID in dependencies:
+            if taskID in schedule.index:
+                schedule.SetDependencies(taskID, self.db.get_dependency_lags(taskID))
+        schedule.Propagate()
+
+    #The project's schedule, up to date. Callers hold the lock
+    def Get(self, projectID):
+        self.Refresh()
+        schedule = self.schedules.get(projectID)
+        if schedule is None:
+            schedule = Schedule()
+            schedule.Build(self.db.get_schedule_tasks(projectID), self.db.get_project_dependencies(projectID))
+            self.schedules[projectID] = schedule
+            while len(self.schedules) > MAX_SCHEDULES:
+                self.schedules.popitem(last=False)
+        self.schedules.move_to_end(projectID)
+        return schedule
+
+    def Summary(self, projectID):
+        with self.lock:
+            return self.Get(projectID).Summary()
+
+    def CriticalPath(self, projectID, limit=None):
+        with self.lock:
+            return self.Get(projectID).CriticalPath(limit)
+
+    def Dates(self, projectID, taskID):
+        with self.lock:
+            return self.Get(projectID).Dates(taskID)
@@ -0,0 +1,280 @@
+import argparse
+import inspect
+import json
+import queue
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from database import Database, DATABASE_NAME, CloseAllConnections
+from services import ProjectService, PeopleService, TaskService, ChangeService, WorkloadService, ScheduleService, \
+    ArchiveService
+from archive import ArchiveJob
+from backup import BackupJob
+from metrics import metrics, StartProfiling
+
+#Runs the project, people and task services behind a local HTTP/JSON API so that many clients
+#share one Database.db through a single process. Reads run concurrently on a bounded pool of
+#WAL readers; writes are funnelled through one writer thread that commits them in groups.
+#
+#   POST /api/<service>/<method>   body: {"args": [...]}   ->   {"result": ...} or {"error": "..."}
+#   GET  /metrics                  statement timings and the slow query log as Prometheus text
+#   GET  /metrics.json             the same as JSON
+
+#Which service methods are exposed, split by whether they have to go through the writer
+READ_METHODS = {
+    "projects": {"count", "page_anchors", "page", "get", "dashboard", "active_between"},
+    "people": {"count", "page_anchors", "page", "get", "names", "forename", "find_id", "search"},
+    "tasks": {"count", "page_anchors", "page", "for_project", "get", "search", "overdue", "due_between",
+              "due_this_week", "timeline"},
+    "changes": {"latest", "since"},
+    "workload": {"load", "peak", "overallocated", "suggestions"},
+    "schedule": {"project", "critical_path", "task", "dependencies"},
+    "archive": {"years", "count", "page_anchors", "page", "get", "tasks", "search"},
+}
+WRITE_METHODS = {
+    "projects": {"add", "update", "delete", "delete_many"},
+    "people": {"add", "update", "delete", "delete_many"},
+    "tasks": {"add", "update", "delete"},
+    "changes": set(),
+    "workload": set(),
+    "schedule": {"set_dependencies", "add_dependency", "remove_dependency"},
+    "archive": set(),
+}
+
+#The types an argument may arrive as for a parameter annotated with annotation, or None to take
+#anything. JSON only has lists, so a List[...] parameter takes a list, and an int is fine for a float
+def AllowedTypes(annotation):
+    if annotation is None or annotation is typing.Any:
+        return None
+    if annotation is float:
+        return (int, float)
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        allowed = [AllowedTypes(member) for member in typing.get_args(annotation)]
+        return None if None in allowed else tuple(kind for kinds in allowed for kind in kinds)
+    if origin is not None:
+        return (origin,)
+    return (annotation,) if isinstance(annotation, type) else None
+
+#(signature, {parameter: allowed types}) of a service method, worked out once per method
+@lru_cache(maxsize=None)
+def MethodParameters(function):
+    hints = typing.get_type_hints(function)
+    return inspect.signature(function), {name: AllowedTypes(hint) for name, hint in hints.items() if name != "return"}
+
+#Why args can't be passed to a service method, or None if they can. Checked before the call, so
+#that a mistake in the request is told apart from a method failing
+def ArgumentProblem(method, args):
+    if not isinstance(args, list):
+        return "args must be a list"
+    signature, allowed = MethodParameters(method.__func__)
+    try:
+        bound = signature.bind(None, *args)
+    except TypeError as error:
+        return str(error)
+    for name, value in list(bound.arguments.items())[1:]:
+        kinds = allowed.get(name)
+        if kinds is not None and (not isinstance(value, kinds) or (isinstance(value, bool) and bool not in kinds)):
+            names = ["None" if kind is type(None) else kind.__name__ for kind in kinds]
+            return f"{name} must be {' or '.join(names)}, got {type(value).__name__}"
+    return None
+
+#Serializes every write onto one thread. Whatever has queued up while the previous group was
+#committing is run as the next group inside a single transaction, each job in its own savepoint
+#so one failing write doesn't undo the others
+class WriterQueue:
+    def __init__(self, db, maxGroup=256):
+        self.db = db
+        self.maxGroup = maxGroup
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.Run, name="writer", daemon=True)
+        self.thread.start()
+
+    def Submit(self, function, *args):
+        future = Future()
+        self.jobs.put((future, function, args))
+        return future
+
+    def Run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            group = [job]
+            while len(group) < self.maxGroup:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self.jobs.put(None)
+                    break
+                group.append(job)
+            self.Commit(group)
+
+    def Commit(self, group):
+        results = []
+        try:
+            with self.db.transaction():
+                for future, function, args in group:
+                    self.db.execute_query("SAVEPOINT job")
+                    try:
+                        results.append((future, function(*args), None))
+                    except Exception as error:
+                        self.db.execute_query("ROLLBACK TO job")
+                        results.append((future, None, error))
+                    self.db.execute_query("RELEASE job")
+        except Exception as error:
+            for future, function, args in group:
+                future.set_exception(error)
+            return
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def Stop(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+#Answers one request per connection, so a worker is never held by an idle keep-alive client
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "api":
+            self.Reply(404, {"error": f"Unknown path {self.path}"})
+            return
+        serviceName, methodName = parts[1], parts[2]
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            args = body.get("args", [])
+        except (ValueError, AttributeError):
+            self.Reply(400, {"error": "Body must be a JSON object with an args list"})
+            return
+        self.Reply(*self.server.Call(serviceName, methodName, args))
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.ReplyText(200, metrics.ToPrometheus(), "text/plain; version=0.0.4")
+        elif self.path == "/metrics.json":
+            self.ReplyText(200, metrics.ToJson(), "application/json")
+        else:
+            self.Reply(404, {"error": f"Unknown path {self.path}"})
+
+    def Reply(self, status, payload):
+        self.ReplyText(status, json.dumps(payload, default=list), "application/json")
+
+    def ReplyText(self, status, text, contentType):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+#An HTTP server that hands each connection to a fixed size thread pool. Once every worker is busy
+#and the backlog is full, accepting new connections waits instead of spawning more threads
+class ProjectServer(HTTPServer):
+    def __init__(self, address, dbName=DATABASE_NAME, workers=8, backlog=64, verbose=False):
+        super().__init__(address, RequestHandler)
+        self.verbose = verbose
+        self.db = Database(dbName)
+        self.services = {
+            "projects": ProjectService(self.db),
+            "people": PeopleService(self.db),
+            "tasks": TaskService(self.db),
+            "changes": ChangeService(self.db),
+            "workload": WorkloadService(self.db),
+            "schedule": ScheduleService(self.db),
+            "archive": ArchiveService(self.db),
+        }
+        self.writer = WriterQueue(self.db)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reader")
+        self.slots = threading.BoundedSemaphore(workers + backlog)
+
+    def process_request(self, request, clientAddress):
+        self.slots.acquire()
+        self.pool.submit(self.ProcessInWorker, request, clientAddress)
+
+    def ProcessInWorker(self, request, clientAddress):
+        try:
+            self.finish_request(request, clientAddress)
+        except Exception:
+            self.handle_error(request, clientAddress)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    #Returns (HTTP status, JSON payload) for one API call. A request that doesn't fit the method's
+    #parameters is a 400, as is a ValueError, which is how the services turn down a value such as an
+    #unreadable date or an unknown name. Anything else is a failure of ours: a 500, recorded in the
+    #metrics and logged with its traceback
+    def Call(self, serviceName, methodName, args):
+        service = self.services.get(serviceName)
+        if service is None:
+            return 404, {"error": f"Unknown service {serviceName}"}
+        if methodName not in READ_METHODS[serviceName] and methodName not in WRITE_METHODS[serviceName]:
+            return 404, {"error": f"Unknown method {serviceName}.{methodName}"}
+        method = getattr(service, methodName)
+        problem = ArgumentProblem(method, args)
+        if problem is not None:
+            return 400, {"error": f"{serviceName}.{methodName}: {problem}"}
+        try:
+            if methodName in READ_METHODS[serviceName]:
+                result = method(*args)
+            else:
+                result = self.writer.Submit(method, *args).result()
+        except ValueError as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            metrics.RecordError(f"server {serviceName}.{methodName}", error)
+            return 500, {"error": repr(error)}
+        return 200, {"result": result}
+
+    def server_close(self):
+        super().server_close()
+        self.writer.Stop()
+        self.pool.shutdown(wait=True)
+
+#Starts a server on a background thread and returns it, used by the load test
+def StartServer(host="127.0.0.1", port=0, dbName=DATABASE_NAME, workers=8):
+    server = ProjectServer((host, port), dbName, workers)
+    threading.Thread(target=server.serve_forever, name="http", daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve Database.db over a local HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--archive-days", type=int, default=None,
+                        help="move projects that finished more than this many days ago into yearly archives")
+    parser.add_argument("--backup-minutes", type=float, default=None,
+                        help="take a snapshot of the database this often, see backup.py")
+    arguments = parser.parse_args()
+    StartProfiling()
+    server = ProjectServer((arguments.host, arguments.port), arguments.database, arguments.workers,
+                           verbose=arguments.verbose)
+    if arguments.archive_days is not None:
+        ArchiveJob(server.db, server.services["projects"].purger, arguments.archive_days).Start()
+    if arguments.backup_minutes is not None:
+        BackupJob(arguments.database, arguments.backup_minutes).Start()
+    print(f"Serving {arguments.database} on http://{arguments.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        CloseAllConnections()
@@ -0,0 +1,302 @@
+import json
+import re
+from itertools import islice
+from typing import List, Optional, Tuple
+
+from database import Database, DATABASE_NAME, LIVE_PROJECTS
+from dates import NormalizeDate, Today, WeekBounds
+from records import Project, Employee, Task
+from purge import PurgeJob
+from changes import Change
+from analytics import Workload, Conflict, Suggestion, DEFAULT_CAPACITY
+from schedule import Scheduler
+from archive import ArchiveReader
+
+#The data operations behind each screen, with no Tk involved, so they can be run, profiled and
+#load tested headless. Methods take and return plain values and tuples straight from the database
+
+#Splits a "Forename Surname" combobox value the same way the screens always have
+def SplitName(fullName: str) -> Tuple[str, str]:
+    parts = fullName.split(" ", 1)
+    if len(parts) != 2:
+        raise ValueError(f"Expected 'Forename Surname', got {fullName!r}")
+    return parts[0], parts[1]
+
+class PeopleService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+
+    def count(self) -> int:
+        return self.db.count_rows("Employees")
+
+    def page_anchors(self, pageSize: int) -> List[int]:
+        return self.db.page_anchors("Employees", pageSize)
+
+    #(ID, Forename) pairs for the people list
+    def page(self, afterID: Optional[int], limit: int) -> List[tuple]:
+        return self.db.page_employees(afterID, limit)
+
+    def get(self, personID: int) -> Optional[Employee]:
+        return self.db.get_employee(personID)
+
+    #"Forename Surname" of everyone, for the leader comboboxes
+    def names(self) -> List[str]:
+        return [f"{forename} {surname}" for forename, surname in self.db.get_employee_names()]
+
+    def forename(self, personID) -> str:
+        rows = self.db.get_employee_forename(personID)
+        return str(rows[0][0]) if rows else ""
+
+    def find_id(self, fullName: str) -> int:
+        forename, surname = SplitName(fullName)
+        rows = self.db.get_employee_id(forename, surname)
+        if not rows:
+            raise ValueError(f"No employee called {fullName!r}")
+        return rows[0][0]
+
+    #(ID, Forename, Surname, snippet) for people whose name, expertise or comments match
+    def search(self, text: str, limit: int = 50) -> List[tuple]:
+        return self.db.search_employees(text, limit)
+
+    def add(self, forename: str, surname: str, age, expertise: str, comments: str) -> int:
+        return self.db.add_person(forename, surname, age, expertise, comments)
+
+    def update(self, personID: int, forename: str, surname: str, age, expertise: str, comments: str) -> None:
+        self.db.update_person(personID, forename, surname, age, expertise, comments)
+
+    def delete(self, personID: int) -> None:
+        self.db.delete_person(personID)
+
+    def delete_many(self, personIDs: List[int]) -> None:
+        self.db.delete_people(personIDs)
+
+class ProjectService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+        self.people = PeopleService(self.db)
+        self.purger = PurgeJob(self.db)
+
+    def count(self) -> int:
+        return self.db.count_rows("Projects", LIVE_PROJECTS)
+
+    def page_anchors(self, pageSize: int) -> List[int]:
+        return self.db.page_anchors("Projects", pageSize, LIVE_PROJECTS)
+
+    #(ID, Name) pairs for the project list
+    def page(self, afterID: Optional[int], limit: int) -> List[tuple]:
+        return self.db.page_projects(afterID, limit)
+
+    def get(self, projectID: int) -> Optional[Project]:
+        return self.db.get_project(projectID)
+
+    #The project with its owner's name and task rollups, all from one query
+    def dashboard(self, projectID: int) -> Optional[dict]:
+        row = self.db.get_project_dashboard(projectID)
+        if row is None:
+            return None
+        return {
+            "project": Project(*row[:6]),
+            "ownerName": row[6] or "",
+            "taskCount": row[7],
+            "firstStart": row[8],
+            "lastEnd": row[9],
+            "leaders": [{"id": leaderID, "name": name or "", "tasks": tasks} for leaderID, name, tasks in json.loads(row[10])],
+        }
+
+    #(ID, Name, Start Date, End Date) of the projects running at any point between two dates
+    def active_between(self, start: str, end: str) -> List[tuple]:
+        return self.db.get_projects_active_between(NormalizeDate(start), NormalizeDate(end))
+
+    def add(self, name: str, startDate: str, endDate: str, budget, leaderName: str) -> int:
+        with self.db.transaction():
+            leaderID = self.people.find_id(leaderName)
+            return self.db.add_project(name, startDate, endDate, budget, leaderID)
+
+    def update(self, projectID: int, name: str, startDate: str, endDate: str, budget, leaderName: str) -> None:
+        with self.db.transaction():
+            leaderID = self.people.find_id(leaderName)
+            self.db.update_project(projectID, name, startDate, endDate, budget, leaderID)
+
+    #Projects disappear straight away and are purged with their tasks in the background
+    def delete(self, projectID: int) -> None:
+        self.delete_many([projectID])
+
+    def delete_many(self, projectIDs: List[int]) -> None:
+        self.db.mark_projects_deleted(projectIDs)
+        self.purger.Wake()
+
+class TaskService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+        self.people = PeopleService(self.db)
+
+    def count(self, projectID: int) -> int:
+        return self.db.count_rows("Tasks", "WHERE ProjectID = ?", (projectID,))
+
+    def page_anchors(self, projectID: int, pageSize: int) -> List[int]:
+        return self.db.page_anchors("Tasks", pageSize, "WHERE ProjectID = ?", (projectID,))
+
+    #(ID, Description) pairs for a project's task list
+    def page(self, projectID: int, afterID: Optional[int], limit: int) -> List[tuple]:
+        return self.db.page_tasks(projectID, afterID, limit)
+
+    def for_project(self, projectID: int) -> List[Task]:
+        return self.db.get_tasks(projectID)
+
+    def get(self, taskID: int) -> Optional[Task]:
+        return self.db.get_task(taskID)
+
+    #(ID, ProjectID, Description, snippet) for tasks whose description or comments match
+    def search(self, text: str, limit: int = 50) -> List[tuple]:
+        return self.db.search_tasks(text, limit)
+
+    #(ID, ProjectID, Description, EndDate) of tasks that ended before today, most overdue first
+    def overdue(self, limit: int = 500) -> List[tuple]:
+        return self.db.get_overdue_tasks(Today(), limit)
+
+    def due_between(self, start: str, end: str, limit: int = 500) -> List[tuple]:
+        return self.db.get_tasks_due_between(NormalizeDate(start), NormalizeDate(end), limit)
+
+    def due_this_week(self, limit: int = 500) -> List[tuple]:
+        return self.db.get_tasks_due_between(*WeekBounds(), limit)
+
+    #(ID, Description, StartDate, EndDate, leader) of a project's tasks overlapping a date window
+    def timeline(self, projectID: int, start: str, end: str, limit: int = 1000) -> List[tuple]:
+        rows = self.db.iter_timeline(projectID, NormalizeDate(start), NormalizeDate(end), min(limit, 500))
+        return list(islice(rows, limit))
+
+    def add(self, projectID: int, name: str, startDate: str, endDate: str, leaderName: str, comments: str) -> int:
+        with self.db.transaction():
+            leaderID = self.people.find_id(leaderName)
+            return self.db.add_task(projectID, startDate, endDate, leaderID, name, comments)
+
+    def update(self, taskID: int, name: str, startDate: str, endDate: str, comments: str) -> None:
+        self.db.update_task(taskID, name, startDate, endDate, comments)
+
+    def delete(self, taskID: int) -> None:
+        self.db.delete_task(taskID)
+
+#Row level changes for clients that poll for them, such as the screens or anything talking to
+#server.py. In process code can subscribe to Database.changes instead
+class ChangeService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+
+    #The cursor to pass to since, to get the changes from now on
+    def latest(self) -> int:
+        return self.db.get_latest_change()
+
+    #Up to limit Changes after the cursor, oldest first. The last one's sequence is the next cursor
+    def since(self, cursor: int, limit: int = 1000) -> List[Change]:
+        return [Change(*row) for row in self.db.get_changes_since(cursor, limit)]
+
+#Who is leading too many tasks at once, and who could take some of them over. The profiles are
+#built on first use and then kept up to date from the change log, see analytics.py
+class WorkloadService:
+    def __init__(self, db: Optional[Database] = None, capacity: int = DEFAULT_CAPACITY):
+        self.db = db or Database(DATABASE_NAME)
+        self.workload = Workload(self.db, capacity)
+
+    #(start, end, tasks at once) pieces of someone's workload between two dates
+    def load(self, personID: int, start: str, end: str) -> List[tuple]:
+        return self.workload.Load(personID, start, end)
+
+    def peak(self, personID: int, start: str, end: str) -> int:
+        return self.workload.Peak(personID, start, end)
+
+    def overallocated(self, start: str, end: str, limit: int = 100) -> List[Conflict]:
+        return self.workload.Conflicts(start, end, limit)
+
+    def suggestions(self, start: str, end: str, limit: int = 50) -> List[Suggestion]:
+        return self.workload.Suggestions(start, end, limit)
+
+#Reads what a dependency box holds, task IDs separated by commas or spaces, each optionally
+#followed by "+lag" in days, e.g. "12, 15+2"
+def ParseDependencies(text: str) -> List[Tuple[int, int]]:
+    dependencies = []
+    for item in re.split(r"[\s,]+", text.strip()):
+        if not item:
+            continue
+        match = re.fullmatch(r"(\d+)(?:\+(\d+))?", item)
+        if match is None:
+            raise ValueError(f"Expected task IDs such as 12, 15+2, got {item!r}")
+        dependencies.append((int(match.group(1)), int(match.group(2) or 0)))
+    return dependencies
+
+#Dependencies between a project's tasks and the critical path schedule they give. Schedules are
+#built the first time a project is asked about and then kept up to date from the change log, so
+#editing a task only recalculates the tasks before and after it, see schedule.py
+class ScheduleService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+        self.scheduler = Scheduler(self.db)
+
+    #Earliest start and finish of the project, its task count and how many tasks have no float
+    def project(self, projectID: int) -> Optional[dict]:
+        return self.scheduler.Summary(projectID)
+
+    #(ID, Description) of the tasks with no float, in the order they have to happen
+    def critical_path(self, projectID: int, limit: int = 100) -> List[tuple]:
+        return self.db.get_task_descriptions(self.scheduler.CriticalPath(projectID, limit))
+
+    #Earliest and latest start and finish, float in days and whether the task is critical
+    def task(self, taskID: int) -> Optional[dict]:
+        task = self.db.get_task(taskID)
+        if task is None or task.projectID is None:
+            return None
+        return self.scheduler.Dates(task.projectID, taskID)
+
+    #(ID, Description, Lag) of the tasks this one waits for
+    def dependencies(self, taskID: int) -> List[tuple]:
+        return self.db.get_dependencies(taskID)
+
+    #Replaces what a task waits for with dependsOn, a list of task IDs or [ID, lag] pairs
+    def set_dependencies(self, taskID: int, dependsOn: list) -> None:
+        pairs = [(other, 0) if isinstance(other, int) else (other[0], other[1]) for other in dependsOn]
+        self.db.set_dependencies(taskID, pairs)
+
+    def add_dependency(self, taskID: int, dependsOn: int, lag: int = 0) -> None:
+        with self.db.transaction():
+            current = [(other, otherLag) for other, otherLag in self.db.get_dependency_lags(taskID) if other != dependsOn]
+            self.db.set_dependencies(taskID, current + [(dependsOn, lag)])
+
+    def remove_dependency(self, taskID: int, dependsOn: int) -> None:
+        with self.db.transaction():
+            current = [(other, lag) for other, lag in self.db.get_dependency_lags(taskID) if other != dependsOn]
+            self.db.set_dependencies(taskID, current)
+
+#Finished projects that have been moved into the yearly archive databases, see archive.py. The
+#list and its details come from the active database, tasks and search from the archives themselves
+class ArchiveService:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database(DATABASE_NAME)
+        self.reader = ArchiveReader(self.db)
+
+    #(Year, projects) of each archive, newest first
+    def years(self) -> List[tuple]:
+        return self.db.get_archive_years()
+
+    def count(self) -> int:
+        return self.db.count_rows("ArchivedProjects")
+
+    def page_anchors(self, pageSize: int) -> List[int]:
+        return self.db.page_anchors("ArchivedProjects", pageSize)
+
+    #(ID, Name) pairs for the archived project list
+    def page(self, afterID: Optional[int], limit: int) -> List[tuple]:
+        return self.db.page_archived_projects(afterID, limit)
+
+    #(ID, Name, Start Date, End Date, Year) of an archived project
+    def get(self, projectID: int) -> Optional[tuple]:
+        return self.db.get_archived_project(projectID)
+
+    #The first limit tasks of an archived project, from its year's archive
+    def tasks(self, projectID: int, limit: int = 1000) -> List[Task]:
+        project = self.db.get_archived_project(projectID)
+        if project is None:
+            return []
+        return [Task(*row) for row in self.reader.ProjectTasks(projectID, project[4], limit)]
+
+    #(ID, ProjectID, Description, snippet, Year) for archived tasks that match, from every archive
+    def search(self, text: str, limit: int = 50) -> List[tuple]:
+        return self.reader.SearchTasks(text, limit)
@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, CloseAllConnections
+
+#A copy of the shipped Database.db, at the schema version it was shipped with, so nothing a test
+#does reaches the real file
+@pytest.fixture
+def databasePath():
+    path = TemporaryDatabase()
+    yield path
+    CloseAllConnections()
+    RemoveTemporaryDatabase(path)
+
+#The copy opened the way the app opens it, which migrates it to the latest version
+@pytest.fixture
+def db(databasePath):
+    return Database(databasePath)
+
+#Tests marked slow, such as streaming a million tasks, only run when asked for with --run-slow
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="also run the tests marked slow")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes minutes, only run with --run-slow")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="slow, run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
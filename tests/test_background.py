@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from background import BackgroundExecutor
+from metrics import metrics
+
+#Stands in for the Tk root: after() only records the callback, and RunPending runs the ones
+#waiting, the way Tk's event loop would on the test's thread
+class FakeRoot:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, milliseconds, callback):
+        self.pending.append(callback)
+        return len(self.pending)
+
+    def RunPending(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+@pytest.fixture
+def root():
+    return FakeRoot()
+
+@pytest.fixture
+def executor(root):
+    executor = BackgroundExecutor(root)
+    yield executor
+    executor.Shutdown()
+
+#Polls until every job's result has been delivered or dropped
+def Settle(root, executor, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while executor.jobs and time.monotonic() < deadline:
+        time.sleep(0.001)
+        root.RunPending()
+    assert not executor.jobs
+
+def test_result_is_delivered_on_the_polling_thread(root, executor):
+    delivered = []
+    executor.Submit("record", lambda: threading.current_thread(), lambda worker: delivered.append((worker, threading.current_thread())))
+    Settle(root, executor)
+    [(worker, receiver)] = delivered
+    assert worker is not threading.current_thread()
+    assert receiver is threading.current_thread()
+
+#The older job finishes first, while the newer one is still running, and its result is dropped
+def test_newer_job_supersedes_older(root, executor):
+    started, releaseOld, releaseNew = threading.Event(), threading.Event(), threading.Event()
+    delivered = []
+    def Old():
+        started.set()
+        releaseOld.wait(5)
+        return "old"
+    old = executor.Submit("record", Old, delivered.append)
+    assert started.wait(5)
+    executor.Submit("record", lambda: releaseNew.wait(5) and "new", delivered.append)
+    releaseOld.set()
+    old.result(5)
+    time.sleep(0.01)
+    root.RunPending()
+    assert delivered == []
+    releaseNew.set()
+    Settle(root, executor)
+    assert delivered == ["new"]
+
+def test_jobs_under_other_keys_are_kept(root, executor):
+    delivered = []
+    executor.Submit("projects", lambda: "projects", delivered.append)
+    executor.Submit("people", lambda: "people", delivered.append)
+    Settle(root, executor)
+    assert sorted(delivered) == ["people", "projects"]
+
+def test_cancelled_job_is_not_delivered(root, executor):
+    release = threading.Event()
+    delivered = []
+    future = executor.Submit("record", lambda: release.wait(5), delivered.append)
+    executor.Cancel("record")
+    release.set()
+    try:
+        future.result(5)
+    except Exception:
+        pass
+    time.sleep(0.01)
+    root.RunPending()
+    assert delivered == []
+
+def test_failure_goes_to_error_callback(root, executor):
+    errors = []
+    executor.Submit("record", lambda: 1 / 0, lambda result: None, errors.append)
+    Settle(root, executor)
+    assert [type(error) for error in errors] == [ZeroDivisionError]
+
+#A callback that raises is recorded and doesn't stop the results after it arriving
+def test_failing_callback_is_recorded(root, executor):
+    before = metrics.errors.get("background", 0)
+    delivered = []
+    def Fail(result):
+        raise ValueError(result)
+    executor.Submit("first", lambda: "first", Fail)
+    executor.Submit("second", lambda: "second", delivered.append)
+    Settle(root, executor)
+    assert delivered == ["second"]
+    assert metrics.errors.get("background", 0) == before + 1
+
+#The queue is only polled while a job is waiting
+def test_stops_polling_when_idle(root, executor):
+    assert root.pending == []
+    executor.Submit("record", lambda: None, lambda result: None)
+    assert len(root.pending) == 1
+    Settle(root, executor)
+    root.RunPending()
+    assert root.pending == []
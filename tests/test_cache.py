@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from database import LIVE_PROJECTS
+
+#The first project and the first employee of the shipped database
+@pytest.fixture
+def ids(db):
+    return db.page_projects(None, 1)[0][0], db.page_employees(None, 1)[0][0]
+
+def Hits(db):
+    return db.manager.cache.hits
+
+def TaskIDs(db, projectID):
+    return sorted(task.id for task in db.get_tasks(projectID))
+
+def test_repeated_read_is_cached(db, ids):
+    projectID, leaderID = ids
+    first = db.get_tasks(projectID)
+    hits = Hits(db)
+    assert db.get_tasks(projectID) is first
+    assert Hits(db) == hits + 1
+
+def test_write_drops_cached_reads_of_its_table(db, ids):
+    projectID, leaderID = ids
+    before = TaskIDs(db, projectID)
+    count = db.count_rows("Tasks")
+    taskID = db.add_task(projectID, "2024-03-01", "2024-04-01", leaderID, "Cached task", "")
+    assert TaskIDs(db, projectID) == before + [taskID]
+    assert db.count_rows("Tasks") == count + 1
+    db.update_task(taskID, "Renamed task", "2024-03-01", "2024-04-01", "")
+    assert db.get_task(taskID).description == "Renamed task"
+    db.delete_task(taskID)
+    assert db.get_task(taskID) is None
+    assert TaskIDs(db, projectID) == before
+
+#The rollups read tables kept up to date by triggers, which have to be dropped with the table written
+def test_dashboard_follows_task_writes(db, ids):
+    projectID, leaderID = ids
+    before = db.get_project_dashboard(projectID)
+    db.add_task(projectID, "2024-03-01", "2024-04-01", leaderID, "Counted task", "")
+    assert db.get_project_dashboard(projectID) != before
+
+def test_soft_deleted_project_leaves_lists(db, ids):
+    projectID, leaderID = ids
+    count = db.count_rows("Projects", LIVE_PROJECTS)
+    db.delete_project(projectID)
+    assert db.count_rows("Projects", LIVE_PROJECTS) == count - 1
+    assert projectID not in [row[0] for row in db.page_projects(None, 100)]
+
+def test_write_keeps_other_tables_cached(db, ids):
+    projectID, leaderID = ids
+    page = db.page_employees(None, 10)
+    db.add_task(projectID, "2024-03-01", "2024-04-01", leaderID, "Unrelated task", "")
+    assert db.page_employees(None, 10) is page
+
+#Rows read inside a transaction that is rolled back must not be served afterwards
+def test_rollback_drops_reads_made_inside_it(db, ids):
+    projectID, leaderID = ids
+    before = TaskIDs(db, projectID)
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_task(projectID, "2024-03-01", "2024-04-01", leaderID, "Rolled back task", "")
+            assert len(db.get_tasks(projectID)) == len(before) + 1
+            raise RuntimeError("roll back")
+    assert TaskIDs(db, projectID) == before
+
+#How the server's writer runs each job, in a savepoint of a shared transaction. Until it commits,
+#readers on other threads must not be handed what the job read from the cache
+def test_reads_inside_a_transaction_stay_out_of_the_cache(db, ids):
+    projectID, leaderID = ids
+    before = TaskIDs(db, projectID)
+    seen = []
+    with db.transaction():
+        db.execute_query("SAVEPOINT job")
+        db.add_task(projectID, "2024-03-01", "2024-04-01", leaderID, "Rolled back task", "")
+        assert len(db.get_tasks(projectID)) == len(before) + 1
+        reader = threading.Thread(target=lambda: seen.append(TaskIDs(db, projectID)))
+        reader.start()
+        reader.join()
+        db.execute_query("ROLLBACK TO job")
+        db.execute_query("RELEASE job")
+    assert seen == [before]
+    assert TaskIDs(db, projectID) == before
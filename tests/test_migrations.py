@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import database
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from database import Database, ConnectionManager, MIGRATIONS, SCHEMA_VERSION, DATE_COLUMNS, GetSchemaVersion, Migrate
+from dates import NormalizeDate
+
+def Connect(path):
+    return sqlite3.connect(path, isolation_level=None)
+
+def Counts(connection):
+    return {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("Projects", "Employees", "Tasks")}
+
+def Schema(connection):
+    return sorted(connection.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall(),
+                  key=lambda row: row[:2])
+
+def Dates(connection):
+    dates = {}
+    for table, columns in DATE_COLUMNS.items():
+        selected = ", ".join(f'"{column}"' for column in columns)
+        for row in connection.execute(f"SELECT ID, {selected} FROM {table}"):
+            dates[(table, row[0])] = row[1:]
+    return dates
+
+#What a date ends up as: YYYY-MM-DD if it could be read, otherwise NULL as migration 4 clears it
+def Expected(value):
+    try:
+        return NormalizeDate(value)
+    except ValueError:
+        return None
+
+#Applies the first count migrations the way Migrate does, leaving the database part way up
+def MigrateTo(connection, count):
+    connection.execute("BEGIN IMMEDIATE")
+    for migration in MIGRATIONS[:count]:
+        if callable(migration):
+            migration(connection)
+        else:
+            for statement in migration:
+                connection.execute(statement)
+    connection.execute(f"PRAGMA user_version = {count}")
+    connection.execute("COMMIT")
+
+def test_shipped_database_is_unmigrated(databasePath):
+    assert GetSchemaVersion(Connect(databasePath)) == 0
+
+def test_migrates_shipped_database_to_latest(databasePath):
+    connection = Connect(databasePath)
+    counts, dates = Counts(connection), Dates(connection)
+    Migrate(connection)
+    assert GetSchemaVersion(connection) == SCHEMA_VERSION == len(MIGRATIONS)
+    assert Counts(connection) == counts
+    assert Dates(connection) == {key: tuple(Expected(value) for value in values) for key, values in dates.items()}
+    assert connection.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert connection.execute("PRAGMA foreign_key_check").fetchall() == []
+    connection.execute("INSERT INTO TasksSearch (TasksSearch) VALUES ('integrity-check')")
+    connection.execute("INSERT INTO EmployeesSearch (EmployeesSearch) VALUES ('integrity-check')")
+    names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    assert {"TasksProjectIndex", "TasksLeaderDatesIndex", "EmployeesNameIndex", "ProjectsNameIndex", "TasksSearch",
+            "EmployeesSearch", "ProjectLeaderCounts", "TasksTimelineIndex", "TasksDueIndex", "ChangeLog",
+            "TaskDependencies", "ArchivedProjects", "ClearedReferences"} <= names
+
+#Migration 5 clears references to people and projects that no longer exist, keeping the old values
+def test_cleared_references_are_kept(databasePath):
+    connection = Connect(databasePath)
+    dangling = connection.execute('SELECT COUNT(*) FROM Tasks WHERE "Task Leader" NOT IN (SELECT ID FROM Employees) '
+                                  'OR ProjectID NOT IN (SELECT ID FROM Projects)').fetchone()[0]
+    Migrate(connection)
+    assert dangling
+    assert connection.execute("SELECT COUNT(*) FROM ClearedReferences WHERE TableName = 'Tasks'").fetchone()[0] >= dangling
+
+#The task counts kept by triggers match counting the tasks
+def test_leader_counts_match_tasks(databasePath):
+    connection = Connect(databasePath)
+    Migrate(connection)
+    counted = connection.execute('SELECT ProjectID, CAST(IFNULL("Task Leader", 0) AS INTEGER), COUNT(*) FROM Tasks '
+                                 'WHERE ProjectID IS NOT NULL GROUP BY 1, 2 ORDER BY 1, 2').fetchall()
+    kept = connection.execute("SELECT ProjectID, LeaderID, Tasks FROM ProjectLeaderCounts WHERE Tasks > 0 ORDER BY 1, 2").fetchall()
+    assert kept == counted
+
+#A database left at any version is brought up to the same schema as one migrated in one go
+@pytest.mark.parametrize("applied", range(1, SCHEMA_VERSION))
+def test_resumes_from_every_version(databasePath, applied):
+    connection = Connect(databasePath)
+    MigrateTo(connection, applied)
+    assert GetSchemaVersion(connection) == applied
+    Migrate(connection)
+    assert GetSchemaVersion(connection) == SCHEMA_VERSION
+    referencePath = TemporaryDatabase()
+    try:
+        reference = Connect(referencePath)
+        Migrate(reference)
+        assert Schema(connection) == Schema(reference)
+        assert Counts(connection) == Counts(reference)
+        reference.close()
+    finally:
+        RemoveTemporaryDatabase(referencePath)
+
+#Opening a database migrates it once; after that Migrate doesn't write anything
+def test_migrated_database_is_left_alone(databasePath):
+    Database(databasePath).connect()
+    connection = Connect(databasePath)
+    assert GetSchemaVersion(connection) == SCHEMA_VERSION
+    schema = Schema(connection)
+    Migrate(connection)
+    assert connection.total_changes == 0
+    assert Schema(connection) == schema
+
+#Threads opening their first connections together migrate once, and none of them reads before the
+#migration is done
+def test_first_connections_migrate_once(databasePath, monkeypatch):
+    calls = []
+    def SlowMigrate(connection):
+        calls.append(connection)
+        time.sleep(0.05)
+        Migrate(connection)
+    monkeypatch.setattr(database, "Migrate", SlowMigrate)
+    manager = ConnectionManager(databasePath)
+    versions = []
+    threads = [threading.Thread(target=lambda: versions.append(GetSchemaVersion(manager.get_connection())))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.close_all()
+    assert len(calls) == 1
+    assert versions == [SCHEMA_VERSION] * 4
+
+#Dates written in another form after migration 4 are normalized by 11, which keeps text that isn't a date
+def test_later_dates_are_normalized_and_text_kept(databasePath):
+    connection = Connect(databasePath)
+    MigrateTo(connection, 10)
+    taskID = connection.execute("SELECT MIN(ID) FROM Tasks").fetchone()[0]
+    connection.execute("UPDATE Tasks SET StartDate = '31/12/24', EndDate = 'soon' WHERE ID = ?", (taskID,))
+    Migrate(connection)
+    assert connection.execute("SELECT StartDate, EndDate FROM Tasks WHERE ID = ?", (taskID,)).fetchone() == ("2024-12-31", "soon")
@@ -0,0 +1,10 @@
+import pytest
+
+from benchmarks.query_plans import HOT_CALLS, SentStatements, QueryPlan, PlanProblems
+
+#Every statement the Database methods behind a click send has to use its index on the migrated
+#database, without reading all of Tasks or sorting outside an index
+@pytest.mark.parametrize("name, call, expected", HOT_CALLS, ids=[name for name, call, expected in HOT_CALLS])
+def test_hot_call_uses_its_indexes(db, name, call, expected):
+    plans = [QueryPlan(db, query, parameters) for query, parameters in SentStatements(db, call)]
+    assert PlanProblems(name, plans, expected) == [], plans
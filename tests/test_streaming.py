@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from benchmarks.common import TemporaryDatabase, RemoveTemporaryDatabase
+from benchmarks.streaming import STREAMING_MODES, Measure, Problems
+from benchmarks.virtual_list import AddTasks
+
+#How many tasks the project being read has. Building a million takes about a minute
+STREAMING_ROWS = int(os.environ.get("PYROJECT_STREAMING_ROWS", 1000000))
+
+@pytest.fixture(scope="module")
+def largeDatabase():
+    path = TemporaryDatabase()
+    AddTasks(path, STREAMING_ROWS)
+    yield path
+    RemoveTemporaryDatabase(path)
+
+#Reading a whole project a page or a batch at a time keeps peak RSS within the Python objects of
+#one page plus SQLite's page cache, however many tasks it has
+@pytest.mark.slow
+@pytest.mark.parametrize("mode", STREAMING_MODES)
+def test_streaming_read_has_bounded_memory(largeDatabase, mode):
+    seconds, grown, allocated, pageCache = Measure(mode, largeDatabase)
+    assert Problems(grown, allocated, pageCache) == []